@@ -0,0 +1,293 @@
+import hashlib
+import sqlite3
+import threading
+from utils import BASE62_CHARS, generate_short_code, get_url_host, url_hash
+
+# Default allocator settings
+DEFAULT_MIN_LENGTH = 6      # Shortest code handed out
+DEFAULT_BLOCK_SIZE = 1000   # Sequence values reserved per database round trip
+DEFAULT_MAX_ATTEMPTS = 5    # Insert attempts before giving up on a code
+FILL_THRESHOLD = 0.01       # Random codes grow once this share of the keyspace is used
+
+
+class CodeAllocationError(Exception):
+    """Raised when no free short code could be allocated"""
+
+
+def base62_encode(number):
+    """Encode a non-negative integer using the Base62 alphabet"""
+    if number == 0:
+        return BASE62_CHARS[0]
+    digits = []
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_CHARS[remainder])
+    return ''.join(reversed(digits))
+
+
+def base62_encode_fixed(number, length):
+    """Encode an integer as exactly `length` Base62 characters"""
+    digits = []
+    for _ in range(length):
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_CHARS[remainder])
+    return ''.join(reversed(digits))
+
+
+def reserve_block(name, size):
+    """
+    Atomically reserve `size` consecutive values from a named sequence.
+    Returns the first value of the block. Must be called outside of an open
+    transaction on the writer connection.
+    """
+    from database import get_db_connection
+
+    with get_db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT OR IGNORE INTO code_sequences (name, next_value) VALUES (?, 0)', (name,))
+            start = conn.execute('SELECT next_value FROM code_sequences WHERE name = ?', (name,)).fetchone()[0]
+            conn.execute('UPDATE code_sequences SET next_value = ? WHERE name = ?', (start + size, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return start
+
+
+class SequenceBlock:
+    """Hand out values from sequence blocks reserved in the database"""
+
+    def __init__(self, name, block_size=DEFAULT_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_value(self):
+        """Return the next unused sequence value, reserving a new block when needed"""
+        with self._lock:
+            if self._next >= self._end:
+                self._next = reserve_block(self.name, self.block_size)
+                self._end = self._next + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+
+class CounterAllocator:
+    """
+    Sequential Base62 codes from pre-reserved id blocks.
+    The counter is offset so codes are never shorter than min_length, and the
+    length grows by itself once a length's keyspace is used up.
+    """
+
+    def __init__(self, min_length=DEFAULT_MIN_LENGTH, block_size=DEFAULT_BLOCK_SIZE):
+        self.min_length = min_length
+        self._offset = 62 ** (min_length - 1)
+        self._sequence = SequenceBlock('counter', block_size)
+
+    def allocate(self):
+        """Return the next short code"""
+        return base62_encode(self._offset + self._sequence.next_value())
+
+
+class FeistelAllocator:
+    """
+    Sequential ids passed through a keyed Feistel permutation, so codes are
+    unique without any lookup yet do not reveal creation order.
+
+    Ids are split into consecutive ranges, one per code length: the first
+    62**min_length ids produce min_length codes, the next 62**(min_length + 1)
+    produce codes one character longer, and so on.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, secret, min_length=DEFAULT_MIN_LENGTH, block_size=DEFAULT_BLOCK_SIZE):
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+        self.secret = secret
+        self.min_length = min_length
+        self._sequence = SequenceBlock('feistel', block_size)
+
+    def _round(self, value, round_number, bits):
+        """Keyed round function"""
+        digest = hashlib.blake2b(
+            value.to_bytes(16, 'big') + bytes([round_number]),
+            key=self.secret[:64],
+            digest_size=16
+        ).digest()
+        return int.from_bytes(digest, 'big') & ((1 << bits) - 1)
+
+    def permute(self, value, domain):
+        """Bijectively map value in [0, domain) onto [0, domain)"""
+        half_bits = ((domain - 1).bit_length() + 1) // 2
+        mask = (1 << half_bits) - 1
+        # Cycle-walk: the Feistel network permutes [0, 4**half_bits), so repeat
+        # until the output falls back inside the domain
+        while True:
+            left, right = value >> half_bits, value & mask
+            for round_number in range(self.ROUNDS):
+                left, right = right, left ^ self._round(right, round_number, half_bits)
+            value = (left << half_bits) | right
+            if value < domain:
+                return value
+
+    def encode(self, sequence_value):
+        """Turn a sequence value into a short code"""
+        length = self.min_length
+        while sequence_value >= 62 ** length:
+            sequence_value -= 62 ** length
+            length += 1
+        return base62_encode_fixed(self.permute(sequence_value, 62 ** length), length)
+
+    def allocate(self):
+        """Return the next short code"""
+        return self.encode(self._sequence.next_value())
+
+
+class RandomAllocator:
+    """
+    Random codes, retried on collision by the caller.
+    The code length grows once the table holds more than FILL_THRESHOLD of the
+    keyspace for the current length, which keeps collision odds low.
+    """
+
+    def __init__(self, min_length=DEFAULT_MIN_LENGTH, fill_threshold=FILL_THRESHOLD,
+                 refresh_interval=1000):
+        self.length = min_length
+        self.fill_threshold = fill_threshold
+        self.refresh_interval = refresh_interval
+        self._allocations = 0
+
+    def observe(self, url_count):
+        """Adjust the code length to the current table size"""
+        while url_count > self.fill_threshold * 62 ** self.length:
+            self.length += 1
+
+    def _refresh(self):
+        """Read the table size (MAX(id) is an index lookup, unlike COUNT(*))"""
+        from database import get_db_connection
+
+        with get_db_connection(readonly=True) as conn:
+            self.observe(conn.execute('SELECT MAX(id) FROM urls').fetchone()[0] or 0)
+
+    def allocate(self):
+        """Return a random short code"""
+        if self._allocations % self.refresh_interval == 0:
+            self._refresh()
+        self._allocations += 1
+        return generate_short_code(self.length)
+
+
+def create_allocator(strategy, secret=None, min_length=DEFAULT_MIN_LENGTH, block_size=DEFAULT_BLOCK_SIZE):
+    """Build an allocator for the named strategy: 'counter', 'feistel' or 'random'"""
+    if strategy == 'counter':
+        return CounterAllocator(min_length, block_size)
+    if strategy == 'feistel':
+        if not secret:
+            raise ValueError('The feistel strategy requires a secret')
+        return FeistelAllocator(secret, min_length, block_size)
+    if strategy == 'random':
+        return RandomAllocator(min_length)
+    raise ValueError('Unknown short code strategy: {}'.format(strategy))
+
+
+def insert_url(conn, allocator, original_url, custom_code=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+               expires_at=None):
+    """
+    Insert a URL and return (url_id, short_code).
+    expires_at is an optional UTC timestamp string.
+
+    Custom codes are inserted as-is and a duplicate raises CodeAllocationError.
+    Generated codes are retried up to max_attempts times if they collide with an
+    existing (e.g. custom) code. The id comes from lastrowid, so no second query
+    is needed. The caller commits.
+    """
+    attempts = 1 if custom_code else max_attempts
+    owns_transaction = not conn.in_transaction
+    for _ in range(attempts):
+        short_code = custom_code or allocator.allocate()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO urls (original_url, short_code, domain, url_hash, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (original_url, short_code, get_url_host(original_url) or '', url_hash(original_url), expires_at)
+            )
+        except sqlite3.IntegrityError:
+            # Close the implicit transaction so the next block reservation can run
+            if owns_transaction:
+                conn.rollback()
+            continue
+        return cursor.lastrowid, short_code
+
+    if custom_code:
+        raise CodeAllocationError('Custom short code already exists')
+    raise CodeAllocationError('Could not allocate a unique short code')
+
+
+def insert_urls(conn, allocator, items, max_attempts=DEFAULT_MAX_ATTEMPTS, chunk_size=500):
+    """
+    Insert many (original_url, custom_code) pairs in one write transaction per round.
+
+    Returns a list aligned with items holding either (url_id, short_code) or a
+    CodeAllocationError. Conflicting codes are found with one IN query per chunk
+    under the write lock and rows go in with a single executemany; since the lock
+    is held, AUTOINCREMENT hands out consecutive ids ending at last_insert_rowid().
+    Generated codes that collide are retried in a new round.
+    """
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+
+    for _ in range(max_attempts):
+        if not pending:
+            break
+
+        # Allocate before opening the transaction so block reservations can commit
+        codes = {i: items[i][1] or allocator.allocate() for i in pending}
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existing = set()
+            candidates = list(codes.values())
+            for start in range(0, len(candidates), chunk_size):
+                chunk = candidates[start:start + chunk_size]
+                rows = conn.execute(
+                    'SELECT short_code FROM urls WHERE short_code IN ({})'.format(','.join('?' * len(chunk))),
+                    chunk
+                ).fetchall()
+                existing.update(row[0] for row in rows)
+
+            to_insert = []
+            retry = []
+            for i in pending:
+                code = codes[i]
+                if code in existing:
+                    if items[i][1]:
+                        results[i] = CodeAllocationError('Custom short code already exists')
+                    else:
+                        retry.append(i)
+                    continue
+                existing.add(code)
+                to_insert.append(i)
+
+            if to_insert:
+                conn.executemany(
+                    'INSERT INTO urls (original_url, short_code, domain, url_hash) VALUES (?, ?, ?, ?)',
+                    [(items[i][0], codes[i], get_url_host(items[i][0]) or '', url_hash(items[i][0]))
+                     for i in to_insert]
+                )
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                first_id = last_id - len(to_insert) + 1
+                for offset, i in enumerate(to_insert):
+                    results[i] = (first_id + offset, codes[i])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        pending = retry
+
+    for i in pending:
+        results[i] = CodeAllocationError('Could not allocate a unique short code')
+    return results
@@ -1,473 +1,1251 @@
-from flask import Flask, request, redirect, jsonify, render_template, url_for, flash, session
-from flask_caching import Cache
-import qrcode
-import io
-import base64
-from urllib.parse import urlparse
-from database import init_db, get_db_connection
-from utils import generate_short_code, is_valid_url, sanitize_url, hash_password, verify_password
-from security import is_rate_limited, is_malicious_url
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'  # Change this in production
-
-# Configure caching with timeout
-cache = Cache(app, config={
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes cache timeout
-})
-
-# Initialize database
-init_db()
-
-@app.route('/')
-def index():
-    """Render the homepage"""
-    return render_template('index.html')
-
-@app.route('/shorten', methods=['POST'])
-def shorten_url():
-    """Create a new short URL"""
-    data = request.get_json() if request.is_json else request.form
-    
-    original_url = data.get('url')
-    custom_code = data.get('custom_code')
-    
-    # Get client IP for rate limiting
-    client_ip = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
-    
-    # Check for rate limiting
-    if is_rate_limited(client_ip):
-        return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
-    
-    # Validate URL
-    if not original_url or not is_valid_url(original_url):
-        # Try to sanitize the URL (add https:// if missing)
-        sanitized = sanitize_url(original_url)
-        if not sanitized or not is_valid_url(sanitized):
-            return jsonify({'error': 'Invalid URL provided'}), 400
-        original_url = sanitized
-    
-    # Check for malicious URL
-    if is_malicious_url(original_url):
-        return jsonify({'error': 'Malicious URL detected'}), 400
-    
-    # Generate short code
-    short_code = custom_code if custom_code else generate_short_code()
-    
-    # Check if custom code already exists
-    if custom_code:
-        with get_db_connection() as conn:
-            existing = conn.execute('SELECT id FROM urls WHERE short_code = ?', (custom_code,)).fetchone()
-            if existing:
-                return jsonify({'error': 'Custom short code already exists'}), 400
-    
-    # Insert into database
-    with get_db_connection() as conn:
-        try:
-            conn.execute(
-                'INSERT INTO urls (original_url, short_code) VALUES (?, ?)',
-                (original_url, short_code)
-            )
-            conn.commit()
-            url_record = conn.execute('SELECT id FROM urls WHERE short_code = ?', (short_code,)).fetchone()
-            if url_record:
-                url_id = url_record['id']
-            else:
-                return jsonify({'error': 'Failed to retrieve URL after creation'}), 500
-        except Exception as e:
-            return jsonify({'error': 'Failed to create short URL'}), 500
-    
-    # Generate short URL
-    short_url = request.host_url + short_code
-    
-    # Cache the URL mapping with explicit timeout
-    cache.set(short_code, original_url, timeout=300)  # 5 minutes cache timeout
-    
-    return jsonify({
-        'short_url': short_url,
-        'short_code': short_code,
-        'original_url': original_url
-    })
-
-@app.route('/<short_code>')
-def redirect_url(short_code):
-    """Redirect to the original URL and track clicks"""
-    # Check cache first
-    original_url = cache.get(short_code)
-    
-    if not original_url:
-        # If not in cache, check database
-        with get_db_connection() as conn:
-            url_record = conn.execute('SELECT * FROM urls WHERE short_code = ? AND is_active = TRUE', (short_code,)).fetchone()
-        
-        if not url_record:
-            flash('Short URL not found or is inactive')
-            return redirect(url_for('index'))
-        
-        original_url = url_record['original_url']
-        
-        # Add to cache for future requests with explicit timeout
-        cache.set(short_code, original_url, timeout=300)  # 5 minutes cache timeout
-    
-    # Track click in analytics
-    track_click(short_code)
-    
-    return redirect(original_url)
-
-@app.route('/preview/<short_code>')
-def preview_url(short_code):
-    """Preview the original URL without redirecting"""
-    with get_db_connection() as conn:
-        url_record = conn.execute('SELECT original_url FROM urls WHERE short_code = ?', (short_code,)).fetchone()
-    
-    if not url_record:
-        return jsonify({'error': 'Short URL not found'}), 404
-    
-    return jsonify({'original_url': url_record['original_url']})
-
-@app.route('/qr/<short_code>')
-def generate_qr(short_code):
-    """Generate QR code for a short URL"""
-    short_url = request.host_url + short_code
-    
-    # Create QR code
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(short_url)
-    qr.make(fit=True)
-    
-    # Generate image
-    img = qr.make_image(fill='black', back_color='white')
-    
-    # Convert to base64 for easy transfer
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
-    
-    img_str = base64.b64encode(img_buffer.getvalue()).decode()
-    
-    return jsonify({'qr_code': img_str})
-
-def track_click(short_code):
-    """Track a click on a short URL"""
-    # Get client information
-    ip_address = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
-    user_agent = request.headers.get('User-Agent')
-    referer = request.headers.get('Referer')
-    
-    # Get URL ID from database
-    with get_db_connection() as conn:
-        url_record = conn.execute('SELECT id FROM urls WHERE short_code = ?', (short_code,)).fetchone()
-    
-    if url_record:
-        url_id = url_record['id']
-        
-        # Increment click count and record analytics data
-        with get_db_connection() as conn:
-            # Increment click count
-            conn.execute('UPDATE urls SET clicks = clicks + 1 WHERE id = ?', (url_id,))
-            conn.commit()
-            
-            # Record analytics data
-            conn.execute(
-                'INSERT INTO analytics (url_id, ip_address, user_agent, referer) VALUES (?, ?, ?, ?)',
-                (url_id, ip_address, user_agent, referer)
-            )
-            conn.commit()
-
-@app.route('/admin')
-def admin_panel():
-    """Render the admin panel"""
-    return render_template('admin.html')
-
-@app.route('/admin/urls')
-def admin_urls():
-    """Get all URLs for admin management"""
-    with get_db_connection() as conn:
-        urls = conn.execute('SELECT * FROM urls ORDER BY created_at DESC').fetchall()
-    
-    # Convert to list of dictionaries
-    urls_list = []
-    for url in urls:
-        urls_list.append({
-            'id': url['id'],
-            'original_url': url['original_url'],
-            'short_code': url['short_code'],
-            'created_at': url['created_at'],
-            'clicks': url['clicks'],
-            'is_active': url['is_active']
-        })
-    
-    return jsonify(urls_list)
-
-@app.route('/admin/urls/<int:url_id>/toggle', methods=['POST'])
-def toggle_url(url_id):
-    """Toggle URL active status"""
-    with get_db_connection() as conn:
-        url = conn.execute('SELECT is_active, short_code FROM urls WHERE id = ?', (url_id,)).fetchone()
-    
-    if not url:
-        return jsonify({'error': 'URL not found'}), 404
-    
-    # Toggle status
-    new_status = not url['is_active']
-    with get_db_connection() as conn:
-        conn.execute('UPDATE urls SET is_active = ? WHERE id = ?', (new_status, url_id))
-        conn.commit()
-    
-    # Clear cache if URL is being disabled
-    if not new_status:
-        cache.delete(url['short_code'])
-    
-    return jsonify({'success': True, 'is_active': new_status})
-
-@app.route('/admin/urls/<int:url_id>/delete', methods=['POST'])
-def delete_url(url_id):
-    """Delete a URL"""
-    with get_db_connection() as conn:
-        short_code = conn.execute('SELECT short_code FROM urls WHERE id = ?', (url_id,)).fetchone()
-    
-    if not short_code:
-        return jsonify({'error': 'URL not found'}), 404
-    
-    # Delete URL and related analytics
-    with get_db_connection() as conn:
-        conn.execute('DELETE FROM analytics WHERE url_id = ?', (url_id,))
-        conn.execute('DELETE FROM urls WHERE id = ?', (url_id,))
-        conn.commit()
-    
-    # Clear cache
-    cache.delete(short_code['short_code'])
-    
-    return jsonify({'success': True})
-
-@app.route('/admin/users')
-def admin_users():
-    """Get all users for admin management"""
-    with get_db_connection() as conn:
-        users = conn.execute('SELECT * FROM users ORDER BY created_at DESC').fetchall()
-    
-    # Convert to list of dictionaries
-    users_list = []
-    for user in users:
-        users_list.append({
-            'id': user['id'],
-            'username': user['username'],
-            'email': user['email'],
-            'created_at': user['created_at'],
-            'is_admin': user['is_admin']
-        })
-    
-    return jsonify(users_list)
-
-@app.route('/admin/dashboard')
-def admin_dashboard():
-    """Render the analytics dashboard"""
-    return render_template('dashboard.html')
-
-@app.route('/admin/dashboard/stats')
-def dashboard_stats():
-    """Get statistics data for the dashboard"""
-    with get_db_connection() as conn:
-        # Get total URLs
-        total_urls = conn.execute('SELECT COUNT(*) as count FROM urls').fetchone()['count']
-        
-        # Get total clicks
-        total_clicks = conn.execute('SELECT SUM(clicks) as sum FROM urls').fetchone()['sum'] or 0
-        
-        # Get active URLs
-        active_urls = conn.execute('SELECT COUNT(*) as count FROM urls WHERE is_active = TRUE').fetchone()['count']
-        
-        # Get top country by clicks
-        top_country = conn.execute('''
-            SELECT country, COUNT(*) as count
-            FROM analytics
-            WHERE country IS NOT NULL
-            GROUP BY country
-            ORDER BY count DESC
-            LIMIT 1
-        ''').fetchone()
-    
-    top_country_name = top_country['country'] if top_country else 'Unknown'
-    
-    return jsonify({
-        'total_urls': total_urls,
-        'total_clicks': total_clicks,
-        'active_urls': active_urls,
-        'top_country': top_country_name
-    })
-
-@app.route('/admin/dashboard/recent')
-def recent_activity():
-    """Get recent activity data for the dashboard"""
-    with get_db_connection() as conn:
-        # Get recent clicks (last 10)
-        recent_clicks = conn.execute('''
-            SELECT a.timestamp, a.ip_address, a.country, u.short_code, u.original_url
-            FROM analytics a
-            JOIN urls u ON a.url_id = u.id
-            ORDER BY a.timestamp DESC
-            LIMIT 10
-        ''').fetchall()
-    
-    # Convert to list of dictionaries
-    activities = []
-    for click in recent_clicks:
-        activities.append({
-            'timestamp': click['timestamp'],
-            'ip_address': click['ip_address'],
-            'country': click['country'] or 'Unknown',
-            'short_code': click['short_code'],
-            'original_url': click['original_url']
-        })
-    
-    return jsonify(activities)
-
-@app.route('/admin/dashboard/chart/clicks-over-time')
-def clicks_over_time_chart_data():
-    """Get clicks over time data for the chart"""
-    with get_db_connection() as conn:
-        # Get clicks grouped by day for the last 7 days
-        chart_data = conn.execute('''
-            SELECT DATE(timestamp) as day, COUNT(*) as clicks
-            FROM analytics
-            WHERE timestamp >= DATE('now', '-7 days')
-            GROUP BY day
-            ORDER BY day
-        ''').fetchall()
-    
-    labels = [row['day'] for row in chart_data]
-    clicks = [row['clicks'] for row in chart_data]
-    
-    return jsonify({
-        'labels': labels,
-        'clicks': clicks
-    })
-
-@app.route('/admin/dashboard/chart/geographic-distribution')
-def geographic_distribution_chart_data():
-    """Get geographic distribution data for the chart"""
-    with get_db_connection() as conn:
-        # Get clicks by country
-        chart_data = conn.execute('''
-            SELECT country, COUNT(*) as clicks
-            FROM analytics
-            WHERE country IS NOT NULL
-            GROUP BY country
-            ORDER BY clicks DESC
-            LIMIT 10
-        ''').fetchall()
-    
-    labels = [row['country'] for row in chart_data]
-    clicks = [row['clicks'] for row in chart_data]
-    
-    return jsonify({
-        'labels': labels,
-        'clicks': clicks
-    })
-
-@app.route('/admin/dashboard/chart/top-urls')
-def top_urls_chart_data():
-    """Get top URLs by clicks data for the chart"""
-    with get_db_connection() as conn:
-        # Get top URLs by clicks
-        chart_data = conn.execute('''
-            SELECT short_code, clicks
-            FROM urls
-            WHERE clicks > 0
-            ORDER BY clicks DESC
-            LIMIT 10
-        ''').fetchall()
-    
-    labels = [row['short_code'] for row in chart_data]
-    clicks = [row['clicks'] for row in chart_data]
-    
-    return jsonify({
-        'labels': labels,
-        'clicks': clicks
-    })
-
-@app.route('/admin/dashboard/chart/device-types')
-def device_types_chart_data():
-    """Get device types data for the chart"""
-    with get_db_connection() as conn:
-        # Get device types from user agent strings
-        chart_data = conn.execute('''
-            SELECT user_agent,
-                   COUNT(*) as clicks
-            FROM analytics
-            GROUP BY user_agent
-            ORDER BY clicks DESC
-        ''').fetchall()
-    
-    # Categorize devices (simplified)
-    device_counts = {'Desktop': 0, 'Mobile': 0, 'Tablet': 0, 'Other': 0}
-    
-    for row in chart_data:
-        user_agent = row['user_agent']
-        clicks = row['clicks']
-        
-        if user_agent:
-            if 'Mobile' in user_agent or 'Android' in user_agent or 'iPhone' in user_agent:
-                device_counts['Mobile'] += clicks
-            elif 'Tablet' in user_agent or 'iPad' in user_agent:
-                device_counts['Tablet'] += clicks
-            else:
-                device_counts['Desktop'] += clicks
-        else:
-            device_counts['Other'] += clicks
-    
-    labels = list(device_counts.keys())
-    clicks = list(device_counts.values())
-    
-    return jsonify({
-        'labels': labels,
-        'clicks': clicks
-    })
-
-@app.route('/admin/login', methods=['POST'])
-def admin_login():
-    """Authenticate admin user"""
-    data = request.get_json() if request.is_json else request.form
-    
-    username = data.get('username')
-    password = data.get('password')
-    
-    if not username or not password:
-        return jsonify({'error': 'Username and password are required'}), 400
-    
-    # Get user from database
-    with get_db_connection() as conn:
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-    
-    if not user or not verify_password(password, user['password_hash']):
-        return jsonify({'error': 'Invalid username or password'}), 401
-    
-    # Set session
-    session['user_id'] = user['id']
-    session['username'] = user['username']
-    session['is_admin'] = user['is_admin']
-    
-    return jsonify({'success': True, 'username': user['username'], 'is_admin': user['is_admin']})
-
-@app.route('/admin/logout', methods=['POST'])
-def admin_logout():
-    """Logout admin user"""
-    session.clear()
-    return jsonify({'success': True})
-
-@app.route('/admin/session', methods=['GET'])
-def admin_session():
-    """Check if user is authenticated"""
-    if 'user_id' in session:
-        return jsonify({
-            'authenticated': True,
-            'user_id': session['user_id'],
-            'username': session['username'],
-            'is_admin': session['is_admin']
-        })
-    else:
-        return jsonify({'authenticated': False}), 401
-
-if __name__ == '__main__':
+from flask import Flask, request, redirect, jsonify, render_template, url_for, flash, session, Response, stream_with_context
+from flask_caching import Cache
+import atexit
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from database import init_db, get_db_connection, pool_stats
+from utils import hash_password, verify_password, url_hash, is_valid_custom_code
+from url_parser import parse_url, parse_urls
+import security
+from security import is_rate_limited, is_malicious_url, scan_urls, rate_limiters, configure_screening
+from click_tracker import create_click_tracker
+from click_counters import create_click_counters
+from geoip import GeoDatabase
+from resolution_cache import ResolutionCache, Resolution, NOT_FOUND, SingleFlight
+from qr_service import QRRenderer, CONTENT_TYPES, ERROR_CORRECTION
+from pagination import fetch_page, iter_rows, parse_page_size, stream_ndjson, stream_csv
+from rollups import compact, create_rollup_compactor, delete_url_rollups, delete_urls_rollups
+from allocator import create_allocator, insert_url, insert_urls, CodeAllocationError
+from jobs import create_job_runner
+from retention import AnalyticsRetention
+from expiry import ExpirySweeper, parse_expiry, parse_timestamp
+from dedup import UrlDeduplicator
+from metrics import registry as metrics, MetricsMiddleware, SlowRequestProfiler, stats_collector
+from hyperloglog import count_sketch_blobs
+from trending import TrendingTracker, MAX_RESULTS as TRENDING_MAX_RESULTS
+from live_feed import LiveFeed
+from warmup import CacheWarmer
+# Initialize Flask app
+app = Flask(__name__)
+app.secret_key = 'your-secret-key-here'  # Change this in production
+
+# Configure caching with timeout
+cache = Cache(app, config={
+    'CACHE_TYPE': 'simple',
+    'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes cache timeout
+})
+
+# Click ingestion pipeline settings
+app.config.update(
+    CLICK_QUEUE_SIZE=10000,     # Clicks buffered before new ones are dropped
+    CLICK_FLUSH_SIZE=500,       # Clicks written per transaction
+    CLICK_FLUSH_INTERVAL=1.0    # Seconds between background flushes
+)
+
+# Write-behind counters for urls.clicks. A crash that skips the exit hooks loses
+# at most CLICK_COUNTER_FLUSH_INTERVAL seconds of counts, capped at CLICK_COUNTER_MAX_PENDING clicks
+app.config.update(
+    CLICK_COUNTER_STRIPES=16,           # Independently locked shards of the in-memory counters
+    CLICK_COUNTER_FLUSH_INTERVAL=2.0,   # Seconds between flushes of the counted clicks
+    CLICK_COUNTER_MAX_PENDING=10000     # Unflushed clicks that force an early flush
+)
+
+# Redirect resolution cache settings
+app.config.update(
+    RESOLUTION_CACHE_SIZE=100000,       # Short codes kept in the in-process LRU
+    RESOLUTION_CACHE_TTL=300,           # 5 minutes for known codes
+    RESOLUTION_NEGATIVE_TTL=30,         # 30 seconds for unknown codes
+    RESOLUTION_SHARED_CACHE=False,      # Also use the Flask-Caching backend as a shared tier
+    RESOLUTION_TTL_JITTER=0.1,          # TTLs vary by up to 10% so entries do not expire together
+    RESOLUTION_REFRESH_AHEAD=30,        # Hits this many seconds before expiry reload the code in the background
+    RESOLUTION_REFRESH_THREADS=2        # Threads running those background reloads
+)
+
+# Resolution cache warm-up when a worker starts
+app.config.update(
+    WARMUP_HOT_CODES=10000,                         # Hottest short codes preloaded (0 disables)
+    WARMUP_DAYS=7,                                  # Days of clicks used to rank them
+    WARMUP_SNAPSHOT_PATH='resolution_snapshot.bin', # Hot map saved for the next start (None disables)
+    WARMUP_SNAPSHOT_INTERVAL=300,                   # Seconds between snapshot saves
+    WARMUP_SNAPSHOT_MAX_AGE=3600                    # Older snapshots are ignored
+)
+
+# Short code allocation settings
+app.config.update(
+    SHORT_CODE_STRATEGY='feistel',      # 'feistel', 'counter' or 'random'
+    SHORT_CODE_MIN_LENGTH=6,
+    SHORT_CODE_BLOCK_SIZE=1000          # Ids reserved per database round trip
+)
+
+# Bulk shortening settings
+app.config.update(
+    BULK_MAX_ITEMS=100000,      # URLs accepted per bulk request
+    BULK_CHUNK_SIZE=1000        # URLs validated and inserted per transaction
+)
+
+# Rate limits for the redirect path (shortening keeps the default 10 per minute)
+app.config.update(
+    REDIRECT_RATE_LIMIT=300,    # Redirects allowed per client
+    REDIRECT_RATE_WINDOW=60     # Seconds
+)
+
+# Blocklist files for malicious URL screening (re-read when they change)
+app.config.update(
+    SCREENING_DOMAIN_FILES=[],      # One domain per line; hosts-file format also works
+    SCREENING_URL_PREFIX_FILES=[],  # One URL prefix per line
+    SCREENING_PATTERN_FILES=[],     # One regular expression per line
+    SCREENING_RELOAD_INTERVAL=30    # Seconds between file change checks
+)
+
+# QR code rendering settings
+app.config.update(
+    QR_CACHE_DIR=None,                  # Directory for rendered images (None keeps them in memory only)
+    QR_MEMORY_CACHE_BYTES=32 * 1024 * 1024,
+    QR_RENDER_WORKERS=4,
+    QR_RENDER_EXECUTOR='thread'         # 'thread' or 'process'
+)
+
+# Dashboard rollup compaction settings
+app.config.update(
+    ROLLUP_INTERVAL=5.0,        # Seconds between background compaction passes
+    ROLLUP_CHUNK_SIZE=10000     # Raw analytics rows folded in per transaction
+)
+
+# IP geolocation database compiled with `python geoip.py ranges.csv geo.dat`
+app.config.update(
+    GEOIP_DATABASE=None,        # Path to the compiled file (None leaves country/city empty)
+    GEOIP_CACHE_SIZE=65536      # Hot IPs remembered per process
+)
+
+# Raw analytics retention: older months move to one archive file per month
+app.config.update(
+    ANALYTICS_ARCHIVE_DIR='analytics_archive',
+    ANALYTICS_HOT_MONTHS=2,             # Months kept in the main analytics table
+    ANALYTICS_RETENTION_MONTHS=12,      # Months of raw analytics kept at all (rollups are kept forever)
+    ANALYTICS_RETENTION_INTERVAL=3600,  # Seconds between archive/expiry passes
+    ANALYTICS_CHUNK_SIZE=5000           # Rows moved or deleted per transaction
+)
+
+# Link expiry (ttl or expires_at on /shorten)
+app.config.update(
+    LINK_MAX_TTL=10 * 365 * 86400,  # Longest lifetime a link can be given (seconds)
+    EXPIRY_SWEEP_INTERVAL=60,       # Seconds between passes deactivating expired links
+    EXPIRY_SWEEP_BATCH_SIZE=500     # Links deactivated per transaction
+)
+
+# Optional duplicate detection: shortening a known URL returns its existing code
+app.config.update(
+    DEDUP_ENABLED=False,
+    DEDUP_BLOOM_CAPACITY=1000000,   # URLs the bloom filter is sized for (it grows past this)
+    DEDUP_BLOOM_ERROR_RATE=0.01,    # Share of new URLs that still cost an indexed lookup
+    DEDUP_REFRESH_INTERVAL=30       # Seconds between picking up URLs added by other workers
+)
+
+# Request metrics (served at /metrics) and the opt-in slow request profiler
+app.config.update(
+    METRICS_PROFILE_PATH=None,      # File receiving folded stacks of slow requests (None disables)
+    METRICS_PROFILE_THRESHOLD=0.5,  # Seconds after which a request counts as slow
+    METRICS_PROFILE_INTERVAL=0.005  # Seconds between stack samples while profiling
+)
+
+# In-memory trending links (/admin/dashboard/chart/trending), per process
+app.config.update(
+    TRENDING_CAPACITY=1000,             # Short codes tracked per window bucket (bounds memory)
+    TRENDING_REFRESH_INTERVAL=1.0       # Seconds a computed top list is reused
+)
+
+# Live dashboard feed (/admin/dashboard/live, server-sent events), per process
+app.config.update(
+    LIVE_FEED_BUFFER_SIZE=1000,         # Recent click events kept in the ring buffer
+    LIVE_FEED_INTERVAL=1.0,             # Seconds between updates pushed to dashboards
+    LIVE_FEED_HEARTBEAT=15.0,           # Seconds between keep-alives on an idle stream
+    LIVE_FEED_MAX_SUBSCRIBERS=50        # Open streams per process (each holds a server thread)
+)
+
+# Async serving of redirects and previews (asgi_app.py)
+app.config.update(
+    ASGI_DB_THREADS=8               # Threads running SQLite lookups for the async app
+)
+
+# Initialize database
+init_db()
+
+qr_renderer = QRRenderer(
+    cache_dir=app.config['QR_CACHE_DIR'],
+    memory_bytes=app.config['QR_MEMORY_CACHE_BYTES'],
+    workers=app.config['QR_RENDER_WORKERS'],
+    executor=app.config['QR_RENDER_EXECUTOR']
+)
+
+if (app.config['SCREENING_DOMAIN_FILES'] or app.config['SCREENING_URL_PREFIX_FILES']
+        or app.config['SCREENING_PATTERN_FILES']):
+    configure_screening(
+        app.config['SCREENING_DOMAIN_FILES'],
+        app.config['SCREENING_URL_PREFIX_FILES'],
+        app.config['SCREENING_PATTERN_FILES'],
+        app.config['SCREENING_RELOAD_INTERVAL']
+    )
+
+short_code_allocator = create_allocator(
+    app.config['SHORT_CODE_STRATEGY'],
+    secret=app.secret_key,
+    min_length=app.config['SHORT_CODE_MIN_LENGTH'],
+    block_size=app.config['SHORT_CODE_BLOCK_SIZE']
+)
+
+# short_code -> (url_id, original_url, is_active, expires_at)
+resolution_cache = ResolutionCache(
+    max_entries=app.config['RESOLUTION_CACHE_SIZE'],
+    ttl=app.config['RESOLUTION_CACHE_TTL'],
+    negative_ttl=app.config['RESOLUTION_NEGATIVE_TTL'],
+    shared=cache if app.config['RESOLUTION_SHARED_CACHE'] else None,
+    ttl_jitter=app.config['RESOLUTION_TTL_JITTER'],
+    refresh_ahead=app.config['RESOLUTION_REFRESH_AHEAD'],
+    on_refresh=lambda short_code: refresh_resolution(short_code)
+)
+# Concurrent cache misses for the same code share one database lookup
+resolution_flight = SingleFlight()
+_refresh_executor = None
+_refresh_pid = None
+_refresh_lock = threading.Lock()
+
+# Start warm: the previous process's hot codes (re-read from the database) now,
+# the hottest codes by recent clicks once the background workers run
+cache_warmer = CacheWarmer(
+    resolution_cache,
+    snapshot_path=app.config['WARMUP_SNAPSHOT_PATH'],
+    limit=app.config['WARMUP_HOT_CODES'],
+    days=app.config['WARMUP_DAYS'],
+    snapshot_max_age=app.config['WARMUP_SNAPSHOT_MAX_AGE']
+)
+if app.config['WARMUP_HOT_CODES']:
+    cache_warmer.warm_from_snapshot()
+    if app.config['WARMUP_SNAPSHOT_PATH']:
+        atexit.register(cache_warmer.save_snapshot)
+
+# urls.clicks is counted in memory and flushed in the background;
+# readers add click_counters.pending() to the stored value
+click_counters = create_click_counters(
+    stripes=app.config['CLICK_COUNTER_STRIPES'],
+    flush_interval=app.config['CLICK_COUNTER_FLUSH_INTERVAL'],
+    max_pending=app.config['CLICK_COUNTER_MAX_PENDING']
+)
+
+# Clicks are queued here and written in batches by a background thread
+click_tracker = create_click_tracker(
+    max_queue_size=app.config['CLICK_QUEUE_SIZE'],
+    flush_size=app.config['CLICK_FLUSH_SIZE'],
+    flush_interval=app.config['CLICK_FLUSH_INTERVAL'],
+    geo_database=GeoDatabase(app.config['GEOIP_DATABASE'], app.config['GEOIP_CACHE_SIZE'])
+    if app.config['GEOIP_DATABASE'] else None,
+    click_counters=click_counters
+)
+
+# Dashboard rollups are brought up to date right after every click batch,
+# and a background compactor backfills older analytics and catches up
+click_tracker.add_listener(lambda conn, batch: compact(conn, app.config['ROLLUP_CHUNK_SIZE']))
+rollup_compactor = create_rollup_compactor(app.config['ROLLUP_INTERVAL'], app.config['ROLLUP_CHUNK_SIZE'])
+
+# Short codes clicked most over the last 5 minutes, hour and day
+trending_links = TrendingTracker(
+    capacity=app.config['TRENDING_CAPACITY'],
+    refresh_interval=app.config['TRENDING_REFRESH_INTERVAL']
+)
+
+# Clicks and new links pushed to open dashboards
+live_feed = LiveFeed(
+    buffer_size=app.config['LIVE_FEED_BUFFER_SIZE'],
+    interval=app.config['LIVE_FEED_INTERVAL'],
+    geo_database=click_tracker.geo_database
+)
+
+# Slow maintenance (analytics archiving, bulk deletes) runs as background jobs
+job_runner = create_job_runner()
+analytics_retention = AnalyticsRetention(
+    archive_dir=app.config['ANALYTICS_ARCHIVE_DIR'],
+    hot_months=app.config['ANALYTICS_HOT_MONTHS'],
+    retention_months=app.config['ANALYTICS_RETENTION_MONTHS'],
+    chunk_size=app.config['ANALYTICS_CHUNK_SIZE']
+)
+url_deduplicator = None
+if app.config['DEDUP_ENABLED']:
+    url_deduplicator = UrlDeduplicator(app.config['DEDUP_BLOOM_CAPACITY'], app.config['DEDUP_BLOOM_ERROR_RATE'])
+    url_deduplicator.refresh()
+
+expiry_sweeper = ExpirySweeper(resolution_cache, app.config['EXPIRY_SWEEP_BATCH_SIZE'])
+_scheduled_pid = None
+
+# Every request is timed by route; stages inside it are timed with metrics.stage()
+app.wsgi_app = MetricsMiddleware(
+    app.wsgi_app,
+    metrics,
+    SlowRequestProfiler(
+        app.config['METRICS_PROFILE_PATH'],
+        app.config['METRICS_PROFILE_THRESHOLD'],
+        app.config['METRICS_PROFILE_INTERVAL']
+    ) if app.config['METRICS_PROFILE_PATH'] else None
+)
+metrics.add_collector(stats_collector(
+    'resolution_cache', lambda: [((), resolution_cache.stats())],
+    counters=['hits', 'negative_hits', 'shared_hits', 'misses', 'evictions', 'refreshes'], gauges=['size']
+))
+metrics.add_collector(stats_collector(
+    'resolution_singleflight', lambda: [((), resolution_flight.stats())],
+    counters=['calls', 'coalesced'], gauges=['in_flight']
+))
+metrics.add_collector(stats_collector(
+    'click_tracker', lambda: [((), click_tracker.stats())],
+    counters=['enqueued', 'dropped', 'written', 'flushes', 'failed_flushes', 'lost'], gauges=['queued']
+))
+metrics.add_collector(stats_collector(
+    'click_counters', lambda: [((), click_counters.stats())],
+    counters=['added', 'flushed', 'flushes', 'failed_flushes'], gauges=['pending']
+))
+metrics.add_collector(stats_collector(
+    'live_feed', lambda: [((), live_feed.stats())],
+    counters=['updates', 'coalesced'], gauges=['subscribers']
+))
+metrics.add_collector(stats_collector(
+    'db_pool', lambda: [((('readonly', str(stats['readonly']).lower()),), stats) for stats in pool_stats()],
+    counters=['waits', 'wait_seconds', 'busy_errors'], gauges=['idle']
+))
+metrics.add_collector(stats_collector(
+    'qr', lambda: [((), qr_renderer.stats())],
+    counters=['memory_hits', 'disk_hits', 'renders'], gauges=['memory_bytes']
+))
+metrics.add_collector(stats_collector(
+    'rate_limiter', lambda: [((('name', limiter.name),), limiter.stats()) for limiter in rate_limiters.values()],
+    counters=['allowed', 'limited'], gauges=['keys']
+))
+metrics.add_collector(stats_collector(
+    'screening', lambda: [((), security.screening_engine.stats())],
+    counters=['checks', 'blocked']
+))
+if url_deduplicator is not None:
+    metrics.add_collector(stats_collector(
+        'dedup', lambda: [((), url_deduplicator.stats())],
+        counters=['skipped', 'lookups', 'hits', 'misses'], gauges=['bloom_entries']
+    ))
+
+def start_background_workers():
+    """Start per-process background threads (after any fork by the server)"""
+    global _scheduled_pid
+    rollup_compactor.start()
+    if _scheduled_pid != os.getpid():
+        _scheduled_pid = os.getpid()
+        job_runner.every(app.config['ANALYTICS_RETENTION_INTERVAL'], 'rotate_analytics', analytics_retention.rotate)
+        job_runner.every(app.config['EXPIRY_SWEEP_INTERVAL'], 'sweep_expired', expiry_sweeper.sweep)
+        if url_deduplicator is not None:
+            job_runner.every(app.config['DEDUP_REFRESH_INTERVAL'], 'refresh_dedup', url_deduplicator.refresh)
+        if app.config['WARMUP_HOT_CODES']:
+            job_runner.submit('warm_cache', cache_warmer.warm_from_database)
+            if app.config['WARMUP_SNAPSHOT_PATH']:
+                job_runner.every(app.config['WARMUP_SNAPSHOT_INTERVAL'], 'snapshot_cache', cache_warmer.save_snapshot)
+
+@app.before_request
+def prepare_request():
+    """Label the request for metrics and make sure the background workers run"""
+    # Route label for the request metrics (the rule, not the path, to keep cardinality low)
+    request.environ['metrics.route'] = request.url_rule.rule if request.url_rule else 'unmatched'
+    start_background_workers()
+
+@app.route('/')
+def index():
+    """Render the homepage"""
+    return render_template('index.html')
+
+@app.route('/shorten', methods=['POST'])
+def shorten_url():
+    """Create a new short URL"""
+    data = request.get_json() if request.is_json else request.form
+    
+    original_url = data.get('url')
+    custom_code = data.get('custom_code')
+    
+    # Get client IP for rate limiting
+    client_ip = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
+    
+    # Check for rate limiting
+    if is_rate_limited(client_ip):
+        return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
+    
+    # Validate URL, adding https:// if the scheme is missing; parsed once for every check below
+    with metrics.stage('validation'):
+        parsed = parse_url(original_url, default_scheme='https')
+    if parsed is None:
+        return jsonify({'error': 'Invalid URL provided'}), 400
+    original_url = parsed.url
+    
+    if custom_code and not is_valid_custom_code(custom_code):
+        return jsonify({'error': 'Invalid custom code'}), 400
+    
+    # Check for malicious URL
+    with metrics.stage('malicious_scan'):
+        if is_malicious_url(original_url, parsed):
+            return jsonify({'error': 'Malicious URL detected'}), 400
+    
+    try:
+        expires_at = parse_expiry(data, app.config['LINK_MAX_TTL'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Hand back the existing code for a URL shortened before (custom codes and
+    # expiring links always get a row of their own)
+    if url_deduplicator is not None and not custom_code and not expires_at:
+        with metrics.stage('dedup'):
+            existing = url_deduplicator.find(original_url)
+        if existing:
+            url_id, short_code, existing_url = existing
+            return jsonify({
+                'short_url': request.host_url + short_code,
+                'short_code': short_code,
+                'original_url': existing_url,
+                'expires_at': None,
+                'deduplicated': True
+            })
+    
+    # Allocate the code and insert; the new id comes back with the insert itself
+    with metrics.stage('db'), get_db_connection() as conn:
+        try:
+            url_id, short_code = insert_url(conn, short_code_allocator, original_url, custom_code,
+                                         expires_at=expires_at)
+            conn.commit()
+        except CodeAllocationError as e:
+            if custom_code:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({'error': 'Failed to create short URL'}), 500
+        except Exception as e:
+            return jsonify({'error': 'Failed to create short URL'}), 500
+    
+    if url_deduplicator is not None:
+        url_deduplicator.add(original_url)
+    live_feed.publish_urls()
+    
+    # Generate short URL
+    short_url = request.host_url + short_code
+    
+    # Cache the resolution (this also replaces any negative entry for the code)
+    resolution_cache.set(short_code, Resolution(url_id, original_url, True, parse_timestamp(expires_at)))
+    
+    return jsonify({
+        'short_url': short_url,
+        'short_code': short_code,
+        'original_url': original_url,
+        'expires_at': expires_at
+    })
+
+MALFORMED_LINE = object()
+
+def read_bulk_entries():
+    """Yield the entries of a JSON array or an NDJSON body (MALFORMED_LINE for a bad NDJSON line)"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        # NDJSON bodies are read line by line instead of being loaded at once
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield MALFORMED_LINE
+        return
+
+    entries = request.get_json(silent=True)
+    if not isinstance(entries, list):
+        entries = (entries or {}).get('urls') if isinstance(entries, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError('Expected a JSON array of URLs')
+    yield from entries
+
+def read_bulk_items():
+    """
+    Yield (url, custom_code, error) triples from a JSON array or an NDJSON request body.
+    Entries may be plain URL strings or objects with url and custom_code keys.
+    error is set for an entry that is rejected before validation (a malformed
+    NDJSON line or an invalid custom code) and None otherwise.
+    """
+    for entry in read_bulk_entries():
+        if entry is MALFORMED_LINE:
+            yield None, None, 'Malformed NDJSON line'
+        elif isinstance(entry, dict):
+            custom_code = entry.get('custom_code') or None
+            if custom_code is not None and not is_valid_custom_code(custom_code):
+                yield None, None, 'Invalid custom code'
+            else:
+                yield entry.get('url'), custom_code, None
+        else:
+            yield entry, None, None
+
+def shorten_chunk(chunk, host_url, results):
+    """
+    Validate, scan and insert one chunk of bulk items, filling in results
+    (aligned with chunk) as each item is settled. Results are set before any
+    follow-up work, so if this raises the caller only has to fail the items
+    still left as None.
+    """
+    with metrics.stage('validation'):
+        parsed = parse_urls([url for url, _, _ in chunk])
+        urls = [result.url if result and not error else None for result, (_, _, error) in zip(parsed, chunk)]
+    with metrics.stage('malicious_scan'):
+        malicious = iter(scan_urls([url for url in urls if url],
+                                   [result for result, url in zip(parsed, urls) if url]))
+    
+    to_insert = []
+    for i, url in enumerate(urls):
+        if chunk[i][2]:
+            results[i] = {'error': chunk[i][2]}
+        elif not url:
+            results[i] = {'error': 'Invalid URL provided'}
+        elif next(malicious):
+            results[i] = {'error': 'Malicious URL detected'}
+        else:
+            to_insert.append(i)
+    
+    # Dedup mode: reuse codes of known URLs and insert repeats within the chunk once
+    repeats = {}
+    if url_deduplicator is not None and to_insert:
+        candidates = [i for i in to_insert if not chunk[i][1]]
+        with metrics.stage('dedup'):
+            existing = url_deduplicator.find_many([urls[i] for i in candidates])
+        first_seen = {}
+        for i, match in zip(candidates, existing):
+            if match:
+                results[i] = {
+                    'short_url': host_url + match[1],
+                    'short_code': match[1],
+                    'original_url': match[2],
+                    'deduplicated': True
+                }
+            else:
+                first = first_seen.setdefault(url_hash(urls[i]), i)
+                if first != i:
+                    repeats[i] = first
+        to_insert = [i for i in to_insert if results[i] is None and i not in repeats]
+    
+    if to_insert:
+        items = [(urls[i], chunk[i][1]) for i in to_insert]
+        with metrics.stage('db'), get_db_connection() as conn:
+            inserted = insert_urls(conn, short_code_allocator, items)
+        for i, outcome in zip(to_insert, inserted):
+            if isinstance(outcome, CodeAllocationError):
+                results[i] = {'error': str(outcome)}
+                continue
+            url_id, short_code = outcome
+            results[i] = {
+                'short_url': host_url + short_code,
+                'short_code': short_code,
+                'original_url': urls[i]
+            }
+            if chunk[i][1]:
+                # A custom code may still have a negative cache entry
+                resolution_cache.invalidate(short_code)
+            if url_deduplicator is not None:
+                url_deduplicator.add(urls[i])
+        live_feed.publish_urls(sum(1 for outcome in inserted if not isinstance(outcome, CodeAllocationError)))
+    for i, first in repeats.items():
+        results[i] = dict(results[first], deduplicated=True) if 'short_code' in results[first] else results[first]
+
+@app.route('/shorten/bulk', methods=['POST'])
+def shorten_bulk():
+    """
+    Create many short URLs in one request.
+    Accepts a JSON array or NDJSON and streams back one result per input item,
+    in input order, as NDJSON or a JSON array matching the request format.
+    """
+    client_ip = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
+    if is_rate_limited(client_ip):
+        return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
+    
+    try:
+        items = read_bulk_items()
+        first = next(items, None)
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Malformed request body'}), 400
+    
+    ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl')
+    host_url = request.host_url
+    max_items = app.config['BULK_MAX_ITEMS']
+    chunk_size = app.config['BULK_CHUNK_SIZE']
+    
+    def emit(results, index):
+        for offset, result in enumerate(results):
+            line = json.dumps(dict(result, index=index + offset))
+            if ndjson:
+                yield line + '\n'
+            else:
+                yield (',' if index + offset else '') + line
+    
+    def process(chunk, index):
+        accepted = chunk[:max(0, max_items - index)]
+        results = [None] * len(accepted)
+        try:
+            if accepted:
+                shorten_chunk(accepted, host_url, results)
+        except Exception:
+            # Items the chunk had not settled yet are reported as failed (rows that
+            # were committed already have their result); later chunks still run
+            results = [result or {'error': 'Failed to create short URL'} for result in results]
+        return results + [{'error': 'Batch limit exceeded'}] * (len(chunk) - len(accepted))
+    
+    def generate():
+        if not ndjson:
+            yield '['
+        index = 0
+        chunk = [first] if first is not None else []
+        for entry in items:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield from emit(process(chunk, index), index)
+                index += len(chunk)
+                chunk = []
+        yield from emit(process(chunk, index), index)
+        if not ndjson:
+            yield ']'
+    
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+def resolve_short_code(short_code):
+    """Return the Resolution for a short code (or NOT_FOUND), using the cache first"""
+    with metrics.stage('cache'):
+        resolution = resolution_cache.get(short_code)
+    if resolution is not None:
+        return resolution
+    return load_resolution(short_code)
+
+def load_resolution(short_code):
+    """
+    Read the Resolution for a short code from the database and cache the
+    answer. While one lookup for a code is running, concurrent callers for
+    the same code wait for its answer instead of querying again. Lookups are
+    keyed by the cache generation too, so a caller arriving after the code
+    was invalidated never waits on a lookup that may have read the old row.
+    """
+    generation = resolution_cache.generation()
+    return resolution_flight.do((short_code, generation), fetch_resolution, short_code, generation)
+
+def refresh_resolution(short_code):
+    """Reload a cached code that is about to expire, off the request thread"""
+    global _refresh_executor, _refresh_pid
+    # Threads do not survive fork(), so each worker needs its own pool
+    if _refresh_pid != os.getpid():
+        with _refresh_lock:
+            if _refresh_pid != os.getpid():
+                _refresh_executor = ThreadPoolExecutor(max_workers=app.config['RESOLUTION_REFRESH_THREADS'],
+                                                       thread_name_prefix='resolution-refresh')
+                _refresh_pid = os.getpid()
+    _refresh_executor.submit(load_resolution, short_code)
+
+def fetch_resolution(short_code, generation=None):
+    """
+    Query the Resolution for a short code and cache the answer (see load_resolution).
+    generation is the cache generation taken before the query.
+    """
+    with metrics.stage('db'), get_db_connection(readonly=True) as conn:
+        url_record = conn.execute(
+            'SELECT id, original_url, is_active, expires_at FROM urls WHERE short_code = ?',
+            (short_code,)
+        ).fetchone()
+    
+    if not url_record:
+        # Remember unknown codes briefly so they cannot hammer the database
+        resolution_cache.set_missing(short_code, generation)
+        return NOT_FOUND
+    
+    resolution = Resolution(url_record['id'], url_record['original_url'],
+                            bool(url_record['is_active']), parse_timestamp(url_record['expires_at']))
+    resolution_cache.set(short_code, resolution, generation=generation)
+    return resolution
+
+def is_live(resolution):
+    """True when a resolution should redirect: it exists, is active and has not expired"""
+    return (resolution is not NOT_FOUND and resolution.is_active
+            and (resolution.expires_at is None or resolution.expires_at > time.time()))
+
+@app.route('/<short_code>')
+def redirect_url(short_code):
+    """Redirect to the original URL and track clicks"""
+    client_ip = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
+    if is_rate_limited(client_ip, app.config['REDIRECT_RATE_LIMIT'],
+                       app.config['REDIRECT_RATE_WINDOW'], name='redirect'):
+        return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
+    
+    resolution = resolve_short_code(short_code)
+    
+    if resolution is NOT_FOUND or not resolution.is_active:
+        flash('Short URL not found or is inactive')
+        return redirect(url_for('index'))
+    
+    if resolution.expires_at is not None and resolution.expires_at <= time.time():
+        flash('Short URL has expired')
+        return redirect(url_for('index'))
+    
+    # Track click in analytics
+    track_click(resolution, short_code)
+    
+    return redirect(resolution.original_url)
+
+@app.route('/preview/<short_code>')
+def preview_url(short_code):
+    """Preview the original URL without redirecting"""
+    resolution = resolve_short_code(short_code)
+    
+    if resolution is NOT_FOUND:
+        return jsonify({'error': 'Short URL not found'}), 404
+    
+    return jsonify({'original_url': resolution.original_url})
+
+@app.route('/qr/<short_code>')
+def generate_qr(short_code):
+    """
+    Generate QR code for a short URL.
+    format=png or svg returns the raw image; the default json format returns
+    a base64 PNG. size (box size), border and ec (L/M/Q/H) tune the render.
+    """
+    if resolve_short_code(short_code) is NOT_FOUND:
+        return jsonify({'error': 'Short URL not found'}), 404
+    
+    fmt = request.args.get('format', 'json')
+    error_correction = request.args.get('ec', 'M').upper()
+    try:
+        box_size = int(request.args.get('size', 10))
+        border = int(request.args.get('border', 5))
+    except ValueError:
+        return jsonify({'error': 'size and border must be integers'}), 400
+    if fmt not in ('json', 'png', 'svg') or error_correction not in ERROR_CORRECTION \
+            or not 1 <= box_size <= 40 or not 0 <= border <= 20:
+        return jsonify({'error': 'Invalid QR code parameters'}), 400
+    
+    short_url = request.host_url + short_code
+    with metrics.stage('qr_render'):
+        etag, image = qr_renderer.get(short_url, 'png' if fmt == 'json' else fmt,
+                                      box_size, border, error_correction)
+    
+    if fmt == 'json':
+        return jsonify({'qr_code': base64.b64encode(image).decode()})
+    
+    response = Response(image, mimetype=CONTENT_TYPES[fmt])
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    # Answers with 304 Not Modified when If-None-Match matches
+    return response.make_conditional(request)
+
+def track_click(resolution, short_code):
+    """Queue a click on a short URL for the background analytics writer"""
+    # Get client information
+    ip_address = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
+    user_agent = request.headers.get('User-Agent')
+    referer = request.headers.get('Referer')
+    
+    # The writer records analytics and updates the click count in batches
+    with metrics.stage('click_enqueue'):
+        click_tracker.record(resolution.url_id, ip_address, user_agent, referer)
+        trending_links.record(short_code)
+        live_feed.publish_click(short_code, resolution.original_url, ip_address)
+
+@app.route('/admin')
+def admin_panel():
+    """Render the admin panel"""
+    return render_template('admin.html')
+
+URL_FIELDS = ['id', 'original_url', 'short_code', 'created_at', 'expires_at', 'clicks', 'is_active']
+USER_FIELDS = ['id', 'username', 'email', 'created_at', 'is_admin']
+
+def parse_bool_arg(value):
+    """Interpret a query string flag such as active=true"""
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+def url_filters(args):
+    """Build SQL filters for the admin URL listing from query arguments"""
+    filters, params = [], []
+    if args.get('active') is not None:
+        filters.append('is_active = ?')
+        params.append(parse_bool_arg(args['active']))
+    if args.get('domain'):
+        filters.append('domain = ?')
+        params.append(args['domain'].lower())
+    if args.get('min_clicks') is not None:
+        filters.append('clicks >= ?')
+        params.append(int(args['min_clicks']))
+    if args.get('max_clicks') is not None:
+        filters.append('clicks <= ?')
+        params.append(int(args['max_clicks']))
+    return filters, params
+
+def with_pending_clicks(rows):
+    """Add the clicks still held in memory by the write-behind counters to URL rows"""
+    for row in rows:
+        row = dict(row)
+        row['clicks'] += click_counters.pending(row['id'])
+        yield row
+
+def list_or_export(table, fields, filters, params, key, filename, transform=None):
+    """
+    Return a page of rows as JSON, or with format=ndjson/csv stream every
+    matching row from a generator without building the full list.
+    transform, if given, maps the row iterator before it is serialized.
+    """
+    fmt = request.args.get('format', 'json')
+    
+    if fmt in ('ndjson', 'csv'):
+        rows = iter_rows(table, fields, filters, params)
+        if transform is not None:
+            rows = transform(rows)
+        if fmt == 'ndjson':
+            return Response(stream_with_context(stream_ndjson(rows, fields)), mimetype='application/x-ndjson')
+        response = Response(stream_with_context(stream_csv(rows, fields)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename={}.csv'.format(filename)
+        return response
+    
+    rows, next_cursor = fetch_page(table, fields, filters, params,
+                                   request.args.get('cursor'),
+                                   parse_page_size(request.args.get('limit')))
+    if transform is not None:
+        rows = list(transform(rows))
+    return jsonify({
+        key: [{field: row[field] for field in fields} for row in rows],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/admin/urls')
+def admin_urls():
+    """
+    Get URLs for admin management, newest first, one page at a time.
+    Filters: active, domain, min_clicks, max_clicks (the click filters see
+    flushed counts only). Pass next_cursor back as cursor for the following
+    page, or format=ndjson/csv to export.
+    """
+    try:
+        filters, params = url_filters(request.args)
+        return list_or_export('urls', URL_FIELDS, filters, params, 'urls', 'urls', with_pending_clicks)
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Invalid filter'}), 400
+
+@app.route('/admin/urls/<int:url_id>/toggle', methods=['POST'])
+def toggle_url(url_id):
+    """Toggle URL active status"""
+    with get_db_connection() as conn:
+        url = conn.execute('SELECT is_active, short_code FROM urls WHERE id = ?', (url_id,)).fetchone()
+        
+        if not url:
+            return jsonify({'error': 'URL not found'}), 404
+        
+        # Toggle status
+        new_status = not url['is_active']
+        conn.execute('UPDATE urls SET is_active = ? WHERE id = ?', (new_status, url_id))
+        conn.commit()
+    
+    # Cached resolutions carry is_active, so drop them on any change
+    resolution_cache.invalidate(url['short_code'])
+    
+    return jsonify({'success': True, 'is_active': new_status})
+
+@app.route('/admin/urls/<int:url_id>/delete', methods=['POST'])
+def delete_url(url_id):
+    """Delete a URL; its raw analytics are removed by a background job"""
+    with get_db_connection() as conn:
+        short_code = conn.execute('SELECT short_code FROM urls WHERE id = ?', (url_id,)).fetchone()
+        
+        if not short_code:
+            return jsonify({'error': 'URL not found'}), 404
+        
+        conn.execute('DELETE FROM urls WHERE id = ?', (url_id,))
+        delete_url_rollups(conn, url_id)
+        conn.commit()
+    
+    # Clear cache
+    resolution_cache.invalidate(short_code['short_code'])
+    
+    job = job_runner.submit('delete_analytics', analytics_retention.delete_url_analytics, [url_id])
+    return jsonify({'success': True, 'job_id': job.id})
+
+def delete_urls_job(job, url_ids):
+    """Delete URLs in chunks, then their raw analytics"""
+    chunk_size = app.config['ANALYTICS_CHUNK_SIZE']
+    deleted_ids = []
+    for start in range(0, len(url_ids), chunk_size):
+        id_list = json.dumps(url_ids[start:start + chunk_size])
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT id, short_code FROM urls WHERE id IN (SELECT value FROM json_each(?))', (id_list,)
+            ).fetchall()
+            conn.execute('DELETE FROM urls WHERE id IN (SELECT value FROM json_each(?))', (id_list,))
+            delete_urls_rollups(conn, [row['id'] for row in rows])
+            conn.commit()
+        for row in rows:
+            resolution_cache.invalidate(row['short_code'])
+        deleted_ids.extend(row['id'] for row in rows)
+        job.progress = len(deleted_ids)
+    analytics_retention.delete_url_analytics(None, deleted_ids)
+
+@app.route('/admin/urls/bulk-delete', methods=['POST'])
+def bulk_delete_urls():
+    """
+    Queue deletion of many URLs; poll /admin/jobs/<job_id> for progress
+    (job status is kept by the worker process that accepted the request)
+    """
+    data = request.get_json(silent=True) or {}
+    url_ids = data.get('ids')
+    # bool is a subclass of int, so true/false would otherwise pass as ids 1 and 0
+    if not isinstance(url_ids, list) or not all(type(url_id) is int for url_id in url_ids):
+        return jsonify({'error': 'ids must be a list of URL ids'}), 400
+    
+    job = job_runner.submit('delete_urls', delete_urls_job, sorted(set(url_ids)))
+    return jsonify({'success': True, 'job_id': job.id}), 202
+
+@app.route('/admin/jobs/<int:job_id>')
+def job_status(job_id):
+    """Get the status of a background job"""
+    job = job_runner.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/admin/users')
+def admin_users():
+    """
+    Get users for admin management, paginated like /admin/urls.
+    Filter: admin. Supports cursor, limit and format=ndjson/csv.
+    """
+    filters, params = [], []
+    if request.args.get('admin') is not None:
+        filters.append('is_admin = ?')
+        params.append(parse_bool_arg(request.args['admin']))
+    try:
+        return list_or_export('users', USER_FIELDS, filters, params, 'users', 'users')
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Invalid filter'}), 400
+
+@app.route('/admin/cache/stats')
+def cache_stats():
+    """Get resolution cache and click pipeline statistics"""
+    return jsonify({
+        'resolution_cache': resolution_cache.stats(),
+        'resolution_singleflight': resolution_flight.stats(),
+        'click_tracker': click_tracker.stats(),
+        'click_counters': click_counters.stats(),
+        'live_feed': live_feed.stats(),
+        'warmup': cache_warmer.stats(),
+        'rate_limiters': [limiter.stats() for limiter in rate_limiters.values()],
+        'screening': security.screening_engine.stats(),
+        'dedup': url_deduplicator.stats() if url_deduplicator is not None else None
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose request, stage, cache and database metrics in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/dashboard')
+def admin_dashboard():
+    """Render the analytics dashboard"""
+    return render_template('dashboard.html')
+
+@app.route('/admin/dashboard/stats')
+def dashboard_stats():
+    """Get statistics data for the dashboard"""
+    with get_db_connection(readonly=True) as conn:
+        # Get total URLs
+        total_urls = conn.execute('SELECT COUNT(*) as count FROM urls').fetchone()['count']
+        
+        # Get total clicks (one row per day in the rollup, which is compacted
+        # right after every click batch and loses a URL's clicks when it is
+        # deleted, plus the clicks still queued)
+        total_clicks = conn.execute('SELECT SUM(clicks) as sum FROM rollup_daily').fetchone()['sum'] or 0
+        total_clicks += click_tracker.queued()
+        
+        # Get active URLs
+        active_urls = conn.execute('SELECT COUNT(*) as count FROM urls WHERE is_active = TRUE').fetchone()['count']
+        
+        # Get top country by clicks
+        top_country = conn.execute('''
+            SELECT country, SUM(clicks) as count
+            FROM rollup_country_daily
+            WHERE country != ''
+            GROUP BY country
+            ORDER BY count DESC
+            LIMIT 1
+        ''').fetchone()
+    
+    top_country_name = top_country['country'] if top_country else 'Unknown'
+    
+    return jsonify({
+        'total_urls': total_urls,
+        'total_clicks': total_clicks,
+        'active_urls': active_urls,
+        'top_country': top_country_name
+    })
+
+@app.route('/admin/dashboard/live')
+def live_dashboard_feed():
+    """
+    Stream dashboard updates as server-sent events: click and new URL counts
+    since the previous update, plus the newest clicks. Load the full numbers
+    once from the other dashboard endpoints, then apply these deltas.
+    """
+    if live_feed.subscriber_count() >= app.config['LIVE_FEED_MAX_SUBSCRIBERS']:
+        return jsonify({'error': 'Too many live dashboards open, please reload later'}), 503
+    
+    subscription = live_feed.subscribe()
+    response = Response(live_feed.stream(subscription, app.config['LIVE_FEED_HEARTBEAT']),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/admin/dashboard/recent')
+def recent_activity():
+    """Get recent activity data for the dashboard"""
+    with get_db_connection(readonly=True) as conn:
+        # Get recent clicks (last 10)
+        recent_clicks = conn.execute('''
+            SELECT a.timestamp, a.ip_address, a.country, u.short_code, u.original_url
+            FROM analytics a
+            JOIN urls u ON a.url_id = u.id
+            ORDER BY a.timestamp DESC
+            LIMIT 10
+        ''').fetchall()
+    
+    # Convert to list of dictionaries
+    activities = []
+    for click in recent_clicks:
+        activities.append({
+            'timestamp': click['timestamp'],
+            'ip_address': click['ip_address'],
+            'country': click['country'] or 'Unknown',
+            'short_code': click['short_code'],
+            'original_url': click['original_url']
+        })
+    
+    return jsonify(activities)
+
+@app.route('/admin/dashboard/chart/clicks-over-time')
+def clicks_over_time_chart_data():
+    """Get clicks over time data for the chart"""
+    with get_db_connection(readonly=True) as conn:
+        # Get clicks per day for the last 7 days
+        chart_data = conn.execute('''
+            SELECT day, clicks
+            FROM rollup_daily
+            WHERE day >= DATE('now', '-7 days')
+            ORDER BY day
+        ''').fetchall()
+    
+    labels = [row['day'] for row in chart_data]
+    clicks = [row['clicks'] for row in chart_data]
+    
+    return jsonify({
+        'labels': labels,
+        'clicks': clicks
+    })
+
+@app.route('/admin/dashboard/chart/geographic-distribution')
+def geographic_distribution_chart_data():
+    """Get geographic distribution data for the chart"""
+    with get_db_connection(readonly=True) as conn:
+        # Get clicks by country
+        chart_data = conn.execute('''
+            SELECT country, SUM(clicks) as clicks
+            FROM rollup_country_daily
+            WHERE country != ''
+            GROUP BY country
+            ORDER BY clicks DESC
+            LIMIT 10
+        ''').fetchall()
+    
+    labels = [row['country'] for row in chart_data]
+    clicks = [row['clicks'] for row in chart_data]
+    
+    return jsonify({
+        'labels': labels,
+        'clicks': clicks
+    })
+
+@app.route('/admin/dashboard/chart/top-urls')
+def top_urls_chart_data():
+    """Get top URLs by clicks data for the chart"""
+    pending = click_counters.pending_many()
+    with get_db_connection(readonly=True) as conn:
+        # Get top URLs by stored clicks, plus every URL with unflushed clicks
+        # (only those can overtake a stored top 10)
+        chart_data = conn.execute('''
+            SELECT id, short_code, clicks
+            FROM urls
+            WHERE clicks > 0
+            ORDER BY clicks DESC
+            LIMIT 10
+        ''').fetchall()
+        if pending:
+            chart_data += conn.execute(
+                'SELECT id, short_code, clicks FROM urls WHERE id IN (SELECT value FROM json_each(?))',
+                (json.dumps(list(pending)),)
+            ).fetchall()
+    
+    totals = {row['id']: (row['short_code'], row['clicks'] + pending.get(row['id'], 0)) for row in chart_data}
+    top = sorted(totals.values(), key=lambda item: item[1], reverse=True)[:10]
+    labels = [short_code for short_code, _ in top]
+    clicks = [count for _, count in top]
+    
+    return jsonify({
+        'labels': labels,
+        'clicks': clicks
+    })
+
+def parse_days_arg(value, default=None, maximum=366):
+    """Interpret a days=N query argument as a number of days up to today"""
+    if value is None:
+        return default
+    days = int(value)
+    if not 1 <= days <= maximum:
+        raise ValueError('days must be between 1 and {}'.format(maximum))
+    return days
+
+@app.route('/admin/urls/<int:url_id>/uniques')
+def url_uniques(url_id):
+    """
+    Approximate unique visitors and referers of a URL, from its HyperLogLog
+    sketches: all time, or the last N days with days=N (daily sketches merged)
+    """
+    try:
+        days = parse_days_arg(request.args.get('days'))
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Invalid days'}), 400
+    
+    with get_db_connection(readonly=True) as conn:
+        if not conn.execute('SELECT 1 FROM urls WHERE id = ?', (url_id,)).fetchone():
+            return jsonify({'error': 'URL not found'}), 404
+        if days is None:
+            rows = conn.execute('SELECT kind, sketch FROM sketch_url WHERE url_id = ?', (url_id,)).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT kind, sketch FROM sketch_url_daily
+                WHERE url_id = ? AND day > DATE('now', ?)
+            ''', (url_id, '-{} days'.format(days))).fetchall()
+    
+    return jsonify({
+        'url_id': url_id,
+        'days': days,
+        'unique_visitors': count_sketch_blobs(row['sketch'] for row in rows if row['kind'] == 'visitors'),
+        'unique_referers': count_sketch_blobs(row['sketch'] for row in rows if row['kind'] == 'referers')
+    })
+
+@app.route('/admin/dashboard/chart/unique-visitors')
+def unique_visitors_chart_data():
+    """Get approximate unique visitors per day, and across the whole range, for the chart"""
+    try:
+        days = parse_days_arg(request.args.get('days'), default=7)
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Invalid days'}), 400
+    
+    with get_db_connection(readonly=True) as conn:
+        chart_data = conn.execute('''
+            SELECT day, sketch
+            FROM sketch_daily
+            WHERE kind = 'visitors' AND day > DATE('now', ?)
+            ORDER BY day
+        ''', ('-{} days'.format(days),)).fetchall()
+    
+    return jsonify({
+        'labels': [row['day'] for row in chart_data],
+        'visitors': [count_sketch_blobs([row['sketch']]) for row in chart_data],
+        # Visitors seen on several days count once here
+        'total_visitors': count_sketch_blobs(row['sketch'] for row in chart_data)
+    })
+
+@app.route('/admin/dashboard/chart/trending')
+def trending_chart_data():
+    """
+    Get the links clicked most in a recent window (window=5m, 1h or 24h;
+    limit=N), estimated in memory by this process without touching the database
+    """
+    window = request.args.get('window', '1h')
+    if window not in trending_links.window_names:
+        return jsonify({'error': 'window must be one of {}'.format(', '.join(trending_links.window_names))}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), TRENDING_MAX_RESULTS))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    top = trending_links.top(window, limit)
+    
+    return jsonify({
+        'window': window,
+        'labels': [short_code for short_code, _ in top],
+        'clicks': [count for _, count in top]
+    })
+
+@app.route('/admin/dashboard/chart/device-types')
+def device_types_chart_data():
+    """Get device types data for the chart"""
+    with get_db_connection(readonly=True) as conn:
+        # Devices are classified when clicks are rolled up
+        chart_data = conn.execute('''
+            SELECT device, SUM(clicks) as clicks
+            FROM rollup_device_daily
+            GROUP BY device
+        ''').fetchall()
+    
+    device_counts = {'Desktop': 0, 'Mobile': 0, 'Tablet': 0, 'Bot': 0, 'Other': 0}
+    for row in chart_data:
+        device_counts[row['device']] = device_counts.get(row['device'], 0) + row['clicks']
+    
+    labels = list(device_counts.keys())
+    clicks = list(device_counts.values())
+    
+    return jsonify({
+        'labels': labels,
+        'clicks': clicks
+    })
+
+@app.route('/admin/login', methods=['POST'])
+def admin_login():
+    """Authenticate admin user"""
+    data = request.get_json() if request.is_json else request.form
+    
+    username = data.get('username')
+    password = data.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'Username and password are required'}), 400
+    
+    # Get user from database
+    with get_db_connection(readonly=True) as conn:
+        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+    
+    if not user or not verify_password(password, user['password_hash']):
+        return jsonify({'error': 'Invalid username or password'}), 401
+    
+    # Set session
+    session['user_id'] = user['id']
+    session['username'] = user['username']
+    session['is_admin'] = user['is_admin']
+    
+    return jsonify({'success': True, 'username': user['username'], 'is_admin': user['is_admin']})
+
+@app.route('/admin/logout', methods=['POST'])
+def admin_logout():
+    """Logout admin user"""
+    session.clear()
+    return jsonify({'success': True})
+
+@app.route('/admin/session', methods=['GET'])
+def admin_session():
+    """Check if user is authenticated"""
+    if 'user_id' in session:
+        return jsonify({
+            'authenticated': True,
+            'user_id': session['user_id'],
+            'username': session['username'],
+            'is_admin': session['is_admin']
+        })
+    else:
+        return jsonify({'authenticated': False}), 401
+
+if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+ASGI serving mode for the redirect hot path.
+
+    uvicorn asgi_app:application --workers 4
+
+/<short_code> and /preview/<short_code> are answered here straight from the
+resolution cache. Cache misses are read from SQLite on a small thread pool
+so the event loop never blocks, and clicks are handed to the click tracker's
+queue without waiting. Everything else goes to the Flask app, including
+redirects that need a flash message (unknown, inactive or expired codes).
+That happens through asgiref's WsgiToAsgi adapter when it is installed.
+Without asgiref, serve the Flask app separately and route only those two
+paths here.
+
+Both apps live in the same process and share the database pools, caches,
+click tracker and metrics.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import HTTPException
+from werkzeug.urls import iri_to_uri
+import app as shortener
+from metrics import registry as metrics
+from resolution_cache import NOT_FOUND
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+JSON_HEADERS = [(b'content-type', b'application/json')]
+
+
+async def send_response(send, status, headers, body=b''):
+    """Send a complete response"""
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def get_header(scope, name):
+    """Return a request header (name in lowercase bytes) as a string, or None"""
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+class RedirectApp:
+    """ASGI app serving redirects and previews, delegating other routes to Flask"""
+
+    def __init__(self, flask_app, db_threads):
+        self.flask_app = flask_app
+        # Match paths with Flask's own rules so both apps agree on what a short code is
+        self._routes = flask_app.url_map.bind('localhost')
+        self.executor = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix='asgi-db')
+        self.fallback = WsgiToAsgi(flask_app) if WsgiToAsgi is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            try:
+                endpoint, args = self._routes.match(scope['path'], scope['method'])
+            except HTTPException:
+                endpoint = None
+            if endpoint == 'redirect_url':
+                await self._timed(self.redirect, '/<short_code>', scope, receive, send, args['short_code'])
+                return
+            if endpoint == 'preview_url':
+                await self._timed(self.preview, '/preview/<short_code>', scope, receive, send, args['short_code'])
+                return
+        await self.delegate(scope, receive, send)
+
+    async def _timed(self, handler, route, scope, receive, send, short_code):
+        """Run a handler and record its latency like MetricsMiddleware does for Flask"""
+        started = time.perf_counter()
+        status = await handler(scope, receive, send, short_code)
+        if status is not None:
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - started, (
+                ('method', scope['method']), ('route', route), ('status', str(status))
+            ))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                shortener.start_background_workers()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def delegate(self, scope, receive, send):
+        """Hand the request to the Flask app"""
+        if self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        elif scope['type'] == 'http':
+            await send_response(send, 404, JSON_HEADERS, b'{"error": "Not found"}')
+
+    async def resolve(self, short_code):
+        """Resolve from the cache, reading SQLite on the thread pool only on a miss"""
+        with metrics.stage('cache'):
+            resolution = shortener.resolution_cache.get(short_code)
+        if resolution is None:
+            loop = asyncio.get_running_loop()
+            resolution = await loop.run_in_executor(self.executor, shortener.load_resolution, short_code)
+        return resolution
+
+    async def redirect(self, scope, receive, send, short_code):
+        """Same contract as the Flask redirect_url view; returns the status sent here"""
+        shortener.start_background_workers()
+        client = scope.get('client')
+        client_ip = get_header(scope, b'x-real-ip') or (client[0] if client else None)
+        if shortener.is_rate_limited(client_ip, shortener.app.config['REDIRECT_RATE_LIMIT'],
+                                     shortener.app.config['REDIRECT_RATE_WINDOW'], name='redirect'):
+            await send_response(send, 429, JSON_HEADERS,
+                                b'{"error": "Rate limit exceeded. Please try again later."}')
+            return 429
+
+        resolution = await self.resolve(short_code)
+        if not shortener.is_live(resolution):
+            # Flask flashes the reason and redirects home (counting the request
+            # against the rate limit a second time)
+            await self.delegate(scope, receive, send)
+            return None
+
+        # Fire and forget: record() only puts the click on the writer's queue
+        with metrics.stage('click_enqueue'):
+            shortener.click_tracker.record(resolution.url_id, client_ip,
+                                           get_header(scope, b'user-agent'), get_header(scope, b'referer'))
+            shortener.trending_links.record(short_code)
+            shortener.live_feed.publish_click(short_code, resolution.original_url, client_ip)
+
+        await send_response(send, 302, [(b'location', iri_to_uri(resolution.original_url).encode('latin-1'))])
+        return 302
+
+    async def preview(self, scope, receive, send, short_code):
+        """Same contract as the Flask preview_url view"""
+        resolution = await self.resolve(short_code)
+        if resolution is NOT_FOUND:
+            await send_response(send, 404, JSON_HEADERS, b'{"error": "Short URL not found"}')
+            return 404
+        body = json.dumps({'original_url': resolution.original_url}).encode('utf-8')
+        await send_response(send, 200, JSON_HEADERS, body)
+        return 200
+
+
+application = RedirectApp(shortener.app, shortener.app.config['ASGI_DB_THREADS'])
@@ -0,0 +1,581 @@
+"""
+Load tests and micro-benchmarks for the hot paths.
+
+    python benchmark.py seed --db bench.db --urls 1000000 --clicks 5000000
+    python benchmark.py load --db bench.db --mode both --concurrency 1,8,32 --output results.json
+    python benchmark.py load --db bench.db --mode asgi --endpoints redirect,preview
+    python benchmark.py load --db bench.db --mode http --url http://127.0.0.1:8000
+    python benchmark.py micro --save-baseline micro_baseline.json
+    python benchmark.py micro --baseline micro_baseline.json
+    python benchmark.py compare results.json baseline.json --tolerance 0.2
+
+Results are JSON: per endpoint, mode and concurrency level the throughput and
+p50/p95/p99 latency; per micro-benchmark the time per call. Runs given a
+--baseline (or the compare command) exit with status 1 on a regression.
+"""
+import argparse
+import asyncio
+import http.client
+import importlib
+import itertools
+import json
+import logging
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Default benchmark settings
+DEFAULT_DB = 'benchmark.db'
+DEFAULT_URLS = 100000
+DEFAULT_CLICKS = 500000
+DEFAULT_DAYS = 30               # Seeded clicks are spread over this many days
+DEFAULT_SEED_BATCH = 50000      # Rows per seeding transaction
+DEFAULT_REQUESTS = 2000         # Requests per endpoint and concurrency level
+DEFAULT_CONCURRENCY = '1,8,32'
+DEFAULT_ITERATIONS = 20000      # Calls per micro-benchmark repeat
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.2         # Allowed slowdown against a baseline (20%)
+SAMPLE_CODES = 10000            # Short codes drawn from the database for redirect/QR traffic
+
+SAMPLE_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (Linux; Android 13; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7; rv:109.0) Gecko/20100101 Firefox/118.0',
+    'Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Safari/604.1',
+    'Googlebot/2.1 (+http://www.google.com/bot.html)',
+]
+SAMPLE_COUNTRIES = ['US', 'GB', 'DE', 'IN', 'BR', 'JP', 'FR', None]
+SAMPLE_REFERERS = ['https://twitter.com/', 'https://www.google.com/', 'https://news.ycombinator.com/', None]
+
+MICRO_URLS = [
+    'https://example.com/some/path?q=1',
+    'http://sub.domain.example.org',
+    'https://malicious-site.com/login',
+    'not a url',
+    'ftp://files.example.com/archive.zip',
+    'https://www.example.co.uk/a/b/c/d/e/f',
+]
+
+
+def use_database(db_path):
+    """Point the app's database module at db_path (before the app is imported)"""
+    import database
+
+    database.DB_FILE = db_path
+    return database
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def environment():
+    """Describe the machine the results came from"""
+    return {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+
+# Seeding
+
+def seed(db_path, url_count, click_count, days=DEFAULT_DAYS, batch_size=DEFAULT_SEED_BATCH):
+    """
+    Fill db_path with url_count URLs and click_count analytics rows.
+    Clicks follow a heavy-tailed distribution over URLs, like real traffic,
+    and the rollups are compacted afterwards so dashboards read warm tables.
+    """
+    from allocator import base62_encode_fixed
+    from rollups import create_rollup_compactor
+    from user_agents import parse_user_agent
+    from utils import url_hash
+
+    database = use_database(db_path)
+    database.init_db()
+    rng = random.Random(42)
+
+    with database.get_db_connection() as conn:
+        first_id = (conn.execute('SELECT MAX(id) FROM urls').fetchone()[0] or 0) + 1
+        conn.execute('PRAGMA synchronous = OFF')
+
+        for start in range(0, url_count, batch_size):
+            rows = []
+            for n in range(first_id + start, first_id + min(url_count, start + batch_size)):
+                domain = 'site{}.example.com'.format(n % 5000)
+                # 7-character codes stay clear of the 6-character codes the allocator hands out
+                url = 'https://{}/page/{}'.format(domain, n)
+                rows.append((url, base62_encode_fixed(n, 7), domain, url_hash(url)))
+            conn.executemany('INSERT INTO urls (original_url, short_code, domain, url_hash) VALUES (?, ?, ?, ?)', rows)
+            conn.commit()
+
+        url_ids = [row[0] for row in conn.execute('SELECT id FROM urls')]
+        agents = [(ua, parse_user_agent(ua)) for ua in SAMPLE_USER_AGENTS]
+        now = time.time()
+        clicks = Counter()
+
+        for start in range(0, click_count, batch_size):
+            rows = []
+            for _ in range(min(batch_size, click_count - start)):
+                url_id = url_ids[min(len(url_ids) - 1, int(rng.paretovariate(1.2)) - 1)] \
+                    if rng.random() < 0.8 else rng.choice(url_ids)
+                user_agent, info = rng.choice(agents)
+                clicks[url_id] += 1
+                rows.append((
+                    url_id,
+                    '10.{}.{}.{}'.format(rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+                    user_agent,
+                    rng.choice(SAMPLE_REFERERS),
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - rng.random() * days * 86400)),
+                    info.device_class, info.os, info.browser, info.is_bot,
+                    rng.choice(SAMPLE_COUNTRIES)
+                ))
+            conn.executemany('''
+                INSERT INTO analytics (url_id, ip_address, user_agent, referer, timestamp,
+                                       device_class, os, browser, is_bot, country)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+
+        conn.executemany('UPDATE urls SET clicks = clicks + ? WHERE id = ?',
+                         [(count, url_id) for url_id, count in clicks.items()])
+        conn.commit()
+        conn.execute('PRAGMA synchronous = NORMAL')
+
+    create_rollup_compactor(chunk_size=batch_size).run_once()
+    return {'urls': url_count, 'clicks': click_count}
+
+
+# Load tests
+
+class InProcessClient:
+    """Drives the Flask app through its test client (no sockets)"""
+
+    def __init__(self, flask_app):
+        self._client = flask_app.test_client()
+
+    def request(self, method, path, headers, body):
+        response = self._client.open(path, method=method, headers=headers, data=body)
+        response.close()
+        return response.status_code
+
+
+class HTTPClient:
+    """Drives a running server over HTTP, reusing the connection where possible"""
+
+    def __init__(self, host, port):
+        self._connection = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, method, path, headers, body):
+        try:
+            self._connection.request(method, path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            self._connection.close()
+            return 0
+        if response.getheader('Connection', '').lower() == 'close':
+            self._connection.close()
+        return response.status
+
+
+class Scenarios:
+    """Request factories for each benchmarked endpoint"""
+
+    def __init__(self, short_codes):
+        self.short_codes = short_codes
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _headers(self):
+        # A distinct client address per request keeps the rate limiters out of the way
+        with self._lock:
+            n = next(self._counter)
+        return {'X-Real-IP': '172.{}.{}.{}'.format((n >> 16) & 255, (n >> 8) & 255, n & 255),
+                'User-Agent': SAMPLE_USER_AGENTS[n % len(SAMPLE_USER_AGENTS)]}, n
+
+    def redirect(self):
+        headers, _ = self._headers()
+        return 'GET', '/' + random.choice(self.short_codes), headers, None, (302,)
+
+    def preview(self):
+        headers, _ = self._headers()
+        return 'GET', '/preview/' + random.choice(self.short_codes), headers, None, (200,)
+
+    def shorten(self):
+        headers, n = self._headers()
+        headers['Content-Type'] = 'application/json'
+        body = json.dumps({'url': 'https://bench.example.com/{}/{}'.format(time.time_ns(), n)})
+        return 'POST', '/shorten', headers, body, (200,)
+
+    def qr(self):
+        headers, _ = self._headers()
+        return 'GET', '/qr/{}?format=png'.format(random.choice(self.short_codes)), headers, None, (200,)
+
+    def dashboard_stats(self):
+        headers, _ = self._headers()
+        return 'GET', '/admin/dashboard/stats', headers, None, (200,)
+
+    def clicks_over_time(self):
+        headers, _ = self._headers()
+        return 'GET', '/admin/dashboard/chart/clicks-over-time', headers, None, (200,)
+
+    def top_urls(self):
+        headers, _ = self._headers()
+        return 'GET', '/admin/dashboard/chart/top-urls', headers, None, (200,)
+
+    def device_types(self):
+        headers, _ = self._headers()
+        return 'GET', '/admin/dashboard/chart/device-types', headers, None, (200,)
+
+
+ENDPOINTS = ['redirect', 'preview', 'shorten', 'qr', 'dashboard_stats', 'clicks_over_time', 'top_urls', 'device_types']
+# Endpoints the ASGI app serves itself (the rest would only measure the Flask fallback)
+ASGI_ENDPOINTS = ['redirect', 'preview']
+MODES = ['inprocess', 'wsgi', 'asgi', 'http']
+
+
+def summarize(results, elapsed, concurrency):
+    """Combine per-worker (latencies, errors) into throughput and latency percentiles"""
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'mean': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            'max': latencies[-1] * 1000 if latencies else 0.0
+        }
+    }
+
+
+def split_requests(total_requests, concurrency):
+    return [total_requests // concurrency + (1 if i < total_requests % concurrency else 0)
+            for i in range(concurrency)]
+
+
+def run_load(client_factory, scenario, concurrency, total_requests):
+    """Issue total_requests from `concurrency` threads and summarize the latencies"""
+    per_worker = split_requests(total_requests, concurrency)
+    start_gate = threading.Barrier(concurrency + 1)
+
+    def worker(count):
+        client = client_factory()
+        latencies, errors = [], 0
+        start_gate.wait()
+        for _ in range(count):
+            method, path, headers, body, expected = scenario()
+            started = time.perf_counter()
+            status = client.request(method, path, headers, body)
+            latencies.append(time.perf_counter() - started)
+            if status not in expected:
+                errors += 1
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker, count) for count in per_worker]
+        start_gate.wait()
+        started = time.perf_counter()
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+    return summarize(results, elapsed, concurrency)
+
+
+async def asgi_request(asgi_app, method, path, headers, body):
+    """Call an ASGI app directly and return the response status"""
+    parts = urlsplit(path)
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': (body or '').encode('utf-8'), 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode('utf-8'),
+        'query_string': parts.query.encode('utf-8'), 'root_path': '',
+        'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers.items()],
+        'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80)
+    }
+    await asgi_app(scope, receive, send)
+    return statuses[0] if statuses else 0
+
+
+def run_asgi_load(asgi_app, scenario, concurrency, total_requests):
+    """Issue total_requests from `concurrency` tasks on one event loop and summarize the latencies"""
+    async def worker(count):
+        latencies, errors = [], 0
+        for _ in range(count):
+            method, path, headers, body, expected = scenario()
+            started = time.perf_counter()
+            status = await asgi_request(asgi_app, method, path, headers, body)
+            latencies.append(time.perf_counter() - started)
+            if status not in expected:
+                errors += 1
+        return latencies, errors
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(worker(count) for count in split_requests(total_requests, concurrency)))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    return summarize(results, elapsed, concurrency)
+
+
+def start_server(flask_app):
+    """Serve the app on a free local port from a background thread"""
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True)
+    thread.start()
+    return server
+
+
+def load(db_path, modes, endpoints, concurrency_levels, total_requests, warmup=100, url=None):
+    """
+    Run every endpoint at every concurrency level in each mode: inprocess
+    (Flask test client), wsgi (local threaded server), asgi (asgi_app called
+    on an event loop) or http (an already running server at url).
+    """
+    use_database(db_path)
+    shortener = importlib.import_module('app')
+    flask_app = shortener.app
+
+    with shortener.get_db_connection(readonly=True) as conn:
+        short_codes = [row[0] for row in conn.execute(
+            'SELECT short_code FROM urls ORDER BY random() LIMIT ?', (SAMPLE_CODES,)
+        )]
+    if not short_codes:
+        raise SystemExit('No URLs in {}; run the seed command first'.format(db_path))
+    scenarios = Scenarios(short_codes)
+
+    results = []
+    for mode in modes:
+        server = None
+        if mode == 'asgi':
+            asgi_app = importlib.import_module('asgi_app').application
+            runner = lambda scenario, concurrency, count: run_asgi_load(asgi_app, scenario, concurrency, count)
+        else:
+            if mode == 'wsgi':
+                server = start_server(flask_app)
+                client_factory = lambda: HTTPClient('127.0.0.1', server.server_port)
+            elif mode == 'http':
+                target = urlsplit(url)
+                client_factory = lambda: HTTPClient(target.hostname, target.port or 80)
+            else:
+                client_factory = lambda: InProcessClient(flask_app)
+            runner = lambda scenario, concurrency, count: run_load(client_factory, scenario, concurrency, count)
+        try:
+            for endpoint in endpoints:
+                if mode == 'asgi' and endpoint not in ASGI_ENDPOINTS:
+                    continue
+                scenario = getattr(scenarios, endpoint)
+                runner(scenario, 1, warmup)
+                for concurrency in concurrency_levels:
+                    result = runner(scenario, concurrency, total_requests)
+                    result.update(endpoint=endpoint, mode=mode)
+                    results.append(result)
+                    print('{:<10} {:<18} c={:<4} {:>9.1f} req/s  p50={:.2f}ms p95={:.2f}ms p99={:.2f}ms errors={}'.format(
+                        mode, endpoint, concurrency, result['throughput'], result['latency_ms']['p50'],
+                        result['latency_ms']['p95'], result['latency_ms']['p99'], result['errors']
+                    ), file=sys.stderr)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    shortener.click_tracker.flush()
+    return results
+
+
+# Micro-benchmarks
+
+def time_calls(func, iterations, repeat):
+    """Return per-call timings (seconds) of func() over several repeats"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        timings.append((time.perf_counter() - started) / iterations)
+    return timings
+
+
+def micro(iterations=DEFAULT_ITERATIONS, repeat=DEFAULT_REPEAT):
+    """Time the helpers every request goes through"""
+    from security import is_malicious_url, is_rate_limited
+    from utils import generate_short_code, is_valid_url
+
+    urls = itertools.cycle(MICRO_URLS)
+    addresses = itertools.cycle(['192.0.2.{}'.format(n) for n in range(256)])
+    cases = {
+        'generate_short_code': generate_short_code,
+        'is_valid_url': lambda: is_valid_url(next(urls)),
+        'is_malicious_url': lambda: is_malicious_url(next(urls)),
+        # A limit that is never reached, so every call takes the full accounting path
+        'is_rate_limited': lambda: is_rate_limited(next(addresses), 10 ** 9, 60, name='benchmark'),
+    }
+
+    results = {}
+    for name, func in cases.items():
+        func()
+        timings = time_calls(func, iterations, repeat)
+        median = statistics.median(timings)
+        results[name] = {
+            'ns_per_op': median * 1e9,
+            'best_ns_per_op': min(timings) * 1e9,
+            'ops_per_sec': 1 / median if median else 0.0,
+            'iterations': iterations,
+            'repeat': repeat
+        }
+        print('{:<22} {:>10.0f} ns/op'.format(name, median * 1e9), file=sys.stderr)
+    return results
+
+
+# Baselines
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare two result documents. Load results regress when p95 latency grows
+    or throughput drops by more than tolerance; micro-benchmarks regress when
+    the time per call grows by more than tolerance. Returns the regressions.
+    """
+    regressions = []
+
+    base_load = {(row['mode'], row['endpoint'], row['concurrency']): row for row in baseline.get('load', [])}
+    for row in current.get('load', []):
+        base = base_load.get((row['mode'], row['endpoint'], row['concurrency']))
+        if base is None:
+            continue
+        name = '{}:{}:c{}'.format(row['mode'], row['endpoint'], row['concurrency'])
+        if row['latency_ms']['p95'] > base['latency_ms']['p95'] * (1 + tolerance):
+            regressions.append({'benchmark': name, 'metric': 'p95_ms',
+                                'baseline': base['latency_ms']['p95'], 'current': row['latency_ms']['p95']})
+        if row['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append({'benchmark': name, 'metric': 'throughput',
+                                'baseline': base['throughput'], 'current': row['throughput']})
+
+    for name, row in current.get('micro', {}).items():
+        base = baseline.get('micro', {}).get(name)
+        if base is not None and row['ns_per_op'] > base['ns_per_op'] * (1 + tolerance):
+            regressions.append({'benchmark': name, 'metric': 'ns_per_op',
+                                'baseline': base['ns_per_op'], 'current': row['ns_per_op']})
+    return regressions
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def write_json(path, document):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(document, handle, indent=2)
+        handle.write('\n')
+
+
+def finish(document, args):
+    """Write the results and compare them against a baseline if one was given"""
+    if getattr(args, 'save_baseline', None):
+        write_json(args.save_baseline, document)
+    if getattr(args, 'baseline', None):
+        document['regressions'] = compare(document, read_json(args.baseline), args.tolerance)
+
+    if args.output:
+        write_json(args.output, document)
+    else:
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 1 if document.get('regressions') else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the URL shortener')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Fill a database with synthetic URLs and clicks')
+    seed_parser.add_argument('--db', default=DEFAULT_DB)
+    seed_parser.add_argument('--urls', type=int, default=DEFAULT_URLS)
+    seed_parser.add_argument('--clicks', type=int, default=DEFAULT_CLICKS)
+    seed_parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+
+    load_parser = commands.add_parser('load', help='Measure endpoint latency and throughput')
+    load_parser.add_argument('--db', default=DEFAULT_DB)
+    load_parser.add_argument('--mode', choices=MODES + ['both', 'all'], default='both',
+                             help='both = inprocess and wsgi; all = inprocess, wsgi and asgi')
+    load_parser.add_argument('--url', help='Base URL of a running server for --mode http')
+    load_parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    load_parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY)
+    load_parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS)
+
+    micro_parser = commands.add_parser('micro', help='Time the request helpers')
+    micro_parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    micro_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+
+    for sub in (load_parser, micro_parser):
+        sub.add_argument('--output', help='Write results here instead of stdout')
+        sub.add_argument('--save-baseline', help='Also store the results as a baseline file')
+        sub.add_argument('--baseline', help='Compare against this baseline; exit 1 on regression')
+        sub.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+
+    compare_parser = commands.add_parser('compare', help='Compare a results file against a baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'seed':
+        started = time.perf_counter()
+        counts = seed(args.db, args.urls, args.clicks, args.days)
+        counts['elapsed'] = time.perf_counter() - started
+        print(json.dumps(counts))
+        return 0
+
+    if args.command == 'compare':
+        regressions = compare(read_json(args.results), read_json(args.baseline), args.tolerance)
+        print(json.dumps({'regressions': regressions}, indent=2))
+        return 1 if regressions else 0
+
+    document = {'environment': environment()}
+    if args.command == 'load':
+        modes = {'both': ['inprocess', 'wsgi'], 'all': ['inprocess', 'wsgi', 'asgi']}.get(args.mode, [args.mode])
+        if 'http' in modes and not args.url:
+            parser.error('--mode http needs --url')
+        endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            parser.error('unknown endpoints: {}'.format(', '.join(sorted(unknown))))
+        levels = [int(level) for level in args.concurrency.split(',')]
+        document['database'] = args.db
+        document['load'] = load(args.db, modes, endpoints, levels, args.requests, url=args.url)
+    else:
+        document['micro'] = micro(args.iterations, args.repeat)
+    return finish(document, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import atexit
+import os
+import threading
+from database import get_db_connection
+
+# Default write-behind settings
+DEFAULT_STRIPES = 16            # Independently locked shards of the counter map
+DEFAULT_FLUSH_INTERVAL = 2.0    # Seconds between flushes of the accumulated deltas
+DEFAULT_MAX_PENDING = 10000     # Unflushed clicks that trigger an early flush
+
+
+class ClickCounters:
+    """
+    Write-behind counters for urls.clicks.
+
+    Clicks are added to an in-memory map of url_id -> delta, split into
+    stripes that each have their own lock, so concurrent redirects rarely
+    contend. A background thread empties the stripes and applies every
+    delta with one executemany per flush, which turns thousands of
+    increments of a viral link into a single UPDATE of its row.
+
+    Reads of click counts add pending() on top of the stored value, so they
+    are current without waiting for a flush.
+
+    Crash loss: deltas live only in memory until they are flushed, so a
+    process that dies without running its exit hooks loses the unflushed
+    clicks. Normally that is one flush_interval of clicks, and about
+    max_pending at most, because crossing max_pending wakes the flusher
+    early. That bound is not enforced, though: a failed flush (e.g. the
+    database was locked) puts its deltas back for the next attempt, so
+    while flushes fail or fall behind the unflushed clicks keep growing.
+    stats() reports them as pending, next to failed_flushes.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._stripes = [({}, threading.Lock()) for _ in range(stripes)]
+        # Per stripe, the deltas taken by the flush that is being written. They
+        # move between the two maps under the stripe lock, so a reader holding
+        # it sees every click exactly once.
+        self._in_flight = [{} for _ in range(stripes)]
+        self._pending_total = 0  # Approximate, only used to trigger early flushes
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        # Counters exposed through stats()
+        self.added = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        """Start the flush thread (no-op if it is already running in this process)"""
+        with self._flush_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Deltas inherited through fork() belong to the parent, which flushes them itself
+                for (deltas, _), in_flight in zip(self._stripes, self._in_flight):
+                    deltas.clear()
+                    in_flight.clear()
+                self._pending_total = 0
+            self._stop_event.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='click-counter-flusher', daemon=True)
+            self._thread.start()
+
+    def add(self, url_id, count=1):
+        """Count clicks for a URL"""
+        if self._thread is None or self._pid != os.getpid():
+            self.start()
+
+        deltas, lock = self._stripes[url_id % len(self._stripes)]
+        with lock:
+            deltas[url_id] = deltas.get(url_id, 0) + count
+        self._pending_total += count
+        self.added += count
+        if self._pending_total >= self.max_pending:
+            self._wake.set()
+
+    def pending(self, url_id):
+        """Clicks counted for a URL that are not in the database yet"""
+        stripe = url_id % len(self._stripes)
+        deltas, lock = self._stripes[stripe]
+        with lock:
+            return deltas.get(url_id, 0) + self._in_flight[stripe].get(url_id, 0)
+
+    def pending_many(self):
+        """Return a copy of every unflushed url_id -> delta"""
+        snapshot = {}
+        for (deltas, lock), in_flight in zip(self._stripes, self._in_flight):
+            with lock:
+                for source in (deltas, in_flight):
+                    for url_id, count in source.items():
+                        snapshot[url_id] = snapshot.get(url_id, 0) + count
+        return snapshot
+
+    def _swap(self):
+        """Move the current deltas in flight, leaving empty maps behind; returns them merged"""
+        taken = {}
+        for (deltas, lock), in_flight in zip(self._stripes, self._in_flight):
+            with lock:
+                in_flight.update(deltas)
+                deltas.clear()
+            taken.update(in_flight)
+        self._pending_total = 0
+        return taken
+
+    def _land(self, failed):
+        """Finish a flush: drop the in-flight deltas, or put them back if the flush failed"""
+        for (deltas, lock), in_flight in zip(self._stripes, self._in_flight):
+            with lock:
+                if failed:
+                    for url_id, count in in_flight.items():
+                        deltas[url_id] = deltas.get(url_id, 0) + count
+                        self._pending_total += count
+                in_flight.clear()
+
+    def flush(self):
+        """Apply the accumulated deltas in one transaction; returns the clicks written"""
+        with self._flush_lock:
+            taken = self._swap()
+            if not taken:
+                return 0
+            try:
+                with get_db_connection() as conn:
+                    try:
+                        conn.executemany('UPDATE urls SET clicks = clicks + ? WHERE id = ?',
+                                         [(count, url_id) for url_id, count in taken.items()])
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+            except Exception:
+                self.failed_flushes += 1
+                self._land(failed=True)
+                return 0
+            self._land(failed=False)
+
+        written = sum(taken.values())
+        self.flushed += written
+        self.flushes += 1
+        return written
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self, timeout=5.0):
+        """Stop the flush thread and write whatever is still pending"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+            self.flush()
+
+    def stats(self):
+        """Return counter map statistics"""
+        return {
+            'pending': self._pending_total,
+            'stripes': len(self._stripes),
+            'added': self.added,
+            'flushed': self.flushed,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes
+        }
+
+
+def create_click_counters(stripes=DEFAULT_STRIPES, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                          max_pending=DEFAULT_MAX_PENDING):
+    """Create click counters that flush when the interpreter exits"""
+    counters = ClickCounters(stripes, flush_interval, max_pending)
+    atexit.register(counters.stop)
+    return counters
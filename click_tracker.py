@@ -0,0 +1,224 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from database import get_db_connection
+from metrics import registry as metrics
+from user_agents import parse_user_agent
+
+# Default tuning for the click ingestion pipeline
+DEFAULT_QUEUE_SIZE = 10000   # Maximum clicks buffered in memory before we start dropping
+DEFAULT_FLUSH_SIZE = 500     # Maximum clicks written per transaction
+DEFAULT_FLUSH_INTERVAL = 1.0 # Seconds between flushes when traffic is light
+DEFAULT_MAX_RETRIES = 5      # Attempts at writing a batch before its clicks are given up
+
+
+class ClickTracker:
+    """
+    Buffer click events in a bounded in-process queue and write them to the
+    database from a background thread.
+
+    Each flush inserts the batch of analytics rows with executemany and
+    coalesces the per-URL click increments, all inside a single transaction,
+    so redirects never wait on SQLite write locks. With click_counters the
+    increments are counted in memory as clicks are recorded instead, and
+    written behind by the counters on their own schedule.
+
+    A batch whose write fails (e.g. the database stayed locked past the busy
+    timeout) is kept and written again, ahead of newer clicks, on the next
+    flushes. After max_retries failed attempts its analytics rows are given
+    up and counted in stats() as lost, alongside the clicks dropped because
+    the queue was full.
+    """
+
+    def __init__(self, max_queue_size=DEFAULT_QUEUE_SIZE, flush_size=DEFAULT_FLUSH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, geo_database=None, click_counters=None,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        self.max_queue_size = max_queue_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        # Optional geoip.GeoDatabase used to fill in country and city
+        self.geo_database = geo_database
+        # Optional click_counters.ClickCounters that owns urls.clicks
+        self.click_counters = click_counters
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        # A batch whose write failed, retried before anything else is taken off the queue
+        self._retry_batch = []
+        self._retry_attempts = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._listeners = []
+
+        # Counters exposed through stats()
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.lost = 0
+
+    def start(self):
+        """Start the background writer (no-op if it is already running in this process)"""
+        with self._lock:
+            # Threads do not survive fork(), so a worker forked from a parent that
+            # already started the writer needs its own thread
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop_event.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='click-writer', daemon=True)
+            self._thread.start()
+
+    def add_listener(self, callback):
+        """
+        Register callback(conn, batch) to run on the writer connection after
+        each batch is committed. Each callback runs in its own transaction, so
+        a failing callback never loses clicks.
+        """
+        self._listeners.append(callback)
+
+    def record(self, url_id, ip_address=None, user_agent=None, referer=None):
+        """
+        Queue a click for asynchronous writing.
+        Returns False when the queue is full and the click was dropped.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            self.start()
+
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._queue.put_nowait((url_id, ip_address, user_agent, referer, timestamp))
+        except queue.Full:
+            # Backpressure: never block the redirect, just count the loss
+            self.dropped += 1
+            return False
+
+        self.enqueued += 1
+        if self.click_counters is not None:
+            self.click_counters.add(url_id)
+        return True
+
+    def flush(self, max_items=None):
+        """
+        Write up to max_items queued clicks (default: flush_size) in one transaction.
+        Returns the number of clicks written.
+        """
+        max_items = max_items or self.flush_size
+        batch, self._retry_batch = self._retry_batch, []
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if not batch:
+            return 0
+
+        try:
+            with metrics.stage('click_write'):
+                self._write_batch(batch)
+        except Exception:
+            self.failed_flushes += 1
+            self._retry_attempts += 1
+            if self._retry_attempts < self.max_retries:
+                self._retry_batch = batch
+            else:
+                self.lost += len(batch)
+                self._retry_attempts = 0
+            return 0
+
+        self._retry_attempts = 0
+        self.written += len(batch)
+        self.flushes += 1
+        return len(batch)
+
+    def _write_batch(self, batch):
+        """Insert analytics rows and apply coalesced click increments"""
+        # Enrichment happens here, on the writer thread, never in the request
+        if self.geo_database is not None:
+            locations = self.geo_database.lookup_many([item[1] for item in batch])
+        else:
+            locations = [(None, None)] * len(batch)
+        # url_id is passed again for the EXISTS check below
+        rows = [item + tuple(parse_user_agent(item[2])) + tuple(location) + (item[0],)
+                for item, location in zip(batch, locations)]
+
+        with get_db_connection() as conn:
+            try:
+                # Clicks queued for a URL that was deleted since are skipped, so they
+                # leave no orphan analytics (or rollup) rows behind
+                conn.executemany(
+                    '''INSERT INTO analytics
+                       (url_id, ip_address, user_agent, referer, timestamp,
+                        device_class, os, browser, is_bot, country, city)
+                       SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                       WHERE EXISTS (SELECT 1 FROM urls WHERE id = ?)''',
+                    rows
+                )
+                if self.click_counters is None:
+                    click_counts = Counter(item[0] for item in batch)
+                    conn.executemany(
+                        'UPDATE urls SET clicks = clicks + ? WHERE id = ?',
+                        [(count, url_id) for url_id, count in click_counts.items()]
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            for callback in self._listeners:
+                try:
+                    callback(conn, batch)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+
+    def _run(self):
+        """Background loop: flush on a full batch or when the interval elapses"""
+        while not self._stop_event.is_set():
+            if self._queue.qsize() < self.flush_size:
+                self._stop_event.wait(self.flush_interval)
+            self.flush()
+
+    def stop(self, timeout=5.0):
+        """Stop the writer and drain every click still in the queue"""
+        self._stop_event.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            if not self.flush():
+                break
+
+    def queued(self):
+        """Clicks accepted but not written to the analytics table yet"""
+        return self._queue.qsize() + len(self._retry_batch)
+
+    def stats(self):
+        """Return pipeline counters"""
+        return {
+            'queued': self.queued(),
+            'max_queue_size': self.max_queue_size,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'written': self.written,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'lost': self.lost
+        }
+
+
+def create_click_tracker(max_queue_size=DEFAULT_QUEUE_SIZE, flush_size=DEFAULT_FLUSH_SIZE,
+                         flush_interval=DEFAULT_FLUSH_INTERVAL, geo_database=None, click_counters=None):
+    """Create a click tracker that drains its queue when the interpreter exits"""
+    tracker = ClickTracker(max_queue_size, flush_size, flush_interval, geo_database, click_counters)
+    atexit.register(tracker.stop)
+    return tracker
@@ -1,79 +1,329 @@
-import sqlite3
-import os
-from contextlib import contextmanager
-from utils import hash_password
-
-# Database file path
-DB_FILE = 'url_shortener.db'
-
-def init_db():
-    """Initialize the database with required tables"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Create URLs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS urls (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                original_url TEXT NOT NULL,
-                short_code TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                clicks INTEGER DEFAULT 0,
-                is_active BOOLEAN DEFAULT TRUE,
-                user_id INTEGER,
-                FOREIGN KEY(user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # Create Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_admin BOOLEAN DEFAULT FALSE
-            )
-        ''')
-        
-        # Create Analytics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analytics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url_id INTEGER NOT NULL,
-                ip_address TEXT,
-                user_agent TEXT,
-                referer TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                country TEXT,
-                city TEXT,
-                FOREIGN KEY(url_id) REFERENCES urls(id)
-            )
-        ''')
-        # Create indexes for better performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_short_code ON urls(short_code);')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_is_active ON urls(is_active);')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_url_id ON analytics(url_id);')
-        
-        # Create a default admin user (in a real application, this should be done through a proper setup process)
-        # For demo purposes, we'll create an admin user with a hashed password
-        hashed_password = hash_password('admin123')
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, password_hash, email, is_admin)
-            VALUES (?, ?, ?, ?)
-        ''', ('admin', hashed_password, 'admin@example.com', True))
-        
-        
-        conn.commit()
-
-@contextmanager
-def get_db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row  # This allows us to access columns by name
-    try:
-        yield conn
-    finally:
-        conn.close()
\ No newline at end of file
+import sqlite3
+import os
+import threading
+import time
+from contextlib import contextmanager
+from utils import hash_password, get_url_host, url_hash
+
+# Database file path
+DB_FILE = 'url_shortener.db'
+
+# Connection pool settings
+POOL_SIZE = 8                    # Maximum read-only connections per process
+BUSY_TIMEOUT = 5.0               # Seconds to wait on a locked database
+MMAP_SIZE = 256 * 1024 * 1024    # Bytes of the database file to memory-map
+CACHE_SIZE = -64000              # Page cache size (negative values are KiB)
+STATEMENT_CACHE_SIZE = 256       # Prepared statements cached per connection
+
+# Stored in PRAGMA user_version once init_db has run. Bump it whenever
+# init_db creates or changes anything, so existing databases pick it up.
+SCHEMA_VERSION = 1
+
+def schema_is_current(conn):
+    """True when init_db already ran against this schema version and the admin user exists"""
+    if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+        return False
+    return conn.execute("SELECT 1 FROM users WHERE username = 'admin'").fetchone() is not None
+
+def init_db():
+    """
+    Initialize the database with required tables. Once the schema is current
+    this returns after two cheap queries, skipping the backfills and bcrypt.
+    """
+    with get_db_connection() as conn:
+        if schema_is_current(conn):
+            return
+        
+        cursor = conn.cursor()
+        
+        # Create URLs table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                original_url TEXT NOT NULL,
+                short_code TEXT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP,
+                clicks INTEGER DEFAULT 0,
+                is_active BOOLEAN DEFAULT TRUE,
+                user_id INTEGER,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Create Users table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                email TEXT UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_admin BOOLEAN DEFAULT FALSE
+            )
+        ''')
+        
+        # Create Analytics table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analytics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url_id INTEGER NOT NULL,
+                ip_address TEXT,
+                user_agent TEXT,
+                referer TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                country TEXT,
+                city TEXT,
+                FOREIGN KEY(url_id) REFERENCES urls(id)
+            )
+        ''')
+        # Create sequence table used to reserve blocks of short code ids
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS code_sequences (
+                name TEXT PRIMARY KEY,
+                next_value INTEGER NOT NULL
+            )
+        ''')
+        
+        # Pre-aggregated analytics for the dashboard
+        from rollups import create_rollup_tables
+        create_rollup_tables(cursor)
+        
+        # Columns added after the original schema
+        from user_agents import add_user_agent_columns
+        add_column_if_missing(cursor, 'urls', 'domain', 'TEXT')
+        add_column_if_missing(cursor, 'urls', 'url_hash', 'INTEGER')
+        add_user_agent_columns(cursor)
+        backfill_url_domains(conn)
+        
+        # Create indexes for better performance
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_short_code ON urls(short_code);')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_is_active ON urls(is_active);')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_url_id ON analytics(url_id);')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_timestamp ON analytics(timestamp);')
+        # Only links that can expire are indexed for the expiry sweeper
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_expires_at ON urls(expires_at) WHERE expires_at IS NOT NULL;')
+        # Keyset pagination for the admin listings
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_created_id ON urls(created_at, id);')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_domain_created_id ON urls(domain, created_at, id);')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created_id ON users(created_at, id);')
+        # Duplicate URL lookups by normalized hash
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_urls_url_hash ON urls(url_hash);')
+        backfill_url_hashes(conn)
+        
+        # Create a default admin user (in a real application, this should be done through a proper setup process)
+        # For demo purposes, we'll create an admin user with a hashed password
+        # (only when it is missing, since bcrypt deliberately takes a while)
+        if not cursor.execute("SELECT 1 FROM users WHERE username = 'admin'").fetchone():
+            hashed_password = hash_password('admin123')
+            cursor.execute('''
+                INSERT OR IGNORE INTO users (username, password_hash, email, is_admin)
+                VALUES (?, ?, ?, ?)
+            ''', ('admin', hashed_password, 'admin@example.com', True))
+        
+        cursor.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+        conn.commit()
+
+def add_column_if_missing(cursor, table, column, definition):
+    """Add a column to an existing table unless it is already there"""
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info({})'.format(table))}
+    if column not in columns:
+        cursor.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(table, column, definition))
+
+def backfill_url_domains(conn, batch_size=10000):
+    """Fill urls.domain for rows created before the column existed"""
+    while True:
+        rows = conn.execute(
+            'SELECT id, original_url FROM urls WHERE domain IS NULL LIMIT ?', (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            'UPDATE urls SET domain = ? WHERE id = ?',
+            [(get_url_host(row[1]) or '', row[0]) for row in rows]
+        )
+        conn.commit()
+
+def backfill_url_hashes(conn, batch_size=10000):
+    """Fill urls.url_hash for rows created before the column existed"""
+    while True:
+        rows = conn.execute(
+            'SELECT id, original_url FROM urls WHERE url_hash IS NULL LIMIT ?', (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            'UPDATE urls SET url_hash = ? WHERE id = ?',
+            [(url_hash(row[1]), row[0]) for row in rows]
+        )
+        conn.commit()
+
+class ConnectionPool:
+    """
+    A small pool of SQLite connections that are configured once and reused.
+
+    Read-only pools hand out up to max_size connections opened with mode=ro;
+    the writer pool holds a single connection guarded by a re-entrant lock,
+    since SQLite only ever allows one writer at a time.
+    """
+
+    def __init__(self, db_file, max_size=POOL_SIZE, readonly=False):
+        self.db_file = db_file
+        self.readonly = readonly
+        self.max_size = max_size if readonly else 1
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.BoundedSemaphore(self.max_size)
+        # Writer state: one connection shared by nested uses within the owning thread
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        # Contention counters: checkouts that had to wait, and for how long in total
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.busy_errors = 0
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        if self.readonly:
+            conn = sqlite3.connect(
+                'file:{}?mode=ro'.format(os.path.abspath(self.db_file)),
+                uri=True,
+                timeout=BUSY_TIMEOUT,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_file,
+                timeout=BUSY_TIMEOUT,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            # WAL lets readers keep going while a write transaction is open
+            conn.execute('PRAGMA journal_mode=WAL')
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA mmap_size={}'.format(MMAP_SIZE))
+        conn.execute('PRAGMA cache_size={}'.format(CACHE_SIZE))
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if self.readonly:
+            conn.execute('PRAGMA query_only=ON')
+        return conn
+
+    def acquire(self):
+        """Check out a connection, blocking while the pool is exhausted"""
+        if not self.readonly:
+            self._wait_for(self._writer_lock)
+            try:
+                if self._writer is None:
+                    self._writer = self._connect()
+            except Exception:
+                self._writer_lock.release()
+                raise
+            self._writer_depth += 1
+            return self._writer
+
+        self._wait_for(self._available)
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return self._connect()
+        except Exception:
+            self._available.release()
+            raise
+
+    def _wait_for(self, lock):
+        """Acquire lock, counting the time spent when it was not immediately free"""
+        if lock.acquire(blocking=False):
+            return
+        started = time.perf_counter()
+        lock.acquire()
+        self.waits += 1
+        self.wait_seconds += time.perf_counter() - started
+
+    def stats(self):
+        """Return pool size and contention counters"""
+        return {
+            'readonly': self.readonly,
+            'max_size': self.max_size,
+            'idle': len(self._idle),
+            'waits': self.waits,
+            'wait_seconds': self.wait_seconds,
+            'busy_errors': self.busy_errors
+        }
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        if not self.readonly:
+            self._writer_depth -= 1
+            if not self._writer_depth and conn.in_transaction:
+                conn.rollback()
+            self._writer_lock.release()
+            return
+
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._idle.append(conn)
+        self._available.release()
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+# Pools are per process: connections must not be shared across a fork
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(readonly=False):
+    """Return the connection pool for this process"""
+    key = (os.getpid(), DB_FILE, readonly)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(DB_FILE, POOL_SIZE, readonly)
+                _pools[key] = pool
+    return pool
+
+def pool_stats():
+    """Return the stats of every pool owned by this process"""
+    return [pool.stats() for key, pool in list(_pools.items()) if key[0] == os.getpid()]
+
+def close_pools():
+    """Close every pooled connection owned by this process"""
+    with _pools_lock:
+        for key, pool in list(_pools.items()):
+            if key[0] == os.getpid():
+                pool.close()
+                del _pools[key]
+
+@contextmanager
+def get_db_connection(readonly=False):
+    """
+    Context manager for pooled database connections.
+    Pass readonly=True for queries that never write so they use the reader pool
+    and never wait behind the writer.
+    """
+    pool = get_pool(readonly)
+    conn = pool.acquire()
+    try:
+        yield conn
+    except sqlite3.OperationalError as e:
+        # busy_timeout ran out while another connection held the lock
+        if 'locked' in str(e) or 'busy' in str(e):
+            pool.busy_errors += 1
+        raise
+    finally:
+        pool.release(conn)
@@ -0,0 +1,139 @@
+import json
+import math
+import threading
+from database import get_db_connection
+from utils import normalize_url, normalized_url_hash
+
+# Default dedup settings
+DEFAULT_CAPACITY = 1000000   # URLs the bloom filter is sized for before it is rebuilt larger
+DEFAULT_ERROR_RATE = 0.01    # Share of unseen URLs that still reach the database
+
+# Only links that are live and never expire are handed out again (the index is
+# named because the planner otherwise prefers the far less selective is_active one)
+FIND_DUPLICATES_SQL = '''
+    SELECT id, short_code, original_url, url_hash FROM urls INDEXED BY idx_urls_url_hash
+    WHERE url_hash IN (SELECT value FROM json_each(?)) AND is_active = 1 AND expires_at IS NULL
+'''
+
+
+class BloomFilter:
+    """
+    Bit-array bloom filter over 64-bit URL hashes. The k bit positions come
+    from the two 32-bit halves of the hash (double hashing), since the hash is
+    already uniformly distributed.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        key &= 0xFFFFFFFFFFFFFFFF
+        low, high = key & 0xFFFFFFFF, (key >> 32) | 1
+        return [(low + i * high) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class UrlDeduplicator:
+    """
+    Finds an existing short code for a URL that was already shortened.
+
+    URLs are compared by their normalized form (see utils.normalize_url),
+    looked up through the indexed urls.url_hash column. A bloom filter of
+    every known hash answers "never seen" without touching SQLite, which is
+    the common case for fresh URLs. Each process keeps its own filter and
+    picks up rows inserted by other processes on refresh(); until then such
+    a URL can only be shortened twice, never resolved wrongly.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.skipped = 0
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self, job=None):
+        """
+        Add the hashes of rows inserted since the last refresh. When the
+        filter holds more than its capacity it is rebuilt at twice the size.
+        """
+        with self._lock:
+            if self._bloom.count > self._bloom.capacity:
+                self._bloom = BloomFilter(self._bloom.capacity * 2, self.error_rate)
+                self._last_id = 0
+            bloom, last_id = self._bloom, self._last_id
+
+            with get_db_connection(readonly=True) as conn:
+                for row in conn.execute(
+                    'SELECT id, url_hash FROM urls WHERE id > ? AND url_hash IS NOT NULL ORDER BY id', (last_id,)
+                ):
+                    bloom.add(row[1])
+                    last_id = row[0]
+            self._last_id = last_id
+
+    def add(self, url):
+        """Record a newly shortened URL"""
+        self._bloom.add(normalized_url_hash(normalize_url(url)))
+
+    def find(self, url):
+        """Return (url_id, short_code, original_url) of an existing equivalent URL, or None"""
+        return self.find_many([url])[0]
+
+    def find_many(self, urls):
+        """Look up a batch of URLs with at most one query; returns a list aligned with urls"""
+        normalized = [normalize_url(url) for url in urls]
+        keys = [normalized_url_hash(form) for form in normalized]
+        candidates = {key for key in keys if key in self._bloom}
+        self.skipped += sum(1 for key in keys if key not in candidates)
+        if not candidates:
+            return [None] * len(urls)
+
+        matches = {}
+        with get_db_connection(readonly=True) as conn:
+            for row in conn.execute(FIND_DUPLICATES_SQL, (json.dumps(sorted(candidates)),)):
+                # Confirm on the normalized form so a 64-bit hash collision cannot merge two URLs
+                matches.setdefault((row['url_hash'], normalize_url(row['original_url'])),
+                                   (row['id'], row['short_code'], row['original_url']))
+
+        results = []
+        for key, form in zip(keys, normalized):
+            if key not in candidates:
+                results.append(None)
+                continue
+            self.lookups += 1
+            match = matches.get((key, form))
+            if match:
+                self.hits += 1
+            else:
+                self.misses += 1
+            results.append(match)
+        return results
+
+    def stats(self):
+        """Return bloom filter size and lookup counters"""
+        return {
+            'bloom_entries': self._bloom.count,
+            'bloom_capacity': self._bloom.capacity,
+            'bloom_bytes': len(self._bloom._bits),
+            'skipped': self.skipped,
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,116 @@
+import calendar
+import json
+import time
+from datetime import datetime, timezone
+from database import get_db_connection
+
+# Default expiry settings
+DEFAULT_MAX_TTL = 10 * 365 * 86400  # Longest lifetime a link can be given (seconds)
+DEFAULT_BATCH_SIZE = 500            # Links deactivated per sweeper transaction
+
+# Same layout as SQLite's CURRENT_TIMESTAMP, so expires_at compares as text
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_timestamp(epoch_seconds):
+    """Format epoch seconds as a UTC timestamp string for the database"""
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch_seconds))
+
+
+def parse_timestamp(value):
+    """Convert a stored UTC timestamp string to epoch seconds (None stays None)"""
+    if value is None:
+        return None
+    return calendar.timegm(time.strptime(value[:19], TIMESTAMP_FORMAT))
+
+
+def parse_expiry(data, max_ttl=DEFAULT_MAX_TTL, now=None):
+    """
+    Read the requested expiry from /shorten input.
+
+    Accepts either ttl (seconds from now) or expires_at (ISO 8601; naive times
+    are taken as UTC). Returns the expiry as a database timestamp string, or
+    None when the link should never expire. Raises ValueError for bad input.
+    """
+    now = time.time() if now is None else now
+    ttl = data.get('ttl')
+    expires_at = data.get('expires_at')
+    if ttl in (None, '') and expires_at in (None, ''):
+        return None
+    if ttl not in (None, '') and expires_at not in (None, ''):
+        raise ValueError('Provide either ttl or expires_at, not both')
+
+    if ttl not in (None, ''):
+        # bool is a subclass of int, so true would otherwise be a 1 second ttl
+        if isinstance(ttl, bool):
+            raise ValueError('ttl must be a whole number of seconds')
+        try:
+            ttl = int(ttl)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError('ttl must be a whole number of seconds')
+        # Checked before adding to now, so huge integers never reach float arithmetic
+        if ttl > max_ttl:
+            raise ValueError('Expiry is too far in the future')
+        expires = now + ttl
+    else:
+        try:
+            moment = datetime.fromisoformat(str(expires_at).strip().replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('expires_at must be an ISO 8601 date and time')
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        expires = moment.timestamp()
+
+    if expires <= now:
+        raise ValueError('Expiry must be in the future')
+    if expires - now > max_ttl:
+        raise ValueError('Expiry is too far in the future')
+    return format_timestamp(expires)
+
+
+class ExpirySweeper:
+    """
+    Deactivates links whose expires_at has passed and evicts them from the
+    resolution cache.
+
+    Redirects check expires_at themselves, so the sweeper is not needed for
+    correctness; it keeps is_active (and the admin listings) truthful. Each
+    batch is found through the partial index on expires_at and updated in
+    its own short write transaction.
+    """
+
+    def __init__(self, resolution_cache, batch_size=DEFAULT_BATCH_SIZE):
+        self.resolution_cache = resolution_cache
+        self.batch_size = batch_size
+        self.expired = 0
+
+    def sweep(self, job=None, now=None):
+        """Deactivate every expired link; returns the number deactivated"""
+        cutoff = format_timestamp(time.time() if now is None else now)
+        total = 0
+        while True:
+            with get_db_connection() as conn:
+                # Without statistics the planner prefers the is_active index, which
+                # covers nearly every row; the expiry range is the selective part
+                rows = conn.execute(
+                    'SELECT id, short_code FROM urls INDEXED BY idx_urls_expires_at '
+                    'WHERE expires_at <= ? AND is_active = 1 LIMIT ?',
+                    (cutoff, self.batch_size)
+                ).fetchall()
+                if rows:
+                    conn.execute(
+                        'UPDATE urls SET is_active = 0 WHERE id IN (SELECT value FROM json_each(?))',
+                        (json.dumps([row['id'] for row in rows]),)
+                    )
+                    conn.commit()
+
+            for row in rows:
+                self.resolution_cache.invalidate(row['short_code'])
+            total += len(rows)
+            if job is not None:
+                job.progress = total
+            if len(rows) < self.batch_size:
+                break
+
+        self.expired += total
+        return total
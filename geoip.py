@@ -0,0 +1,190 @@
+import bisect
+import csv
+import ipaddress
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+# Result of a lookup; both fields are None for unknown addresses
+GeoLocation = namedtuple('GeoLocation', ['country', 'city'])
+UNKNOWN = GeoLocation(None, None)
+
+# Compiled database layout (native byte order for the 32-bit arrays, so they
+# can be used straight from the memory map):
+#   header: magic, IPv4 range count, IPv6 range count, location count
+#   IPv4 starts, IPv4 ends, IPv4 location indexes   (uint32 arrays)
+#   IPv6 starts, IPv6 ends                          (16-byte big-endian keys)
+#   IPv6 location indexes                           (uint32 array)
+#   location offsets (uint32, count + 1), location strings ("country\tcity")
+MAGIC = b'GEO1'
+HEADER = struct.Struct('=4sIII')
+
+DEFAULT_CACHE_SIZE = 65536  # Hot IPs remembered per process
+
+
+class _KeyColumn:
+    """Sequence view of fixed-width 16-byte keys inside a buffer, for bisect"""
+
+    def __init__(self, buffer, offset, count):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        start = self._offset + index * 16
+        return bytes(self._buffer[start:start + 16])
+
+
+class GeoDatabase:
+    """
+    IP range -> (country, city) lookups from a compiled database file.
+
+    The file is memory-mapped read-only, so every worker process shares the
+    same pages through the OS page cache, and lookups are a binary search
+    over sorted range starts.
+    """
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+
+        magic, v4_count, v6_count, location_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a compiled geo database'.format(path))
+
+        offset = HEADER.size
+        self._v4_starts = buffer[offset:offset + 4 * v4_count].cast('I')
+        offset += 4 * v4_count
+        self._v4_ends = buffer[offset:offset + 4 * v4_count].cast('I')
+        offset += 4 * v4_count
+        self._v4_locations = buffer[offset:offset + 4 * v4_count].cast('I')
+        offset += 4 * v4_count
+
+        self._v6_starts = _KeyColumn(buffer, offset, v6_count)
+        offset += 16 * v6_count
+        self._v6_ends = _KeyColumn(buffer, offset, v6_count)
+        offset += 16 * v6_count
+        self._v6_locations = buffer[offset:offset + 4 * v6_count].cast('I')
+        offset += 4 * v6_count
+
+        location_offsets = buffer[offset:offset + 4 * (location_count + 1)].cast('I')
+        offset += 4 * (location_count + 1)
+        # Location strings are few and small, so decode them once
+        self._locations = []
+        for index in range(location_count):
+            raw = bytes(buffer[offset + location_offsets[index]:offset + location_offsets[index + 1]])
+            country, _, city = raw.decode('utf-8').partition('\t')
+            self._locations.append(GeoLocation(country or None, city or None))
+
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, ip_address):
+        """Return the GeoLocation for an IP address string"""
+        if not ip_address:
+            return UNKNOWN
+        try:
+            address = ipaddress.ip_address(ip_address.strip())
+        except ValueError:
+            return UNKNOWN
+
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        if address.version == 4:
+            value = int(address)
+            index = bisect.bisect_right(self._v4_starts, value) - 1
+            if index >= 0 and value <= self._v4_ends[index]:
+                return self._locations[self._v4_locations[index]]
+            return UNKNOWN
+
+        key = address.packed
+        index = bisect.bisect_right(self._v6_starts, key) - 1
+        if index >= 0 and key <= self._v6_ends[index]:
+            return self._locations[self._v6_locations[index]]
+        return UNKNOWN
+
+    def lookup_many(self, ip_addresses):
+        """Look up a batch of addresses, resolving each distinct address once"""
+        resolved = {ip: self.lookup(ip) for ip in set(ip_addresses)}
+        return [resolved[ip] for ip in ip_addresses]
+
+    def stats(self):
+        """Return range counts and cache counters"""
+        info = self.lookup.cache_info()
+        return {
+            'ipv4_ranges': len(self._v4_starts),
+            'ipv6_ranges': len(self._v6_starts),
+            'locations': len(self._locations),
+            'cache_hits': info.hits,
+            'cache_misses': info.misses
+        }
+
+
+def read_ranges(source_path):
+    """
+    Yield (start, end, country, city) from a CSV file with either
+    'network/prefix,country,city' or 'start_ip,end_ip,country,city' rows.
+    Lines starting with # are skipped.
+    """
+    with open(source_path, newline='', encoding='utf-8') as handle:
+        for row in csv.reader(handle):
+            if not row or row[0].startswith('#'):
+                continue
+            if '/' in row[0]:
+                network = ipaddress.ip_network(row[0].strip(), strict=False)
+                start, end = network[0], network[-1]
+                rest = row[1:]
+            else:
+                start = ipaddress.ip_address(row[0].strip())
+                end = ipaddress.ip_address(row[1].strip())
+                rest = row[2:]
+            country = rest[0].strip() if len(rest) > 0 else ''
+            city = rest[1].strip() if len(rest) > 1 else ''
+            yield start, end, country, city
+
+
+def build_database(source_path, output_path):
+    """Compile a CSV of IP ranges into the memory-mappable database format"""
+    locations = {}
+    v4, v6 = [], []
+    for start, end, country, city in read_ranges(source_path):
+        location = locations.setdefault((country, city), len(locations))
+        if start.version == 4:
+            v4.append((int(start), int(end), location))
+        else:
+            v6.append((start.packed, end.packed, location))
+    v4.sort()
+    v6.sort()
+
+    strings = [('{}\t{}'.format(country, city)).encode('utf-8') for country, city in locations]
+    offsets = array('I', [0])
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+
+    with open(output_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(v4), len(v6), len(strings)))
+        out.write(array('I', (row[0] for row in v4)).tobytes())
+        out.write(array('I', (row[1] for row in v4)).tobytes())
+        out.write(array('I', (row[2] for row in v4)).tobytes())
+        out.write(b''.join(row[0] for row in v6))
+        out.write(b''.join(row[1] for row in v6))
+        out.write(array('I', (row[2] for row in v6)).tobytes())
+        out.write(offsets.tobytes())
+        out.write(b''.join(strings))
+    return len(v4), len(v6)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python geoip.py <ranges.csv> <output.dat>')
+        sys.exit(1)
+    v4_count, v6_count = build_database(sys.argv[1], sys.argv[2])
+    print('Compiled {} IPv4 and {} IPv6 ranges'.format(v4_count, v6_count))
@@ -0,0 +1,128 @@
+import hashlib
+import math
+
+DEFAULT_PRECISION = 12  # 4096 registers, about 1.6% standard error
+
+# Serialized forms: a format byte and the precision, then either every
+# register (dense) or (index, rank) pairs for the non-zero ones (sparse),
+# which keeps the sketches of links with few visitors down to a few bytes
+DENSE = b'D'
+SPARSE = b'S'
+SPARSE_ENTRY_SIZE = 3
+
+
+def hash_value(value):
+    """64-bit hash of a string, as added to a sketch"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """
+    HyperLogLog cardinality sketch over 64-bit hashes.
+
+    Small sketches keep only their non-zero registers in a dict and switch
+    to a full register array once that would be smaller. Sketches of the
+    same precision merge by taking the register-wise maximum, so a sketch
+    per day can be combined into any range of days.
+    """
+
+    __slots__ = ('precision', 'registers', 'sparse')
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers
+        self.sparse = {} if registers is None else None
+
+    def _densify(self):
+        self.registers = bytearray(1 << self.precision)
+        for index, rank in self.sparse.items():
+            self.registers[index] = rank
+        self.sparse = None
+
+    def _check_size(self):
+        if len(self.sparse) * SPARSE_ENTRY_SIZE >= 1 << self.precision:
+            self._densify()
+
+    def add_hash(self, key):
+        index = key >> (64 - self.precision)
+        rest = key & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if self.sparse is not None:
+            if rank > self.sparse.get(index, 0):
+                self.sparse[index] = rank
+                self._check_size()
+        elif rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value):
+        self.add_hash(hash_value(value))
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches of different precision')
+        if other.sparse is not None:
+            if self.sparse is not None:
+                for index, rank in other.sparse.items():
+                    if rank > self.sparse.get(index, 0):
+                        self.sparse[index] = rank
+                self._check_size()
+            else:
+                for index, rank in other.sparse.items():
+                    if rank > self.registers[index]:
+                        self.registers[index] = rank
+            return self
+        if self.sparse is not None:
+            self._densify()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimated number of distinct values added"""
+        m = 1 << self.precision
+        if self.sparse is not None:
+            # Most registers are still empty, where linear counting is the accurate estimate
+            return int(round(m * math.log(m / (m - len(self.sparse)))))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        header = bytes([self.precision])
+        if self.sparse is not None:
+            return SPARSE + header + b''.join(index.to_bytes(2, 'big') + bytes([rank])
+                                              for index, rank in sorted(self.sparse.items()))
+        return DENSE + header + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        kind, precision, body = data[:1], data[1], data[2:]
+        if kind == DENSE:
+            return cls(precision, bytearray(body))
+        if kind != SPARSE:
+            raise ValueError('Unknown sketch format')
+        sketch = cls(precision)
+        for offset in range(0, len(body), SPARSE_ENTRY_SIZE):
+            sketch.sparse[int.from_bytes(body[offset:offset + 2], 'big')] = body[offset + 2]
+        return sketch
+
+
+def merge_sketch_blobs(first, second):
+    """Merge two serialized sketches; either may be NULL (registered as an SQL function)"""
+    if first is None or second is None:
+        return first if second is None else second
+    return HyperLogLog.from_bytes(first).merge(HyperLogLog.from_bytes(second)).to_bytes()
+
+
+def count_sketch_blobs(blobs):
+    """Estimated distinct values across serialized sketches (0 when there are none)"""
+    merged = None
+    for blob in blobs:
+        if blob is None:
+            continue
+        sketch = HyperLogLog.from_bytes(blob)
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged.count() if merged is not None else 0
@@ -0,0 +1,134 @@
+import atexit
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+MAX_FINISHED_JOBS = 1000  # Finished jobs kept for status queries
+
+
+class Job:
+    """A unit of background work and its progress"""
+
+    def __init__(self, job_id, name, func, args):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.status = 'queued'
+        self.progress = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobRunner:
+    """
+    Run slow maintenance work (bulk deletes, archive moves) on one background
+    thread, so admin requests return immediately and the work proceeds in
+    small transactions that never hold the write lock for long.
+
+    A job function receives the Job as its first argument and may update
+    job.progress as it goes.
+
+    Jobs, their ids and their status live in the process that submitted
+    them. With several workers, a status query served by another worker
+    finds no job or a different job with the same id, so clients polling
+    /admin/jobs/<id> must reach the worker that accepted the job (or run
+    a single worker process).
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, name, func, *args):
+        """Queue a job and return it"""
+        job = Job(next(self._ids), name, func, args)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._ensure_thread()
+        self._queue.put(job)
+        return job
+
+    def every(self, interval, name, func, *args):
+        """
+        Submit a job every `interval` seconds, skipping a round while the
+        previous run is still queued or running.
+        """
+        state = {'job': None}
+
+        def schedule():
+            previous = state['job']
+            if previous is None or previous.finished_at is not None:
+                state['job'] = self.submit(name, func, *args)
+            timer = threading.Timer(interval, schedule)
+            timer.daemon = True
+            timer.start()
+
+        timer = threading.Timer(interval, schedule)
+        timer.daemon = True
+        timer.start()
+
+    def get(self, job_id):
+        """Return a job by id, or None"""
+        return self._jobs.get(job_id)
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='job-runner', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.status = 'running'
+            try:
+                job.func(job, *job.args)
+                job.status = 'done'
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+            job.finished_at = time.time()
+
+    def stop(self, timeout=5.0):
+        """Finish queued jobs (up to timeout) and stop the worker thread"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+
+def create_job_runner():
+    """Create a job runner that finishes its queue when the interpreter exits"""
+    runner = JobRunner()
+    atexit.register(runner.stop)
+    return runner
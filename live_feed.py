@@ -0,0 +1,183 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Default live feed settings
+DEFAULT_BUFFER_SIZE = 1000      # Recent events kept in the ring buffer
+DEFAULT_INTERVAL = 1.0          # Seconds between updates sent to dashboards
+DEFAULT_RECENT_SIZE = 10        # Recent clicks included in each update
+DEFAULT_HEARTBEAT = 15.0        # Seconds of silence before a keep-alive comment is sent
+
+
+class Subscription:
+    """
+    One connected dashboard. Updates the consumer has not picked up yet are
+    merged into a single pending update, so a slow consumer costs the same
+    memory as a fast one and simply sees bigger deltas.
+    """
+
+    def __init__(self, recent_size):
+        self.recent_size = recent_size
+        self._pending = None
+        self._condition = threading.Condition()
+        self.coalesced = 0
+
+    def offer(self, update):
+        with self._condition:
+            if self._pending is None:
+                self._pending = dict(update)
+            else:
+                self.coalesced += 1
+                pending = self._pending
+                pending['clicks'] += update['clicks']
+                pending['urls'] += update['urls']
+                pending['recent'] = (update['recent'] + pending['recent'])[:self.recent_size]
+            self._condition.notify()
+
+    def take(self, timeout):
+        """Wait up to timeout seconds for the next update; None on timeout"""
+        with self._condition:
+            if self._pending is None:
+                self._condition.wait(timeout)
+            update, self._pending = self._pending, None
+        return update
+
+
+class LiveFeed:
+    """
+    In-process publish/subscribe feed for the live dashboard.
+
+    The click and shorten paths publish events into a bounded ring buffer,
+    which is just an append. A single producer thread turns the events
+    published since its last pass into one update (click and new URL
+    deltas, plus the newest clicks) and offers that same update to every
+    subscriber. Nothing queues up per subscriber (see Subscription), and
+    nothing here touches SQLite.
+
+    Events are per process: with several workers a dashboard sees the
+    traffic of the worker serving its stream.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, interval=DEFAULT_INTERVAL,
+                 recent_size=DEFAULT_RECENT_SIZE, geo_database=None):
+        self.interval = interval
+        self.recent_size = recent_size
+        # Optional geoip.GeoDatabase used to fill in the country of recent clicks
+        self.geo_database = geo_database
+
+        # (sequence, short_code, original_url, ip_address, timestamp)
+        self._events = deque(maxlen=buffer_size)
+        self._sequence = itertools.count(1)
+        self._urls = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        # Counters exposed through stats()
+        self.updates = 0
+
+    def publish_click(self, short_code, original_url, ip_address):
+        """Record a click (called on the redirect path, so it only appends)"""
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        # The sequence number lets the producer count clicks the ring buffer already dropped
+        self._events.append((next(self._sequence), short_code, original_url, ip_address, timestamp))
+
+    def publish_urls(self, count=1):
+        """Record newly shortened URLs"""
+        with self._lock:
+            self._urls += count
+
+    def subscribe(self):
+        """Register a consumer and make sure the producer runs in this process"""
+        self._ensure_thread()
+        subscription = Subscription(self.recent_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+            self._thread.start()
+
+    def _last_sequence(self):
+        try:
+            return self._events[-1][0]
+        except IndexError:
+            return 0
+
+    def _run(self):
+        sequence_seen, urls_seen = self._last_sequence(), self._urls
+        while True:
+            time.sleep(self.interval)
+            sequence, urls = max(self._last_sequence(), sequence_seen), self._urls
+            if sequence == sequence_seen and urls == urls_seen:
+                continue
+            update = self._build_update(sequence_seen, sequence - sequence_seen, urls - urls_seen)
+            sequence_seen, urls_seen = sequence, urls
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscription in subscribers:
+                subscription.offer(update)
+            self.updates += 1
+
+    def _build_update(self, sequence_seen, clicks, urls):
+        """One update for every subscriber: deltas since the last pass and the newest clicks"""
+        events = []
+        for event in reversed(list(self._events)):
+            if len(events) == self.recent_size or event[0] <= sequence_seen:
+                break
+            events.append(event)
+        if self.geo_database is not None:
+            locations = self.geo_database.lookup_many([event[3] for event in events])
+        else:
+            locations = [(None, None)] * len(events)
+        recent = [{
+            'short_code': short_code,
+            'original_url': original_url,
+            'ip_address': ip_address,
+            'country': location[0] or 'Unknown',
+            'timestamp': timestamp
+        } for (_, short_code, original_url, ip_address, timestamp), location in zip(events, locations)]
+        return {'clicks': clicks, 'urls': urls, 'recent': recent}
+
+    def stream(self, subscription, heartbeat=DEFAULT_HEARTBEAT):
+        """Yield server-sent events for a subscription until the client goes away"""
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield 'retry: {}\n\n'.format(int(self.interval * 1000) * 3)
+            while True:
+                update = subscription.take(heartbeat)
+                if update is None:
+                    # Comments keep proxies from closing the stream and reveal disconnected clients
+                    yield ': keep-alive\n\n'
+                else:
+                    yield 'event: update\ndata: {}\n\n'.format(json.dumps(update))
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        """Return feed statistics"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'buffered_events': len(self._events),
+            'updates': self.updates,
+            'coalesced': sum(subscription.coalesced for subscription in subscribers)
+        }
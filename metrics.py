@@ -0,0 +1,291 @@
+import bisect
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Latency histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Default slow request profiler settings
+DEFAULT_PROFILE_THRESHOLD = 0.5   # Requests slower than this (seconds) have their samples dumped
+DEFAULT_PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+
+
+class Histogram:
+    """Cumulative-on-export latency histogram with a fixed set of buckets"""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+
+class _StageTimer:
+    """Context manager that records its elapsed time into a histogram"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                                            .replace('\n', '\\n')) for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: labelled histograms and counters recorded on the hot
+    path, plus collectors that turn existing stats() dictionaries into
+    gauges and counters when /metrics is scraped.
+
+    Recording is a dict lookup and a short lock per observation, cheap enough
+    to leave on in production. Labels are tuples of (name, value) pairs so
+    they can be used as dict keys without sorting.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        """Set the HELP text of a metric"""
+        self._help[name] = help_text
+
+    def histogram(self, name, labels=()):
+        """Return the histogram for name and labels, creating it on first use"""
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, name, value, labels=()):
+        self.histogram(name, labels).observe(value)
+
+    def inc(self, name, amount=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def stage(self, stage):
+        """Time a block of work as one stage of request handling"""
+        return _StageTimer(self.histogram('stage_duration_seconds', (('stage', stage),)))
+
+    def add_collector(self, collector):
+        """
+        Register a callable returning [(name, type, help, [(labels, value)])],
+        evaluated on every scrape.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+
+        def header(name, kind, help_text=None):
+            help_text = help_text or self._help.get(name)
+            if help_text:
+                lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        current = None
+        for (name, labels), histogram in histograms:
+            if name != current:
+                header(name, 'histogram')
+                current = name
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total, count = histogram.total, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append('{}_bucket{} {}'.format(name, _format_labels(labels, ('le', _format_value(bound))),
+                                                     cumulative))
+            lines.append('{}_sum{} {}'.format(name, _format_labels(labels), _format_value(total)))
+            lines.append('{}_count{} {}'.format(name, _format_labels(labels), count))
+
+        current = None
+        for (name, labels), value in counters:
+            if name != current:
+                header(name, 'counter')
+                current = name
+            lines.append('{}{} {}'.format(name, _format_labels(labels), _format_value(value)))
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                header(name, kind, help_text)
+                for labels, value in samples:
+                    lines.append('{}{} {}'.format(name, _format_labels(labels), _format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    WSGI middleware recording the latency of every request, labelled by
+    method, route and status. The route comes from environ['metrics.route']
+    (set by the app once routing is done) so labels stay low-cardinality.
+    Streaming responses are timed until the app returns the body iterator.
+    """
+
+    def __init__(self, wsgi_app, registry, profiler=None):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        status_holder = []
+
+        def recording_start_response(status, headers, exc_info=None):
+            status_holder.append(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        if self.profiler is not None:
+            self.profiler.begin()
+        started = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, recording_start_response)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = environ.get('metrics.route', 'unmatched')
+            self.registry.observe('http_request_duration_seconds', elapsed, (
+                ('method', environ.get('REQUEST_METHOD', '')),
+                ('route', route),
+                ('status', status_holder[0] if status_holder else '500')
+            ))
+            if self.profiler is not None:
+                self.profiler.end(elapsed, '{} {}'.format(environ.get('REQUEST_METHOD', ''), route))
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return '{}:{}'.format(os.path.basename(code.co_filename), code.co_name)
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler for slow requests.
+
+    While enabled, a background thread samples the stacks of every thread
+    that is serving a request. When a request ends slower than threshold, its
+    samples are appended to output_path as folded stacks
+    ("route;frame;frame count" lines) ready for flamegraph.pl or speedscope.
+    Samples of fast requests are discarded.
+    """
+
+    def __init__(self, output_path, threshold=DEFAULT_PROFILE_THRESHOLD, interval=DEFAULT_PROFILE_INTERVAL):
+        self.output_path = output_path
+        self.threshold = threshold
+        self.interval = interval
+        self.dumped = 0
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def begin(self):
+        """Start collecting samples for the current thread"""
+        self._ensure_thread()
+        self._active[threading.get_ident()] = Counter()
+
+    def end(self, elapsed, label):
+        """Stop sampling the current thread; dump its stacks if it was slow"""
+        samples = self._active.pop(threading.get_ident(), None)
+        if not samples or elapsed < self.threshold:
+            return
+        root = re.sub(r'[;\s]+', '_', label)
+        with self._lock:
+            with open(self.output_path, 'a', encoding='utf-8') as out:
+                for stack, count in samples.items():
+                    out.write('{};{} {}\n'.format(root, stack, count))
+            self.dumped += 1
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for ident, samples in list(self._active.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    samples[';'.join(reversed(stack))] += 1
+
+
+def stats_collector(name_prefix, get_stats, counters=(), gauges=()):
+    """
+    Build a collector exposing selected keys of stats() dictionaries.
+    get_stats returns [(labels, stats)], one entry per instance; counters
+    become <prefix>_<key>_total and gauges become <prefix>_<key>.
+    """
+    def collect():
+        instances = get_stats()
+        for key in counters:
+            yield ('{}_{}_total'.format(name_prefix, key), 'counter', None,
+                   [(labels, stats[key]) for labels, stats in instances])
+        for key in gauges:
+            yield ('{}_{}'.format(name_prefix, key), 'gauge', None,
+                   [(labels, stats[key]) for labels, stats in instances])
+    return collect
+
+
+# Registry shared by the app and the background workers of this process
+registry = MetricsRegistry()
+registry.describe('http_request_duration_seconds', 'Request latency by method, route and status')
+registry.describe('stage_duration_seconds', 'Time spent in each stage of request handling')
@@ -0,0 +1,103 @@
+import base64
+import csv
+import io
+import json
+from database import get_db_connection
+
+# Page size limits for admin listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000  # Rows fetched per query while streaming an export
+
+
+def encode_cursor(created_at, row_id):
+    """Encode the (created_at, id) of the last row on a page as an opaque cursor"""
+    raw = json.dumps([created_at, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back to (created_at, id); raises ValueError if it is malformed"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return created_at, row_id
+
+
+def parse_page_size(value):
+    """Clamp a requested page size to [1, MAX_PAGE_SIZE]"""
+    try:
+        size = int(value) if value is not None else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def fetch_page(table, columns, filters, params, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Fetch one page of rows newest first, ordered by (created_at, id).
+
+    Returns (rows, next_cursor). The cursor condition and ORDER BY match the
+    (created_at, id) indexes, so every page costs the same no matter how deep
+    into the table it is, unlike OFFSET.
+    """
+    where = list(filters)
+    params = list(params)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        where.append('(created_at, id) < (?, ?)')
+        params.extend([created_at, row_id])
+
+    sql = 'SELECT {} FROM {}'.format(', '.join(columns), table)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+    # Fetch one extra row to learn whether another page exists
+    params.append(limit + 1)
+
+    with get_db_connection(readonly=True) as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return rows, next_cursor
+
+
+def iter_rows(table, columns, filters, params, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield every matching row newest first, one keyset page at a time.
+    A pooled connection is only held while each batch is fetched.
+    """
+    cursor = None
+    while True:
+        rows, cursor = fetch_page(table, columns, filters, params, cursor, batch_size)
+        for row in rows:
+            yield row
+        if cursor is None:
+            break
+
+
+def stream_ndjson(rows, fields):
+    """Yield rows as NDJSON lines"""
+    for row in rows:
+        yield json.dumps({field: row[field] for field in fields}) + '\n'
+
+
+def stream_csv(rows, fields):
+    """Yield rows as CSV, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([row[field] for field in fields])
+        # Flush the buffer every row so nothing accumulates in memory
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.getvalue():
+        yield buffer.getvalue()
@@ -0,0 +1,164 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import qrcode
+import qrcode.image.svg
+
+# Supported output formats and their content types
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+ERROR_CORRECTION = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H
+}
+
+# Default renderer settings
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024  # Memory budget for rendered images
+DEFAULT_WORKERS = 4                      # Render threads/processes
+DEFAULT_TIMEOUT = 10                     # Seconds to wait for a render
+
+
+def render_qr(data, fmt='png', box_size=10, border=5, error_correction='M'):
+    """
+    Render data as a QR code image and return the encoded bytes.
+    Kept at module level so it can run in a process pool.
+    """
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=ERROR_CORRECTION[error_correction],
+        box_size=box_size,
+        border=border
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = io.BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color='black', back_color='white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class QRRenderer:
+    """
+    Content-addressed QR code cache in front of a render pool.
+
+    Each image is keyed by a hash of its data and render options, which also
+    serves as its ETag. Lookups go memory LRU -> cache directory -> render, and
+    rendering runs in a thread or process pool so CPU-bound Pillow work does
+    not tie up request workers for longer than it takes to wait on it.
+    """
+
+    def __init__(self, cache_dir=None, memory_bytes=DEFAULT_MEMORY_BYTES,
+                 workers=DEFAULT_WORKERS, executor='thread', timeout=DEFAULT_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+        self._executor_type = executor
+        self._workers = workers
+        self._executor = None
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def cache_key(data, fmt, box_size, border, error_correction):
+        """Content address (and ETag) for a render"""
+        options = '{}|{}|{}|{}|{}'.format(fmt, box_size, border, error_correction, data)
+        return hashlib.sha256(options.encode('utf-8')).hexdigest()
+
+    def _pool(self):
+        """Create the render pool on first use (so it is created after any fork)"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self._executor_type == 'process':
+                        self._executor = ProcessPoolExecutor(max_workers=self._workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                            thread_name_prefix='qr-render')
+        return self._executor
+
+    def get(self, data, fmt='png', box_size=10, border=5, error_correction='M'):
+        """Return (etag, image_bytes), rendering only when no cached copy exists"""
+        key = self.cache_key(data, fmt, box_size, border, error_correction)
+
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return key, image
+
+        path = os.path.join(self.cache_dir, key + '.' + fmt) if self.cache_dir else None
+        if path and os.path.exists(path):
+            with open(path, 'rb') as handle:
+                image = handle.read()
+            self.disk_hits += 1
+        else:
+            future = self._pool().submit(render_qr, data, fmt, box_size, border, error_correction)
+            image = future.result(self.timeout)
+            self.renders += 1
+            if path:
+                self._write_file(path, image)
+
+        self._remember(key, image)
+        return key, image
+
+    def _write_file(self, path, image):
+        """
+        Store a rendered image in the cache directory. Each writer uses its own
+        temp file and renames it into place, so concurrent readers never see a
+        partial file and concurrent first renders of one key cannot collide.
+        A failed write only means the image is rendered again next time.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(image)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _remember(self, key, image):
+        """Add an image to the memory LRU, evicting old images over the byte budget"""
+        if len(image) > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = image
+            self._memory_used += len(image)
+            while self._memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def stats(self):
+        """Return cache counters"""
+        return {
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_used,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'renders': self.renders
+        }
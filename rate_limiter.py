@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Default engine settings
+DEFAULT_MAX_KEYS = 100000     # Hard cap on tracked keys per limiter
+DEFAULT_SWEEP_INTERVAL = 10   # Seconds between idle-key sweeps
+
+
+class TokenBucket:
+    """Per-key token bucket state"""
+    __slots__ = ('seen', 'tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.seen = updated
+        self.tokens = tokens
+        self.updated = updated
+
+
+class WindowCounter:
+    """Per-key sliding-window-counter state"""
+    __slots__ = ('seen', 'window', 'current', 'previous')
+
+    def __init__(self, window, seen):
+        self.seen = seen
+        self.window = window
+        self.current = 0
+        self.previous = 0
+
+
+class MemoryBackend:
+    """
+    In-process state store. Keys are kept in least-recently-used order so idle
+    keys can be swept from the front, and the oldest keys are dropped once
+    max_keys is reached.
+    """
+
+    algorithms = ('token_bucket', 'sliding_window')
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS, idle_timeout=120, sweep_interval=DEFAULT_SWEEP_INTERVAL):
+        self.max_keys = max_keys
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+        self.evictions = 0
+
+    def token_bucket(self, key, limit, window, cost, now):
+        """Take cost tokens from the key's bucket; returns True if the request is allowed"""
+        rate = limit / window
+        with self._lock:
+            state = self._touch(key, now)
+            if state is None:
+                state = self._states[key] = TokenBucket(limit, now)
+            state.tokens = min(limit, state.tokens + (now - state.updated) * rate)
+            state.updated = now
+            if state.tokens < cost:
+                return False
+            state.tokens -= cost
+            return True
+
+    def sliding_window(self, key, limit, window, cost, now):
+        """Count a hit against the key's sliding window; returns True if the request is allowed"""
+        window_index = int(now // window)
+        with self._lock:
+            state = self._touch(key, now)
+            if state is None:
+                state = self._states[key] = WindowCounter(window_index, now)
+            if window_index != state.window:
+                # Roll the window forward; anything older than one window is gone
+                state.previous = state.current if window_index == state.window + 1 else 0
+                state.current = 0
+                state.window = window_index
+            elapsed = (now % window) / window
+            if state.previous * (1 - elapsed) + state.current + cost > limit:
+                return False
+            state.current += cost
+            return True
+
+    def _touch(self, key, now):
+        """Fetch a key's state, marking it recently used and running housekeeping"""
+        if now >= self._next_sweep:
+            self._sweep(now)
+        state = self._states.get(key)
+        if state is not None:
+            self._states.move_to_end(key)
+            state.seen = now
+        else:
+            while len(self._states) >= self.max_keys:
+                self._states.popitem(last=False)
+                self.evictions += 1
+        return state
+
+    def _sweep(self, now):
+        """Drop keys that have been idle longer than idle_timeout"""
+        self._next_sweep = now + self.sweep_interval
+        cutoff = now - self.idle_timeout
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            if state.seen > cutoff:
+                break
+            del self._states[key]
+            self.evictions += 1
+
+    def reset(self, key, window=None):
+        """Forget a key"""
+        with self._lock:
+            self._states.pop(key, None)
+
+    def size(self):
+        """Number of tracked keys"""
+        return len(self._states)
+
+
+class CacheBackend:
+    """
+    Shared state in a Flask-Caching style backend (e.g. Redis), so limits hold
+    across worker processes. Only the sliding-window counter is supported: it
+    needs nothing more than an increment per window key, which Redis and
+    Memcached perform atomically. A token bucket would need an atomic
+    read-modify-write of two values, which these backends do not offer.
+    """
+
+    algorithms = ('sliding_window',)
+
+    def __init__(self, cache, key_prefix='ratelimit:'):
+        self.cache = cache
+        self.key_prefix = key_prefix
+        self.evictions = 0
+
+    def sliding_window(self, key, limit, window, cost, now):
+        """Count a hit against the key's sliding window; returns True if the request is allowed"""
+        window_index = int(now // window)
+        current_key = '{}{}:{}'.format(self.key_prefix, key, window_index)
+        previous = self.cache.get('{}{}:{}'.format(self.key_prefix, key, window_index - 1)) or 0
+        # Expire after the following window has also used it as "previous"
+        self.cache.add(current_key, 0, timeout=int(window * 2) + 1)
+        current = self.cache.inc(current_key, cost) or cost
+        elapsed = (now % window) / window
+        if previous * (1 - elapsed) + current > limit:
+            self.cache.dec(current_key, cost)
+            return False
+        return True
+
+    def reset(self, key, window):
+        """Forget the current and previous windows for a key"""
+        window_index = int(time.time() // window)
+        self.cache.delete_many(
+            '{}{}:{}'.format(self.key_prefix, key, window_index),
+            '{}{}:{}'.format(self.key_prefix, key, window_index - 1)
+        )
+
+    def size(self):
+        """Shared backends expire keys themselves"""
+        return None
+
+
+class RateLimiter:
+    """
+    Rate limit keys (usually client IPs) to `limit` hits per `window` seconds
+    using either the 'token_bucket' or the 'sliding_window' algorithm.
+
+    Both algorithms keep O(1) state per key and O(1) work per hit, unlike a
+    list of timestamps that grows with the request count.
+    """
+
+    def __init__(self, limit, window, algorithm='sliding_window', backend=None,
+                 max_keys=DEFAULT_MAX_KEYS, name='default'):
+        if algorithm not in ('token_bucket', 'sliding_window'):
+            raise ValueError('Unknown rate limiting algorithm: {}'.format(algorithm))
+        backend = backend or MemoryBackend(max_keys=max_keys, idle_timeout=window * 2)
+        if algorithm not in backend.algorithms:
+            raise ValueError('{} does not support the {} algorithm (supported: {})'.format(
+                type(backend).__name__, algorithm, ', '.join(backend.algorithms)))
+        self.limit = limit
+        self.window = window
+        self.algorithm = algorithm
+        self.name = name
+        self.backend = backend
+        self._check = getattr(self.backend, algorithm)
+        self.allowed = 0
+        self.limited = 0
+
+    def hit(self, key, cost=1):
+        """Record a hit for key; returns True when the key is over its limit"""
+        # Namespace keys so limiters can share one backend. format() also copes with a
+        # None key (no client address, e.g. behind a unix socket), which shares one bucket
+        if self._check('{}:{}'.format(self.name, key), self.limit, self.window, cost, time.time()):
+            self.allowed += 1
+            return False
+        self.limited += 1
+        return True
+
+    def reset(self, key):
+        """Clear the state for a key"""
+        self.backend.reset('{}:{}'.format(self.name, key), self.window)
+
+    def stats(self):
+        """Return limiter counters"""
+        return {
+            'name': self.name,
+            'algorithm': self.algorithm,
+            'limit': self.limit,
+            'window': self.window,
+            'keys': self.backend.size(),
+            'evictions': self.backend.evictions,
+            'allowed': self.allowed,
+            'limited': self.limited
+        }
@@ -0,0 +1,283 @@
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Everything the redirect path needs to know about a short code
+# (expires_at is epoch seconds, or None for links that never expire)
+Resolution = namedtuple('Resolution', ['url_id', 'original_url', 'is_active', 'expires_at'])
+
+# Returned by ResolutionCache.get() for codes that are known not to exist
+NOT_FOUND = object()
+
+# Stored in the shared tier for negative entries (it must survive pickling)
+_MISSING_MARKER = '__missing__'
+
+# Default cache settings
+DEFAULT_MAX_ENTRIES = 100000  # Entries kept in the in-process tier
+DEFAULT_TTL = 300             # Seconds a resolved code stays cached
+DEFAULT_NEGATIVE_TTL = 30     # Seconds an unknown code stays cached
+DEFAULT_TTL_JITTER = 0.1      # TTLs vary by up to this fraction either way
+DEFAULT_REFRESH_AHEAD = 30    # Seconds before expiry that a hit triggers a background refresh
+
+
+class ResolutionCache:
+    """
+    Two-tier cache of short_code -> Resolution.
+
+    The first tier is a size-bounded in-process LRU. The optional second tier
+    is any Flask-Caching style backend (get/set/delete) shared between workers,
+    e.g. Redis or Memcached. Unknown codes are cached as negative entries with
+    a short TTL so repeated lookups of bogus codes never reach SQLite.
+
+    Invalidation only reaches the shared tier and this process's LRU; other
+    workers' LRUs converge within ttl seconds.
+
+    A lookup that read the database before an invalidation must not cache
+    what it read afterwards. Callers take generation() before reading and
+    pass it to set()/set_missing(), which drop the value if the code has
+    been invalidated since.
+
+    TTLs are jittered so entries cached together (e.g. by the startup
+    warm-up) do not all expire in the same second. With on_refresh, a hit
+    on an entry that expires within refresh_ahead seconds still returns it
+    (stale-while-revalidate) but calls on_refresh(short_code) once, which
+    should reload the code in the background so hot codes never miss.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, shared=None, key_prefix='resolve:',
+                 ttl_jitter=DEFAULT_TTL_JITTER, refresh_ahead=DEFAULT_REFRESH_AHEAD, on_refresh=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.shared = shared
+        self.key_prefix = key_prefix
+        self.ttl_jitter = ttl_jitter
+        self.refresh_ahead = refresh_ahead
+        self.on_refresh = on_refresh
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # short_code -> generation of its last invalidation (most recent last)
+        self._invalidated = OrderedDict()
+        self._invalidations = 0
+        self._forgotten = 0  # Newest generation dropped from _invalidated
+
+        # Statistics
+        self.hits = 0
+        self.negative_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.stale_sets = 0
+
+    def get(self, short_code):
+        """
+        Look up a short code.
+        Returns a Resolution, NOT_FOUND for a cached negative entry, or None on a miss.
+        """
+        now = time.monotonic()
+        value, refresh = None, False
+        with self._lock:
+            entry = self._entries.get(short_code)
+            if entry is not None:
+                value, expires, refresh_at = entry
+                if expires > now:
+                    self._entries.move_to_end(short_code)
+                    if value is NOT_FOUND:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    if refresh_at <= now:
+                        # Only the first hit past refresh_at asks for a refresh
+                        self._entries[short_code] = (value, expires, float('inf'))
+                        self.refreshes += 1
+                        refresh = True
+                else:
+                    del self._entries[short_code]
+                    value = None
+        if refresh:
+            self.on_refresh(short_code)
+        if value is not None:
+            return value
+
+        if self.shared is not None:
+            value = self.shared.get(self.key_prefix + short_code)
+            if value is not None:
+                self.shared_hits += 1
+                if value == _MISSING_MARKER:
+                    self._store(short_code, NOT_FOUND, self._jitter(self.negative_ttl))
+                    return NOT_FOUND
+                resolution = Resolution(*value)
+                self._store(short_code, resolution, self._clamp_ttl(resolution, self._jitter(self.ttl)))
+                return resolution
+
+        self.misses += 1
+        return None
+
+    def generation(self):
+        """Token for values about to be read from the database (see set())"""
+        return self._invalidations
+
+    def _invalidated_since(self, short_code, generation):
+        # Codes dropped from _invalidated count as invalidated at _forgotten
+        return self._invalidated.get(short_code, self._forgotten) > generation
+
+    def set(self, short_code, resolution, ttl=None, generation=None):
+        """
+        Cache a resolved short code in both tiers. Links that expire are never
+        cached past their expiry, so no tier can keep redirecting a dead link.
+        With generation, nothing is cached if the code was invalidated since
+        that generation was taken.
+        """
+        ttl = self._clamp_ttl(resolution, self._jitter(self.ttl if ttl is None else ttl))
+        self._store_shared(short_code, resolution, tuple(resolution), ttl, generation)
+
+    def set_missing(self, short_code, generation=None):
+        """Cache a negative entry for a short code that does not exist"""
+        self._store_shared(short_code, NOT_FOUND, _MISSING_MARKER, self._jitter(self.negative_ttl), generation)
+
+    def invalidate(self, short_code):
+        """Drop a short code from both tiers"""
+        with self._lock:
+            self._invalidations += 1
+            self._invalidated[short_code] = self._invalidations
+            self._invalidated.move_to_end(short_code)
+            while len(self._invalidated) > self.max_entries:
+                self._forgotten = self._invalidated.popitem(last=False)[1]
+            self._entries.pop(short_code, None)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + short_code)
+
+    def clear(self):
+        """Drop every entry from the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+
+    def hottest(self, limit):
+        """Return up to limit cached (short_code, Resolution) pairs, most recently used first"""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+        hottest = []
+        for short_code, (value, expires, _) in reversed(entries):
+            if len(hottest) == limit:
+                break
+            if value is not NOT_FOUND and expires > now:
+                hottest.append((short_code, value))
+        return hottest
+
+    def _jitter(self, ttl):
+        return ttl * random.uniform(1 - self.ttl_jitter, 1 + self.ttl_jitter)
+
+    def _clamp_ttl(self, resolution, ttl):
+        """Shorten ttl to the link's remaining lifetime (already expired links keep ttl)"""
+        if resolution.expires_at is not None:
+            remaining = resolution.expires_at - time.time()
+            if remaining > 0:
+                return min(ttl, remaining)
+        return ttl
+
+    def _store_shared(self, short_code, value, shared_value, ttl, generation):
+        if not self._store(short_code, value, ttl, generation) or self.shared is None:
+            return
+        self.shared.set(self.key_prefix + short_code, shared_value, timeout=max(1, int(ttl)))
+        if generation is not None and self._invalidated_since(short_code, generation):
+            # Invalidated while the shared tier was being written
+            self.shared.delete(self.key_prefix + short_code)
+
+    def _store(self, short_code, value, ttl, generation=None):
+        """
+        Insert into the LRU, evicting the least recently used entries when full.
+        Returns False without storing if the code was invalidated after generation.
+        """
+        expires = time.monotonic() + ttl
+        # Negative entries are never refreshed, they just expire. Short-lived
+        # entries refresh in their second half at the earliest, so a link about
+        # to expire is not reloaded on every hit.
+        refresh_at = expires - min(self.refresh_ahead, ttl / 2)
+        if value is NOT_FOUND or self.on_refresh is None:
+            refresh_at = float('inf')
+        with self._lock:
+            if generation is not None and self._invalidated_since(short_code, generation):
+                self.stale_sets += 1
+                return False
+            self._entries[short_code] = (value, expires, refresh_at)
+            self._entries.move_to_end(short_code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def stats(self):
+        """Return hit/miss/eviction counters"""
+        lookups = self.hits + self.negative_hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'refreshes': self.refreshes,
+            'stale_sets': self.stale_sets,
+            'hit_ratio': (lookups - self.misses) / lookups if lookups else 0.0
+        }
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, and callers arriving while it runs wait for its result (or
+    exception) instead of running it again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = func(*args)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        return {'in_flight': len(self._calls), 'calls': self.calls, 'coalesced': self.coalesced}
@@ -0,0 +1,196 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+from database import get_db_connection
+from rollups import compact, get_watermark
+
+# Default retention settings
+DEFAULT_ARCHIVE_DIR = 'analytics_archive'
+DEFAULT_HOT_MONTHS = 2          # Months kept in the main analytics table (including the current one)
+DEFAULT_RETENTION_MONTHS = 12   # Months of raw analytics kept at all
+DEFAULT_CHUNK_SIZE = 5000       # Rows moved or deleted per transaction
+
+ARCHIVE_NAME = re.compile(r'^analytics_(\d{4})_(\d{2})\.db$')
+
+# Columns of an archived analytics row and their types. Rows keep the id they
+# had in the main table, so the archive needs no AUTOINCREMENT.
+ARCHIVE_COLUMNS = (
+    ('id', 'INTEGER PRIMARY KEY'),
+    ('url_id', 'INTEGER NOT NULL'),
+    ('ip_address', 'TEXT'),
+    ('user_agent', 'TEXT'),
+    ('referer', 'TEXT'),
+    ('timestamp', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'),
+    ('country', 'TEXT'),
+    ('city', 'TEXT'),
+    ('device_class', 'TEXT'),
+    ('os', 'TEXT'),
+    ('browser', 'TEXT'),
+    ('is_bot', 'BOOLEAN'),
+)
+ARCHIVE_COLUMN_LIST = ', '.join(name for name, _ in ARCHIVE_COLUMNS)
+
+
+def shift_month(year, month, delta):
+    """Return (year, month) delta months away"""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def month_bounds(year, month):
+    """Return the [start, end) timestamps of a month in the analytics format"""
+    next_year, next_month = shift_month(year, month, 1)
+    return ('{:04d}-{:02d}-01 00:00:00'.format(year, month),
+            '{:04d}-{:02d}-01 00:00:00'.format(next_year, next_month))
+
+
+class AnalyticsRetention:
+    """
+    Time-partitioned raw analytics.
+
+    Recent clicks live in the main analytics table. Older months are moved,
+    in small transactions, into one SQLite file per month under archive_dir;
+    rows are folded into the rollups before they move. Months past the
+    retention window are dropped by deleting their file, never row by row.
+    """
+
+    def __init__(self, archive_dir=DEFAULT_ARCHIVE_DIR, hot_months=DEFAULT_HOT_MONTHS,
+                 retention_months=DEFAULT_RETENTION_MONTHS, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.archive_dir = archive_dir
+        self.hot_months = max(1, hot_months)
+        self.retention_months = max(self.hot_months, retention_months)
+        self.chunk_size = chunk_size
+
+    def archive_path(self, year, month):
+        return os.path.join(self.archive_dir, 'analytics_{:04d}_{:02d}.db'.format(year, month))
+
+    def archives(self):
+        """Return [(year, month, path)] of existing archive files, oldest first"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        found = []
+        for name in os.listdir(self.archive_dir):
+            match = ARCHIVE_NAME.match(name)
+            if match:
+                found.append((int(match.group(1)), int(match.group(2)), os.path.join(self.archive_dir, name)))
+        return sorted(found)
+
+    def rotate(self, job=None, now=None):
+        """Archive months that left the hot window, then drop expired archives"""
+        now = now or datetime.now(timezone.utc)
+        cutoff, _ = month_bounds(*shift_month(now.year, now.month, -(self.hot_months - 1)))
+
+        while True:
+            with get_db_connection(readonly=True) as conn:
+                oldest = conn.execute(
+                    'SELECT MIN(timestamp) FROM analytics WHERE timestamp < ?', (cutoff,)
+                ).fetchone()[0]
+            if oldest is None:
+                break
+            moved = self.archive_month(int(oldest[:4]), int(oldest[5:7]))
+            if job is not None:
+                job.progress += moved
+
+        self.drop_expired(now)
+
+    def _attach(self, conn, path):
+        """
+        Attach an archive file as 'archive', creating its analytics table on
+        first use and adding any columns an older archive is missing
+        """
+        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+        conn.execute('CREATE TABLE IF NOT EXISTS archive.analytics ({})'.format(
+            ', '.join('{} {}'.format(name, definition) for name, definition in ARCHIVE_COLUMNS)))
+        existing = {row[1] for row in conn.execute('PRAGMA archive.table_info(analytics)')}
+        for name, definition in ARCHIVE_COLUMNS:
+            if name not in existing:
+                conn.execute('ALTER TABLE archive.analytics ADD COLUMN {} {}'.format(name, definition))
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_analytics_url_id ON analytics(url_id)')
+        conn.commit()
+
+    def archive_month(self, year, month):
+        """
+        Move one month of raw analytics into its archive file; returns rows moved.
+        The writer connection is taken per chunk so click writes interleave.
+        """
+        start, end = month_bounds(year, month)
+        path = self.archive_path(year, month)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        moved = 0
+
+        while True:
+            with get_db_connection() as conn:
+                self._attach(conn, path)
+                try:
+                    ids = [row[0] for row in conn.execute(
+                        'SELECT id FROM main.analytics WHERE timestamp >= ? AND timestamp < ? LIMIT ?',
+                        (start, end, self.chunk_size)
+                    )]
+                    if ids:
+                        # Rows must be counted in the rollups before they leave the main table
+                        while get_watermark(conn) < max(ids):
+                            if not compact(conn):
+                                break
+
+                        id_list = json.dumps(ids)
+                        conn.execute(
+                            'INSERT INTO archive.analytics ({0}) SELECT {0} FROM main.analytics '
+                            'WHERE id IN (SELECT value FROM json_each(?))'.format(ARCHIVE_COLUMN_LIST),
+                            (id_list,)
+                        )
+                        conn.execute('DELETE FROM main.analytics WHERE id IN (SELECT value FROM json_each(?))',
+                                     (id_list,))
+                        conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.execute('DETACH DATABASE archive')
+            if not ids:
+                return moved
+            moved += len(ids)
+
+    def drop_expired(self, now=None):
+        """Delete archive files older than the retention window; returns files removed"""
+        now = now or datetime.now(timezone.utc)
+        oldest_kept = shift_month(now.year, now.month, -(self.retention_months - 1))
+        removed = 0
+        for year, month, path in self.archives():
+            if (year, month) >= oldest_kept:
+                break
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            removed += 1
+        return removed
+
+    def delete_url_analytics(self, job, url_ids):
+        """
+        Delete all raw analytics for the given URLs, one chunk per transaction,
+        from the main table and every archive. Meant to run as a background job.
+        """
+        id_list = json.dumps(list(url_ids))
+        delete_chunk = '''
+            DELETE FROM {0}.analytics WHERE id IN (
+                SELECT id FROM {0}.analytics
+                WHERE url_id IN (SELECT value FROM json_each(?))
+                LIMIT ?
+            )
+        '''
+
+        for path in [None] + [path for _, _, path in self.archives()]:
+            deleted = self.chunk_size
+            while deleted >= self.chunk_size:
+                with get_db_connection() as conn:
+                    if path:
+                        conn.execute('ATTACH DATABASE ? AS archive', (path,))
+                    try:
+                        deleted = conn.execute(delete_chunk.format('archive' if path else 'main'),
+                                               (id_list, self.chunk_size)).rowcount
+                        conn.commit()
+                    finally:
+                        if path:
+                            conn.execute('DETACH DATABASE archive')
+                if job is not None:
+                    job.progress += deleted
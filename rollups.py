@@ -0,0 +1,293 @@
+import atexit
+import json
+import os
+import threading
+from database import get_db_connection
+from hyperloglog import HyperLogLog, hash_value, merge_sketch_blobs
+
+# Default compactor settings
+DEFAULT_CHUNK_SIZE = 10000   # Raw analytics rows folded into the rollups per transaction
+DEFAULT_INTERVAL = 5.0       # Seconds between background compaction passes
+
+# Device class for the device rollup: the class stored at ingestion, falling
+# back to the original substring rules for rows that were never classified
+DEVICE_CLASS_SQL = '''
+    COALESCE(a.device_class, CASE
+        WHEN a.user_agent IS NULL OR a.user_agent = '' THEN 'Other'
+        WHEN instr(a.user_agent, 'Mobile') OR instr(a.user_agent, 'Android') OR instr(a.user_agent, 'iPhone') THEN 'Mobile'
+        WHEN instr(a.user_agent, 'Tablet') OR instr(a.user_agent, 'iPad') THEN 'Tablet'
+        ELSE 'Desktop'
+    END)
+'''
+
+# Each rollup is an upsert from a GROUP BY over a range of raw analytics ids
+ROLLUP_STATEMENTS = [
+    '''INSERT INTO rollup_url_hourly (url_id, hour, clicks)
+       SELECT a.url_id, strftime('%Y-%m-%d %H:00:00', a.timestamp), COUNT(*)
+       FROM analytics a WHERE a.id > ? AND a.id <= ?
+       GROUP BY 1, 2
+       ON CONFLICT(url_id, hour) DO UPDATE SET clicks = clicks + excluded.clicks''',
+    '''INSERT INTO rollup_url_daily (url_id, day, clicks)
+       SELECT a.url_id, DATE(a.timestamp), COUNT(*)
+       FROM analytics a WHERE a.id > ? AND a.id <= ?
+       GROUP BY 1, 2
+       ON CONFLICT(url_id, day) DO UPDATE SET clicks = clicks + excluded.clicks''',
+    '''INSERT INTO rollup_daily (day, clicks)
+       SELECT DATE(a.timestamp), COUNT(*)
+       FROM analytics a WHERE a.id > ? AND a.id <= ?
+       GROUP BY 1
+       ON CONFLICT(day) DO UPDATE SET clicks = clicks + excluded.clicks''',
+    '''INSERT INTO rollup_country_daily (day, country, clicks)
+       SELECT DATE(a.timestamp), COALESCE(a.country, ''), COUNT(*)
+       FROM analytics a WHERE a.id > ? AND a.id <= ?
+       GROUP BY 1, 2
+       ON CONFLICT(day, country) DO UPDATE SET clicks = clicks + excluded.clicks''',
+    '''INSERT INTO rollup_device_daily (day, device, clicks)
+       SELECT DATE(a.timestamp), {}, COUNT(*)
+       FROM analytics a WHERE a.id > ? AND a.id <= ?
+       GROUP BY 1, 2
+       ON CONFLICT(day, device) DO UPDATE SET clicks = clicks + excluded.clicks'''.format(DEVICE_CLASS_SQL),
+]
+
+
+# Sketches are merged in SQL so an upsert never needs a read-modify-write round trip
+SKETCH_UPSERTS = {
+    'url_daily': '''INSERT INTO sketch_url_daily (url_id, day, kind, sketch) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(url_id, day, kind) DO UPDATE SET sketch = hll_merge(sketch, excluded.sketch)''',
+    'url': '''INSERT INTO sketch_url (url_id, kind, sketch) VALUES (?, ?, ?)
+              ON CONFLICT(url_id, kind) DO UPDATE SET sketch = hll_merge(sketch, excluded.sketch)''',
+    'daily': '''INSERT INTO sketch_daily (day, kind, sketch) VALUES (?, ?, ?)
+                ON CONFLICT(day, kind) DO UPDATE SET sketch = hll_merge(sketch, excluded.sketch)''',
+}
+
+
+def create_rollup_tables(cursor):
+    """Create the rollup tables and the compaction watermark table"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_url_hourly (
+            url_id INTEGER NOT NULL,
+            hour TEXT NOT NULL,
+            clicks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (url_id, hour)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_url_daily (
+            url_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            clicks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (url_id, day)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_daily (
+            day TEXT PRIMARY KEY,
+            clicks INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_country_daily (
+            day TEXT NOT NULL,
+            country TEXT NOT NULL,
+            clicks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, country)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_device_daily (
+            day TEXT NOT NULL,
+            device TEXT NOT NULL,
+            clicks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, device)
+        ) WITHOUT ROWID
+    ''')
+    # HyperLogLog sketches (see hyperloglog.py) of unique visitors and referers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sketch_url_daily (
+            url_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (url_id, day, kind)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sketch_url (
+            url_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (url_id, kind)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sketch_daily (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (day, kind)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_watermarks (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
+
+def get_watermark(conn, name='analytics'):
+    """Return the last raw analytics id already folded into the rollups"""
+    row = conn.execute('SELECT value FROM rollup_watermarks WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def compact(conn, max_rows=DEFAULT_CHUNK_SIZE):
+    """
+    Fold up to max_rows raw analytics rows past the watermark into the rollups
+    and advance the watermark. Runs inside the caller's transaction; the caller
+    commits. Returns the number of raw rows folded in.
+
+    Because the watermark moves in the same transaction as the rollup updates,
+    no row is ever counted twice, whoever runs the compaction.
+    """
+    low = get_watermark(conn)
+    high, count = conn.execute(
+        'SELECT MAX(id), COUNT(*) FROM (SELECT id FROM analytics WHERE id > ? ORDER BY id LIMIT ?)',
+        (low, max_rows)
+    ).fetchone()
+    if not count:
+        return 0
+
+    for statement in ROLLUP_STATEMENTS:
+        conn.execute(statement, (low, high))
+    update_sketches(conn, low, high)
+    conn.execute(
+        '''INSERT INTO rollup_watermarks (name, value) VALUES ('analytics', ?)
+           ON CONFLICT(name) DO UPDATE SET value = excluded.value''',
+        (high,)
+    )
+    return count
+
+
+def update_sketches(conn, low, high):
+    """
+    Add the visitors and referers of raw analytics ids (low, high] to the
+    per-URL, per-URL-per-day and per-day sketches. Adding a value twice
+    leaves a sketch unchanged, so a re-run range is harmless.
+    """
+    sketches = {'url_daily': {}, 'url': {}, 'daily': {}}
+    for url_id, day, ip_address, referer in conn.execute(
+        'SELECT url_id, DATE(timestamp), ip_address, referer FROM analytics WHERE id > ? AND id <= ?',
+        (low, high)
+    ):
+        for kind, value in zip(('visitors', 'referers'), (ip_address, referer)):
+            if not value:
+                continue
+            key = hash_value(value)
+            for table, sketch_key in (('url_daily', (url_id, day, kind)), ('url', (url_id, kind)),
+                                      ('daily', (day, kind))):
+                sketch = sketches[table].get(sketch_key)
+                if sketch is None:
+                    sketch = sketches[table][sketch_key] = HyperLogLog()
+                sketch.add_hash(key)
+
+    conn.create_function('hll_merge', 2, merge_sketch_blobs, deterministic=True)
+    for table, rows in sketches.items():
+        conn.executemany(SKETCH_UPSERTS[table], [key + (sketch.to_bytes(),) for key, sketch in rows.items()])
+
+
+# Per-URL rollup tables, dropped with their URL
+URL_ROLLUP_TABLES = ('rollup_url_hourly', 'rollup_url_daily', 'sketch_url_daily', 'sketch_url')
+
+
+def delete_urls_rollups(conn, url_ids):
+    """
+    Drop the per-URL rollups of deleted URLs and take their clicks out of the
+    site-wide daily totals, so those add up to the clicks of live URLs (as
+    SUM(urls.clicks) did). The country, device and unique visitor rollups
+    keep their history. Runs inside the caller's transaction.
+    """
+    id_list = json.dumps(list(url_ids))
+    # Fold in raw rows still past the watermark first: compacted later they
+    # would bring the deleted URLs back into the rollups
+    while compact(conn):
+        pass
+    conn.execute(
+        '''UPDATE rollup_daily SET clicks = clicks - (
+               SELECT SUM(r.clicks) FROM rollup_url_daily r
+               WHERE r.day = rollup_daily.day AND r.url_id IN (SELECT value FROM json_each(?)))
+           WHERE day IN (SELECT day FROM rollup_url_daily WHERE url_id IN (SELECT value FROM json_each(?)))''',
+        (id_list, id_list)
+    )
+    for table in URL_ROLLUP_TABLES:
+        conn.execute('DELETE FROM {} WHERE url_id IN (SELECT value FROM json_each(?))'.format(table), (id_list,))
+
+
+def delete_url_rollups(conn, url_id):
+    """Drop the per-URL rollups of a deleted URL"""
+    delete_urls_rollups(conn, [url_id])
+
+
+class RollupCompactor:
+    """
+    Background thread that keeps the rollups caught up with raw analytics.
+
+    The click writer also compacts right after each batch it inserts, so this
+    mostly matters for backfilling existing rows and for catching up after
+    the writer was busy.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.compacted = 0
+
+    def start(self):
+        """Start the compaction thread (no-op if already running in this process)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop_event.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='rollup-compactor', daemon=True)
+        self._thread.start()
+
+    def run_once(self):
+        """Compact until caught up; returns the number of raw rows folded in"""
+        total = 0
+        while not self._stop_event.is_set():
+            with get_db_connection() as conn:
+                try:
+                    count = compact(conn, self.chunk_size)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            total += count
+            if count < self.chunk_size:
+                break
+        self.compacted += total
+        return total
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                # Try again on the next pass (e.g. the database was locked)
+                pass
+
+    def stop(self, timeout=5.0):
+        """Stop the compaction thread"""
+        self._stop_event.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+
+
+def create_rollup_compactor(interval=DEFAULT_INTERVAL, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Create a rollup compactor that stops when the interpreter exits"""
+    compactor = RollupCompactor(interval, chunk_size)
+    atexit.register(compactor.stop)
+    return compactor
@@ -0,0 +1,258 @@
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+# Outcome of screening one URL; elapsed is in seconds
+ScreenResult = namedtuple('ScreenResult', ['malicious', 'reason', 'elapsed'])
+
+# Patterns checked against the whole URL
+DEFAULT_PATTERNS = [
+    r'\b(?:union|select|insert|delete|update|drop|create|alter)\b',  # SQL injection keywords
+    r'<script',  # Basic XSS detection
+    r'\b(?:bitcoin|cryptocurrency|wallet)\b',  # Often associated with scam sites
+]
+
+# Seconds between blocklist file modification checks
+DEFAULT_RELOAD_INTERVAL = 30
+
+logger = logging.getLogger(__name__)
+
+
+class SortedIndex:
+    """
+    Immutable set of strings packed into one bytes blob plus an array of offsets.
+
+    This costs a few bytes per entry on top of the strings themselves, far less
+    than a Python set of str objects, which matters for blocklists with millions
+    of entries. Lookups are a binary search over the offsets.
+    """
+
+    def __init__(self, entries=()):
+        encoded = sorted({entry.encode('utf-8') for entry in entries})
+        self._offsets = array('Q', [0])
+        for entry in encoded:
+            self._offsets.append(self._offsets[-1] + len(entry))
+        self._blob = b''.join(encoded)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __contains__(self, value):
+        value = value.encode('utf-8')
+        blob, offsets = self._blob, self._offsets
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            mid = (low + high) // 2
+            entry = blob[offsets[mid]:offsets[mid + 1]]
+            if entry < value:
+                low = mid + 1
+            elif entry > value:
+                high = mid
+            else:
+                return True
+        return False
+
+
+def reverse_domain(domain):
+    """'a.example.com' -> 'com.example.a', so parent domains become string prefixes"""
+    return '.'.join(reversed(domain.split('.')))
+
+
+def read_list_file(path):
+    """
+    Yield entries from a blocklist file, one per line.
+    Blank lines and # comments are skipped, and hosts-file lines such as
+    '0.0.0.0 example.com' yield just the domain.
+    """
+    with open(path, encoding='utf-8', errors='ignore') as handle:
+        for line in handle:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            yield parts[-1].lower()
+
+
+def normalize_prefix(url):
+    """Reduce a URL or URL prefix to 'host/path' for prefix matching"""
+    if '://' not in url:
+        url = 'http://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').rstrip('.')
+    return host + parts.path.rstrip('/')
+
+
+class Blocklists:
+    """One loaded generation of domain, URL prefix and pattern blocklists"""
+
+    def __init__(self, domains, url_prefixes, patterns):
+        self.domains = SortedIndex(reverse_domain(domain.strip('.')) for domain in domains)
+        self.url_prefixes = SortedIndex(normalize_prefix(prefix) for prefix in url_prefixes)
+        # All patterns are tried in a single pass over the URL
+        self.pattern = re.compile('|'.join('(?:{})'.format(p) for p in patterns), re.IGNORECASE) if patterns else None
+
+
+class ScreeningEngine:
+    """
+    Screen URLs against domain blocklists (including parent domains), URL
+    prefix blocklists and a combined suspicious-pattern regex.
+
+    Blocklist files are reloaded without a restart when they change on disk:
+    a new index is built off to the side and swapped in atomically. If a
+    changed file cannot be loaded (unreadable, or an invalid pattern), the
+    previous generation keeps serving and the file is retried once it
+    changes again.
+    """
+
+    def __init__(self, domains=(), domain_files=(), url_prefix_files=(), pattern_files=(),
+                 patterns=DEFAULT_PATTERNS, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.static_domains = list(domains)
+        self.static_patterns = list(patterns)
+        self.domain_files = list(domain_files)
+        self.url_prefix_files = list(url_prefix_files)
+        self.pattern_files = list(pattern_files)
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._mtimes = {}
+        self._next_check = 0
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.checks = 0
+        self.blocked = 0
+        self.reload()
+
+    def _files(self):
+        return self.domain_files + self.url_prefix_files + self.pattern_files
+
+    def _file_mtimes(self):
+        mtimes = {}
+        for path in self._files():
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def reload(self):
+        """Rebuild every index from the configured sources; raises if a source cannot be loaded"""
+        with self._lock:
+            # Recorded before loading, so a file that fails is not re-read on every check
+            mtimes = self._mtimes = self._file_mtimes()
+            self._next_check = time.monotonic() + self.reload_interval
+            domains = list(self.static_domains)
+            url_prefixes = []
+            patterns = list(self.static_patterns)
+            for path in self.domain_files:
+                if mtimes[path] is not None:
+                    domains.extend(read_list_file(path))
+            for path in self.url_prefix_files:
+                if mtimes[path] is not None:
+                    url_prefixes.extend(read_list_file(path))
+            for path in self.pattern_files:
+                if mtimes[path] is not None:
+                    with open(path, encoding='utf-8') as handle:
+                        patterns.extend(line.rstrip('\n') for line in handle if line.strip() and not line.startswith('#'))
+
+            self.blocklists = Blocklists(domains, url_prefixes, patterns)
+            self.reloads += 1
+
+    def reload_if_changed(self):
+        """Reload when any blocklist file changed since the last load; returns True if reloaded"""
+        now = time.monotonic()
+        if now < self._next_check or not self._files():
+            return False
+        self._next_check = now + self.reload_interval
+        if self._file_mtimes() == self._mtimes:
+            return False
+        try:
+            self.reload()
+        except (OSError, ValueError, re.error) as e:
+            self.failed_reloads += 1
+            logger.error('Blocklist reload failed, keeping the previous blocklists: %s', e)
+            return False
+        return True
+
+    def check(self, url, host=None, path=None):
+        """
+        Screen a single URL and return a ScreenResult.
+        host and path may be passed in when the caller has already parsed the URL.
+        """
+        start = time.perf_counter()
+        self.reload_if_changed()
+        reason = self._match(self.blocklists, url, host, path)
+        self.checks += 1
+        if reason:
+            self.blocked += 1
+        return ScreenResult(reason is not None, reason, time.perf_counter() - start)
+
+    def check_many(self, urls, parsed=None):
+        """
+        Screen a batch of URLs against a single blocklist generation.
+        parsed may hold an already parsed URL (anything with host and path) per entry.
+        """
+        self.reload_if_changed()
+        blocklists = self.blocklists
+        results = []
+        for url, parts in zip(urls, parsed or [None] * len(urls)):
+            start = time.perf_counter()
+            if parts is not None:
+                reason = self._match(blocklists, url, parts.host, parts.path)
+            else:
+                reason = self._match(blocklists, url)
+            results.append(ScreenResult(reason is not None, reason, time.perf_counter() - start))
+        self.checks += len(results)
+        self.blocked += sum(1 for result in results if result.malicious)
+        return results
+
+    def _match(self, blocklists, url, host=None, path=None):
+        """Return the reason a URL is blocked, or None"""
+        if not url:
+            return None
+
+        if host is None:
+            parts = urlsplit(url if '://' in url else 'http://' + url)
+            host = parts.hostname or ''
+            path = parts.path
+        host = host.rstrip('.').lower()
+
+        # The domain itself or any parent domain
+        labels = host.split('.')
+        reversed_host = ''
+        for label in reversed(labels):
+            reversed_host = reversed_host + '.' + label if reversed_host else label
+            if reversed_host in blocklists.domains:
+                return 'domain'
+
+        # URL prefixes on path segment boundaries
+        if len(blocklists.url_prefixes):
+            candidate = host
+            if candidate in blocklists.url_prefixes:
+                return 'url_prefix'
+            for segment in (path or '').strip('/').split('/'):
+                if not segment:
+                    continue
+                candidate = candidate + '/' + segment
+                if candidate in blocklists.url_prefixes:
+                    return 'url_prefix'
+
+        if blocklists.pattern is not None and blocklists.pattern.search(url):
+            return 'pattern'
+        return None
+
+    def stats(self):
+        """Return index sizes and counters"""
+        blocklists = self.blocklists
+        return {
+            'domains': len(blocklists.domains),
+            'url_prefixes': len(blocklists.url_prefixes),
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+            'checks': self.checks,
+            'blocked': self.blocked
+        }
@@ -1,70 +1,83 @@
-import re
-import time
-from collections import defaultdict
-from urllib.parse import urlparse
-from database import get_db_connection
-
-# Simple rate limiting implementation
-# In a production environment, you would use Redis or similar for distributed rate limiting
-request_counts = defaultdict(list)
-
-# List of known malicious domains (in a real application, this would be more comprehensive)
-MALICIOUS_DOMAINS = {
-    'malicious-site.com',
-    'phishing-example.org',
-    'fake-bank.net'
-}
-
-def is_rate_limited(ip_address, max_requests=10, time_window=60):
-    """
-    Check if an IP address is rate limited
-    """
-    current_time = time.time()
-    
-    # Remove requests outside the time window
-    request_counts[ip_address] = [req_time for req_time in request_counts[ip_address] 
-                                  if current_time - req_time < time_window]
-    
-    # Check if limit exceeded
-    if len(request_counts[ip_address]) >= max_requests:
-        return True
-    
-    # Add current request
-    request_counts[ip_address].append(current_time)
-    return False
-
-def is_malicious_url(url):
-    """
-    Check if a URL is potentially malicious
-    In production, this would integrate with services like VirusTotal
-    """
-    if not url:
-        return False
-    
-    # Parse URL to extract domain
-    parsed = urlparse(url)
-    domain = parsed.netloc.lower()
-    
-    # Check against known malicious domains
-    if domain in MALICIOUS_DOMAINS:
-        return True
-    
-    # Check for suspicious patterns
-    suspicious_patterns = [
-        r'\b(?:union|select|insert|delete|update|drop|create|alter)\b',  # SQL injection keywords
-        r'<script',  # Basic XSS detection
-        r'\b(?:bitcoin|cryptocurrency|wallet)\b',  # Often associated with scam sites
-    ]
-    
-    for pattern in suspicious_patterns:
-        if re.search(pattern, url, re.IGNORECASE):
-            return True
-    
-    return False
-
-def reset_rate_limit(ip_address):
-    """
-    Reset rate limit for an IP address (useful for testing)
-    """
-    if ip_address in request_counts:
-        del request_counts[ip_address]
\ No newline at end of file
+import threading
+from database import get_db_connection
+from rate_limiter import RateLimiter
+from screening import ScreeningEngine
+
+# Rate limiters keyed by (name, max_requests, time_window)
+# Set RATE_LIMIT_BACKEND to a rate_limiter.CacheBackend to share limits between workers
+RATE_LIMIT_ALGORITHM = 'sliding_window'
+RATE_LIMIT_BACKEND = None
+rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+# List of known malicious domains (in a real application, this would be more comprehensive)
+MALICIOUS_DOMAINS = {
+    'malicious-site.com',
+    'phishing-example.org',
+    'fake-bank.net'
+}
+
+def get_rate_limiter(max_requests=10, time_window=60, name='default'):
+    """
+    Return the shared limiter for a given limit, creating it on first use
+    """
+    key = (name, max_requests, time_window)
+    limiter = rate_limiters.get(key)
+    if limiter is None:
+        with _rate_limiters_lock:
+            limiter = rate_limiters.get(key)
+            if limiter is None:
+                limiter = RateLimiter(max_requests, time_window, RATE_LIMIT_ALGORITHM,
+                                      backend=RATE_LIMIT_BACKEND, name=name)
+                rate_limiters[key] = limiter
+    return limiter
+
+def is_rate_limited(ip_address, max_requests=10, time_window=60, name='default'):
+    """
+    Check if an IP address is rate limited
+    """
+    return get_rate_limiter(max_requests, time_window, name).hit(ip_address)
+
+# Screening engine loaded with the built-in domains; see configure_screening()
+screening_engine = ScreeningEngine(domains=MALICIOUS_DOMAINS)
+
+def configure_screening(domain_files=(), url_prefix_files=(), pattern_files=(), reload_interval=30):
+    """
+    Load blocklists from files. Files are re-read automatically when they change.
+    """
+    global screening_engine
+    screening_engine = ScreeningEngine(
+        domains=MALICIOUS_DOMAINS,
+        domain_files=domain_files,
+        url_prefix_files=url_prefix_files,
+        pattern_files=pattern_files,
+        reload_interval=reload_interval
+    )
+    return screening_engine
+
+def is_malicious_url(url, parsed=None):
+    """
+    Check if a URL is potentially malicious
+    In production, this would integrate with services like VirusTotal
+    Pass the ParsedURL when the caller already has one to skip re-parsing.
+    """
+    if not url:
+        return False
+    
+    if parsed is not None:
+        return screening_engine.check(url, parsed.host, parsed.path).malicious
+    return screening_engine.check(url).malicious
+
+def scan_urls(urls, parsed=None):
+    """
+    Check a batch of URLs for malicious content.
+    Returns a list of booleans aligned with urls.
+    """
+    return [result.malicious for result in screening_engine.check_many(urls, parsed)]
+
+def reset_rate_limit(ip_address):
+    """
+    Reset rate limit for an IP address (useful for testing)
+    """
+    for limiter in list(rate_limiters.values()):
+        limiter.reset(ip_address)
\ No newline at end of file
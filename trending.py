@@ -0,0 +1,124 @@
+import heapq
+import threading
+import time
+from collections import deque
+
+# Sliding windows: (name, seconds covered, buckets the window is split into)
+DEFAULT_WINDOWS = (('5m', 300, 10), ('1h', 3600, 12), ('24h', 86400, 24))
+DEFAULT_CAPACITY = 1000         # Keys tracked per bucket
+DEFAULT_REFRESH_INTERVAL = 1.0  # Seconds a computed top list is served before it is rebuilt
+MAX_RESULTS = 100               # Longest top list a window can return
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary over at most capacity keys.
+
+    When a new key arrives and the summary is full, the key with the
+    smallest count is replaced and the newcomer inherits that count (kept
+    as its error). Counts are therefore overestimates, but every key seen
+    more than total/capacity times is guaranteed to be tracked.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # One (count, key) entry per key; entries go stale as counts grow and
+        # are refreshed lazily when they reach the top of the heap
+        self._heap = []
+
+    def add(self, key, count=1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+            return
+        error = 0
+        if len(counts) >= self.capacity:
+            error = self._evict()
+        counts[key] = error + count
+        self.errors[key] = error
+        heapq.heappush(self._heap, (counts[key], key))
+
+    def _evict(self):
+        """Remove the key with the smallest count and return that count"""
+        heap = self._heap
+        while True:
+            count, key = heapq.heappop(heap)
+            current = self.counts[key]
+            if current == count:
+                del self.counts[key]
+                del self.errors[key]
+                return count
+            heapq.heappush(heap, (current, key))
+
+
+class _Window:
+    """A ring of per-bucket summaries covering the last `seconds`"""
+
+    def __init__(self, seconds, buckets, capacity):
+        self.seconds = seconds
+        self.bucket_seconds = seconds / buckets
+        self.capacity = capacity
+        self.buckets = deque(maxlen=buckets)
+
+    def current(self, now):
+        start = now - now % self.bucket_seconds
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append((start, SpaceSaving(self.capacity)))
+        return self.buckets[-1][1]
+
+    def totals(self, now):
+        totals = {}
+        for start, summary in self.buckets:
+            if start + self.bucket_seconds <= now - self.seconds:
+                continue
+            for key, count in summary.counts.items():
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+
+class TrendingTracker:
+    """
+    Most clicked short codes over sliding windows, kept in memory.
+
+    Each window is a ring of buckets, each a Space-Saving summary of at most
+    capacity keys, so memory is bounded no matter how many links are
+    clicked. Recording a click is a few dict operations. The top list of a
+    window is built from its buckets at most once per refresh_interval and
+    served from that snapshot in between, so reads cost O(K) and never
+    touch SQLite.
+
+    Counts are per process: with several workers each one reports the links
+    trending among the requests it served.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS, capacity=DEFAULT_CAPACITY,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._windows = {name: _Window(seconds, buckets, capacity) for name, seconds, buckets in windows}
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    @property
+    def window_names(self):
+        return list(self._windows)
+
+    def record(self, key, now=None):
+        """Count one click on key in every window"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for window in self._windows.values():
+                window.current(now).add(key)
+
+    def top(self, window_name, limit, now=None):
+        """Return up to limit (at most MAX_RESULTS) (key, estimated clicks) pairs, most clicked first"""
+        window = self._windows[window_name]
+        now = time.time() if now is None else now
+        snapshot = self._snapshots.get(window_name)
+        if snapshot is None or now - snapshot[0] >= self.refresh_interval:
+            with self._lock:
+                totals = window.totals(now)
+            snapshot = (now, heapq.nlargest(MAX_RESULTS, totals.items(), key=lambda item: item[1]))
+            self._snapshots[window_name] = snapshot
+        return snapshot[1][:limit]
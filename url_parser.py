@@ -0,0 +1,114 @@
+import ipaddress
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Schemes accepted for shortening (the network schemes validators.url accepted)
+ALLOWED_SCHEMES = frozenset({'http', 'https', 'ftp', 'ftps', 'sftp', 'ssh', 'git', 'irc',
+                             'rtmp', 'rtmps', 'rtsp', 'telnet'})
+DEFAULT_SCHEME = 'https'
+PARSE_CACHE_SIZE = 4096  # Recently parsed URLs remembered, so later layers reuse the result
+
+# Result of parsing a valid URL. host is the lowercase ASCII host name (IDNA
+# encoded) or IP address without brackets; netloc is the authority as written.
+ParsedURL = namedtuple('ParsedURL', ['url', 'scheme', 'netloc', 'userinfo', 'host', 'port',
+                                     'path', 'query', 'fragment'])
+
+_SCHEME_PREFIX = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*://')
+_URL = re.compile(r'''
+    ^(?P<scheme>[A-Za-z][A-Za-z0-9+.-]*)://
+    (?P<netloc>
+        (?:(?P<userinfo>[^@/?\#\[\]]*)@)?
+        (?P<host>\[[0-9A-Fa-f:.]+\]|[^:/?\#\[\]@]+)
+        (?::(?P<port>[0-9]{1,5}))?
+    )
+    (?P<path>/[^?\#]*)?
+    (?:\?(?P<query>[^\#]*))?
+    (?:\#(?P<fragment>.*))?$
+''', re.VERBOSE | re.DOTALL)
+# Whitespace and control characters must be percent-encoded in a URL. Backslashes
+# are rejected too: browsers read them as '/', so 'http://a.com\@b.com/' would be
+# checked as b.com but open a.com
+_UNSAFE = re.compile(r'[\x00-\x20\x7f\\]')
+_IPV4 = re.compile(r'^[0-9]{1,3}(?:\.[0-9]{1,3}){3}$')
+_LABEL = re.compile(r'^(?!-)[a-z0-9-]{1,63}(?<!-)$')
+_TLD = re.compile(r'^(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})$')
+
+
+def add_default_scheme(url, default_scheme=DEFAULT_SCHEME):
+    """Prefix default_scheme:// to a URL that has no scheme"""
+    return url if _SCHEME_PREFIX.match(url) else '{}://{}'.format(default_scheme, url)
+
+
+def _parse_host(raw):
+    """Return the canonical host for the host part of a URL, or None if it is invalid"""
+    if raw.startswith('['):
+        try:
+            return str(ipaddress.IPv6Address(raw[1:-1]))
+        except ValueError:
+            return None
+
+    host = raw.lower()
+    if _IPV4.match(host):
+        try:
+            return str(ipaddress.IPv4Address(host))
+        except ValueError:
+            return None
+
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+
+    labels = host.split('.')
+    if len(labels) < 2 or len(host) > 253 or not _TLD.match(labels[-1]):
+        return None
+    if not all(_LABEL.match(label) for label in labels):
+        return None
+    return host
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(url):
+    match = _URL.match(url)
+    if not match:
+        return None
+
+    scheme = match.group('scheme').lower()
+    if scheme not in ALLOWED_SCHEMES:
+        return None
+
+    host = _parse_host(match.group('host'))
+    if host is None:
+        return None
+
+    port = match.group('port')
+    if port is not None:
+        port = int(port)
+        if not 0 < port < 65536:
+            return None
+
+    return ParsedURL(url, scheme, match.group('netloc'), match.group('userinfo'), host, port,
+                     match.group('path') or '', match.group('query') or '', match.group('fragment') or '')
+
+
+def parse_url(url, default_scheme=None):
+    """
+    Validate and split a URL in one pass. Returns a ParsedURL, or None when
+    the URL is not valid. With default_scheme, a URL without a scheme is
+    parsed as default_scheme://url (the sanitized form ends up in .url).
+    """
+    if not isinstance(url, str):
+        return None
+    url = url.strip()
+    if not url or _UNSAFE.search(url):
+        return None
+    if default_scheme:
+        url = add_default_scheme(url, default_scheme)
+    return _parse(url)
+
+
+def parse_urls(urls, default_scheme=DEFAULT_SCHEME):
+    """Parse a batch of URLs (e.g. a bulk import); returns a list aligned with urls"""
+    return [parse_url(url, default_scheme) for url in urls]
@@ -0,0 +1,134 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Parsed user agent details stored with each click
+UserAgentInfo = namedtuple('UserAgentInfo', ['device_class', 'os', 'browser', 'is_bot'])
+
+UA_CACHE_SIZE = 10000  # Distinct user agent strings remembered
+
+# Rules are (label, pattern) in priority order: when several rules match,
+# the earliest rule in the list wins, regardless of where in the string it matched.
+BOT_RULES = [
+    ('bot', r'bot\b|crawl|spider|slurp|mediapartners|facebookexternalhit|embedly'),
+    ('tool', r'curl/|wget/|python-requests|python-urllib|go-http-client|okhttp|java/|libwww|httpclient'),
+    ('headless', r'headlesschrome|phantomjs|lighthouse'),
+]
+
+DEVICE_RULES = [
+    ('Tablet', r'ipad|tablet|kindle|silk/|playbook|sm-t\d'),
+    ('Mobile', r'iphone|ipod|windows phone|opera mini|blackberry|mobile'),
+    # Android without "Mobile" is a tablet (the Mobile rule above wins otherwise)
+    ('Tablet', r'android'),
+]
+
+OS_RULES = [
+    ('iOS', r'iphone|ipad|ipod'),
+    ('Android', r'android'),
+    ('Windows', r'windows'),
+    ('ChromeOS', r'cros'),
+    ('macOS', r'mac os x|macintosh'),
+    ('Linux', r'linux|x11'),
+]
+
+BROWSER_RULES = [
+    ('Edge', r'edg(?:e|a|ios)?/'),
+    ('Opera', r'opr/|opera'),
+    ('Samsung Internet', r'samsungbrowser/'),
+    ('Chrome', r'chrome/|crios/'),
+    ('Firefox', r'firefox/|fxios/'),
+    ('Safari', r'safari/'),
+    ('Internet Explorer', r'msie |trident/'),
+]
+
+
+class RuleSet:
+    """A list of labelled patterns compiled into one case-insensitive regex"""
+
+    def __init__(self, rules, default):
+        self.labels = [label for label, _ in rules]
+        self.default = default
+        self.pattern = re.compile(
+            '|'.join('(?P<r{}>{})'.format(index, pattern) for index, (_, pattern) in enumerate(rules)),
+            re.IGNORECASE
+        )
+
+    def match(self, text):
+        """Return the label of the highest-priority matching rule"""
+        best = None
+        for found in self.pattern.finditer(text):
+            index = int(found.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if index == 0:
+                    break
+        return self.labels[best] if best is not None else self.default
+
+
+_bots = RuleSet(BOT_RULES, None)
+_devices = RuleSet(DEVICE_RULES, 'Desktop')
+_operating_systems = RuleSet(OS_RULES, 'Other')
+_browsers = RuleSet(BROWSER_RULES, 'Other')
+
+
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def parse_user_agent(user_agent):
+    """
+    Classify a user agent string into device class, OS, browser and bot flag.
+    Results are memoized since the same few user agents make up most traffic.
+    """
+    if not user_agent:
+        return UserAgentInfo('Other', 'Other', 'Other', False)
+
+    is_bot = _bots.match(user_agent) is not None
+    device_class = 'Bot' if is_bot else _devices.match(user_agent)
+    return UserAgentInfo(device_class, _operating_systems.match(user_agent), _browsers.match(user_agent), is_bot)
+
+
+def add_user_agent_columns(cursor):
+    """Add the parsed user agent columns to the analytics table"""
+    from database import add_column_if_missing
+
+    add_column_if_missing(cursor, 'analytics', 'device_class', 'TEXT')
+    add_column_if_missing(cursor, 'analytics', 'os', 'TEXT')
+    add_column_if_missing(cursor, 'analytics', 'browser', 'TEXT')
+    add_column_if_missing(cursor, 'analytics', 'is_bot', 'BOOLEAN')
+
+
+def backfill_user_agents(batch_size=5000):
+    """
+    Classify analytics rows recorded before classification happened at ingestion.
+    Walks the table by id in batches, one short write transaction per batch.
+    Returns the number of rows updated.
+    """
+    from database import get_db_connection
+
+    last_id = 0
+    updated = 0
+    while True:
+        with get_db_connection(readonly=True) as conn:
+            rows = conn.execute(
+                'SELECT id, user_agent, device_class FROM analytics WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, batch_size)
+            ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+
+        pending = [(row['id'], parse_user_agent(row['user_agent'])) for row in rows if row['device_class'] is None]
+        if pending:
+            with get_db_connection() as conn:
+                conn.executemany(
+                    'UPDATE analytics SET device_class = ?, os = ?, browser = ?, is_bot = ? WHERE id = ?',
+                    [(info.device_class, info.os, info.browser, info.is_bot, row_id) for row_id, info in pending]
+                )
+                conn.commit()
+            updated += len(pending)
+    return updated
+
+
+if __name__ == '__main__':
+    from database import init_db
+
+    init_db()
+    print('Classified {} analytics rows'.format(backfill_user_agents()))
@@ -1,83 +1,150 @@
-import re
-import string
-import random
-import validators
-from urllib.parse import urlparse
-
-# Base62 characters (0-9, a-z, A-Z)
-BASE62_CHARS = string.ascii_letters + string.digits
-
-def generate_short_code(length=6):
-    """
-    Generate a random Base62 short code of specified length
-    """
-    return ''.join(random.choice(BASE62_CHARS) for _ in range(length))
-
-def is_valid_url(url):
-    """
-    Validate if the provided string is a valid URL
-    """
-    if not url:
-        return False
-    
-    # Check if it's a valid URL using the validators library
-    if not validators.url(url):
-        return False
-    
-    # Additional check to ensure it has a proper scheme and netloc
-    parsed = urlparse(url)
-    return bool(parsed.scheme) and bool(parsed.netloc)
-
-def sanitize_url(url):
-    """
-    Ensure URL has proper scheme (default to https)
-    """
-    if not url:
-        return None
-    
-    parsed = urlparse(url)
-    if not parsed.scheme:
-        url = 'https://' + url
-    
-    return url
-
-def get_url_domain(url):
-    """
-    Extract domain from URL
-    """
-    if not url:
-        return None
-    
-    parsed = urlparse(url)
-    return parsed.netloc
-import bcrypt
-
-def hash_password(password):
-    """
-    Hash a password using bcrypt
-    """
-    # Convert password to bytes if it's not already
-    if isinstance(password, str):
-        password = password.encode('utf-8')
-    
-    # Generate salt and hash password
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password, salt)
-    
-    # Return hashed password as string
-    return hashed.decode('utf-8')
-
-def verify_password(password, hashed_password):
-    """
-    Verify a password against its hashed version using bcrypt
-    """
-    # Convert password to bytes if it's not already
-    if isinstance(password, str):
-        password = password.encode('utf-8')
-    
-    # Convert hashed password to bytes if it's not already
-    if isinstance(hashed_password, str):
-        hashed_password = hashed_password.encode('utf-8')
-    
-    # Verify password
+import re
+import string
+import random
+import hashlib
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from url_parser import parse_url, parse_urls, add_default_scheme
+
+# Base62 characters (0-9, a-z, A-Z)
+BASE62_CHARS = string.ascii_letters + string.digits
+
+# Query parameters that only identify a campaign or click, dropped when normalizing
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid',
+                   'mc_cid', 'mc_eid', 'igshid', '_ga', '_gl', 'ref_src'}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Custom short codes: letters, digits, '-' and '_', so they stay a single URL path segment
+CUSTOM_CODE_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,32}')
+
+def generate_short_code(length=6):
+    """
+    Generate a random Base62 short code of specified length
+    """
+    return ''.join(random.choice(BASE62_CHARS) for _ in range(length))
+
+def is_valid_custom_code(code):
+    """
+    Validate a client supplied custom short code
+    """
+    return isinstance(code, str) and CUSTOM_CODE_PATTERN.fullmatch(code) is not None
+
+def is_valid_url(url):
+    """
+    Validate if the provided string is a valid URL
+    """
+    return parse_url(url) is not None
+
+def sanitize_url(url):
+    """
+    Ensure URL has proper scheme (default to https)
+    """
+    if not url:
+        return None
+    
+    return add_default_scheme(url)
+
+def validate_urls(urls):
+    """
+    Validate a batch of URLs in one pass.
+    Returns a list with the (sanitized) URL for each valid entry and None otherwise.
+    """
+    return [parsed.url if parsed else None for parsed in parse_urls(urls)]
+
+def get_url_domain(url):
+    """
+    Extract domain from URL
+    """
+    if not url:
+        return None
+    
+    parsed = parse_url(url)
+    return parsed.netloc if parsed else urlparse(url).netloc
+
+def get_url_host(url):
+    """
+    Extract the lowercase host name (without port or credentials) from URL
+    """
+    if not url:
+        return None
+    
+    parsed = parse_url(url)
+    if parsed:
+        return parsed.host
+    try:
+        return urlparse(url).hostname
+    except ValueError:
+        return None
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for duplicate detection: lowercase scheme and host,
+    no default port, '/' for an empty path, tracking parameters removed and
+    the remaining query parameters ordered by name (repeated names keep their order).
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or '').rstrip('.')
+        port = parts.port
+    except ValueError:
+        return url
+    
+    scheme = parts.scheme.lower()
+    netloc = '[{}]'.format(host) if ':' in host else host
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc += ':{}'.format(port)
+    if parts.username is not None:
+        userinfo = parts.username + (':' + parts.password if parts.password is not None else '')
+        netloc = userinfo + '@' + netloc
+    
+    params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+              if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)]
+    params.sort(key=lambda param: param[0])
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(params), parts.fragment))
+
+def normalized_url_hash(normalized):
+    """
+    Fixed-width hash of an already normalized URL, as a signed 64-bit integer
+    so it fits an indexed SQLite INTEGER column
+    """
+    digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def url_hash(url):
+    """
+    Hash of the normalized form of a URL (see normalize_url)
+    """
+    return normalized_url_hash(normalize_url(url))
+
+import bcrypt
+
+def hash_password(password):
+    """
+    Hash a password using bcrypt
+    """
+    # Convert password to bytes if it's not already
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    
+    # Generate salt and hash password
+    salt = bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password, salt)
+    
+    # Return hashed password as string
+    return hashed.decode('utf-8')
+
+def verify_password(password, hashed_password):
+    """
+    Verify a password against its hashed version using bcrypt
+    """
+    # Convert password to bytes if it's not already
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    
+    # Convert hashed password to bytes if it's not already
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    
+    # Verify password
     return bcrypt.checkpw(password, hashed_password)
\ No newline at end of file
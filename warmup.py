@@ -0,0 +1,184 @@
+import json
+import math
+import os
+import struct
+import time
+import zlib
+from database import get_db_connection
+from expiry import parse_timestamp
+from resolution_cache import Resolution
+
+# Default warm-up settings
+DEFAULT_LIMIT = 10000           # Short codes preloaded into the resolution cache
+DEFAULT_DAYS = 7                # Days of clicks used to rank the hottest codes
+DEFAULT_SNAPSHOT_MAX_AGE = 3600 # Seconds after which a snapshot is too stale to load
+
+# Snapshot file: magic, format version and entry count, then a zlib
+# compressed run of entries. Each entry is url_id, expires_at (NaN for links
+# that never expire), the short code and original URL lengths, then both
+# strings as UTF-8. Only active links are written.
+SNAPSHOT_MAGIC = b'RSNP'
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct('<4sHI')
+ENTRY = struct.Struct('<qdHI')
+
+# Current rows of a list of short codes (passed as a JSON array)
+CODES_SQL = '''
+    SELECT short_code, id, original_url, is_active, expires_at FROM urls
+    WHERE short_code IN (SELECT value FROM json_each(?))
+'''
+
+# The hottest active, unexpired links by clicks over the last days
+HOT_CODES_SQL = '''
+    SELECT u.short_code, u.id, u.original_url, u.is_active, u.expires_at
+    FROM (
+        SELECT url_id, SUM(clicks) AS clicks FROM rollup_url_daily
+        WHERE day >= DATE('now', ?)
+        GROUP BY url_id
+        ORDER BY clicks DESC
+        LIMIT ?
+    ) hot
+    JOIN urls u ON u.id = hot.url_id
+    WHERE u.is_active = 1 AND (u.expires_at IS NULL OR u.expires_at > strftime('%Y-%m-%d %H:%M:%S', 'now'))
+    ORDER BY hot.clicks DESC
+'''
+
+
+def row_to_resolution(row):
+    return Resolution(row['id'], row['original_url'], bool(row['is_active']), parse_timestamp(row['expires_at']))
+
+
+def write_snapshot(path, entries):
+    """Atomically write (short_code, Resolution) pairs to a snapshot file"""
+    body = bytearray()
+    for short_code, resolution in entries:
+        code = short_code.encode('utf-8')
+        url = resolution.original_url.encode('utf-8')
+        expires_at = resolution.expires_at if resolution.expires_at is not None else math.nan
+        body += ENTRY.pack(resolution.url_id, expires_at, len(code), len(url))
+        body += code
+        body += url
+
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as out:
+        out.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(entries)))
+        out.write(zlib.compress(bytes(body)))
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path):
+    """Read the (short_code, Resolution) pairs of a snapshot file; raises ValueError if it is corrupt"""
+    with open(path, 'rb') as snapshot:
+        data = snapshot.read()
+    try:
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError('Not a resolution snapshot')
+        body = zlib.decompress(data[HEADER.size:])
+
+        entries = []
+        offset = 0
+        for _ in range(count):
+            url_id, expires_at, code_length, url_length = ENTRY.unpack_from(body, offset)
+            offset += ENTRY.size
+            short_code = body[offset:offset + code_length].decode('utf-8')
+            offset += code_length
+            original_url = body[offset:offset + url_length].decode('utf-8')
+            offset += url_length
+            entries.append((short_code, Resolution(url_id, original_url, True,
+                                                   None if math.isnan(expires_at) else expires_at)))
+    except (struct.error, zlib.error, UnicodeDecodeError) as e:
+        raise ValueError('Corrupt resolution snapshot: {}'.format(e))
+    return entries
+
+
+class CacheWarmer:
+    """
+    Fills the resolution cache at startup so a fresh worker does not send
+    its first burst of redirects to SQLite.
+
+    warm_from_snapshot() loads the hot codes saved by a previous process (a
+    compact binary file, see write_snapshot). The snapshot only says which
+    codes to load: their rows are re-read with one query before anything is
+    cached, so links deactivated or deleted since it was written never
+    redirect. warm_from_database() then loads the hottest codes by recent
+    clicks in the background. save_snapshot() writes the most recently used
+    entries of the cache.
+    """
+
+    def __init__(self, resolution_cache, snapshot_path=None, limit=DEFAULT_LIMIT, days=DEFAULT_DAYS,
+                 snapshot_max_age=DEFAULT_SNAPSHOT_MAX_AGE):
+        self.resolution_cache = resolution_cache
+        self.snapshot_path = snapshot_path
+        self.limit = limit
+        self.days = days
+        self.snapshot_max_age = snapshot_max_age
+
+        # Statistics
+        self.snapshot_loaded = 0
+        self.database_loaded = 0
+        self.snapshots_saved = 0
+
+    def _fill(self, entries, generation):
+        """
+        Cache entries given hottest first, so the hottest end up most recently
+        used. generation is the cache generation taken before the rows were read.
+        """
+        for short_code, resolution in reversed(entries):
+            self.resolution_cache.set(short_code, resolution, generation=generation)
+
+    def warm_from_snapshot(self):
+        """Load the codes of a recent snapshot with their current rows; returns the number loaded"""
+        if not self.snapshot_path:
+            return 0
+        try:
+            if time.time() - os.path.getmtime(self.snapshot_path) > self.snapshot_max_age:
+                return 0
+            entries = read_snapshot(self.snapshot_path)
+        except (OSError, ValueError):
+            # A missing or unreadable snapshot only means a cold start
+            return 0
+
+        now = time.time()
+        codes = [short_code for short_code, resolution in entries[:self.limit]
+                 if resolution.expires_at is None or resolution.expires_at > now]
+        if not codes:
+            return 0
+        generation = self.resolution_cache.generation()
+        with get_db_connection(readonly=True) as conn:
+            rows = {row['short_code']: row_to_resolution(row)
+                    for row in conn.execute(CODES_SQL, (json.dumps(codes),))}
+        # Deleted codes are left out; deactivated ones are cached as they are now
+        entries = [(short_code, rows[short_code]) for short_code in codes if short_code in rows]
+        self._fill(entries, generation)
+        self.snapshot_loaded = len(entries)
+        return len(entries)
+
+    def warm_from_database(self, job=None):
+        """Load the hottest codes by recent clicks"""
+        generation = self.resolution_cache.generation()
+        with get_db_connection(readonly=True) as conn:
+            hot = [(row['short_code'], row_to_resolution(row))
+                   for row in conn.execute(HOT_CODES_SQL, ('-{} days'.format(self.days), self.limit))]
+        self._fill(hot, generation)
+        self.database_loaded = len(hot)
+        if job is not None:
+            job.progress = len(hot)
+        return len(hot)
+
+    def save_snapshot(self, job=None):
+        """Write the most recently used active entries of the cache to the snapshot file"""
+        if not self.snapshot_path:
+            return 0
+        entries = [(short_code, resolution) for short_code, resolution in self.resolution_cache.hottest(self.limit)
+                   if resolution.is_active]
+        write_snapshot(self.snapshot_path, entries)
+        self.snapshots_saved += 1
+        return len(entries)
+
+    def stats(self):
+        return {
+            'snapshot_loaded': self.snapshot_loaded,
+            'database_loaded': self.database_loaded,
+            'snapshots_saved': self.snapshots_saved
+        }